@@ -4,338 +4,117 @@ Works with new DB structure: restaurant_hours, restaurant_services, service_capa
 Returns format: {time, available, discount} for frontend compatibility
 """
 from fastapi import APIRouter, HTTPException, Query, Form, Request
-from typing import Optional, Dict, Tuple, List
-from datetime import datetime, timedelta, date
+from fastapi.responses import ORJSONResponse
+from typing import Optional, List
+from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
 
 from app.services.booking_service import booking_service
+from app.services.slot_service import slot_service, slot_cache
+from app.services.availability_store import availability_store
+from app.services.heatmap_service import heatmap_service
+from app.services.discount_index import discount_service
+from app.services.catalog import catalog
+from app.services.active_rules import active_rules
+from app.services.reservation_service import reservation_service, SlotFullError
+from app.core.config import settings
 from app.core.database import db
+from app.core.logger import get_logger
+
+log = get_logger(__name__)
 
 router = APIRouter()
 
-# 🔥 Простой кэш для async функций с TTL
-_slots_cache: Dict[Tuple[int, str], list] = {}
-_cache_timestamps: Dict[Tuple[int, str], datetime] = {}
-CACHE_TTL = timedelta(minutes=5)
+def invalidate_cache(restaurant_id: int = None, rules_changed: bool = False):
+    """
+    Очистить кэш слотов (app/services/slot_service.py: slot_cache).
+
+    Вызывается после CRUD скидок и изменений ресторана; материализованные
+    дни ресторана в availability_store тоже сбрасываются. Брони вместо
+    этого передаются дельтой (booking_changed).
 
-def invalidate_cache(restaurant_id: int = None):
-    """Очистить кэш слотов"""
-    global _slots_cache, _cache_timestamps
-    
+    rules_changed - изменились discount_rules: скомпилированный индекс
+    скидок ресторана (app/services/discount_index.py) пересобирается,
+    снимок каталога (timeslots в листинге, app/services/catalog.py) сбрасывается.
+    """
+    if rules_changed:
+        discount_service.invalidate(int(restaurant_id) if restaurant_id else None)
+        catalog.invalidate()
     if restaurant_id:
-        # Очистить кэш только для конкретного ресторана
-        keys_to_delete = [k for k in _slots_cache.keys() if k[0] == restaurant_id]
-        for key in keys_to_delete:
-            del _slots_cache[key]
-            del _cache_timestamps[key]
-        print(f"✅ Кэш очищен для ресторана {restaurant_id}")
+        # Только ключи этого ресторана (тег-индекс, без перебора кэша);
+        # id из JSON тела может прийти строкой
+        removed = slot_cache.invalidate(int(restaurant_id))
+        days = availability_store.invalidate(int(restaurant_id))
+        log.debug("Slot cache invalidated", extra={"restaurant_id": restaurant_id, "removed": removed, "days": days})
     else:
-        # Очистить весь кэш
-        _slots_cache.clear()
-        _cache_timestamps.clear()
-        print("✅ Весь кэш очищен")
+        slot_cache.clear()
+        availability_store.invalidate()
+        log.debug("Slot cache cleared")
 
 
+def booking_changed(booking: Optional[dict], deleted: bool = False):
+    """
+    Бронь создана, изменена или удалена: кэш слотов ресторана сбрасывается,
+    занятость в availability_store меняется дельтой без похода в базу.
 
+    booking - строка брони после изменения (для удалённой - до удаления).
+    """
+    if not booking:
+        return
+    if booking.get("restaurant_id") is not None:
+        slot_cache.invalidate(int(booking["restaurant_id"]))
+    if deleted:
+        availability_store.discard(booking.get("id"))
+    else:
+        availability_store.apply(booking)
 
 
 async def get_cached_slots(restaurant_id: int, date_str: str):
     """
     Получить доступные слоты для бронирования.
     
-    ✅ Алгоритм (TheFork-style):
-    1. Получить часы работы ресторана на день недели
-    2. Получить сервисы (услуги) в рамках часов работы
-    3. Получить capacity для каждого сервиса
-    4. Получить discount_rules для каждого сервиса
-    5. Получить брони на эту дату
-    6. Сгенерировать слоты и вычислить load
+    ✅ Алгоритм (TheFork-style, см. app/services/slot_service.py):
+    1. Параллельно: часы работы, сервисы, индекс discount_rules (кэш)
+    2. Параллельно: capacity всех сервисов (in.()), брони
+    3. Сгенерировать слоты и вычислить load (без запросов к базе);
+       скидка слота - лучшая из правил, действующих в это время
+    
+    По умолчанию день берётся из availability_store (материализация,
+    обновляемая дельтами броней); при AVAILABILITY_STORE_ENABLED=False -
+    из кэша (LRU + TTL) по (restaurant_id, date). На промахе расчёт
+    выполняет один запрос, параллельные ждут его результат.
     
     ✅ Возвращает формат для фронтенда:
     {time, available, discount}
     """
-    cache_key = (restaurant_id, date_str)
-    now = datetime.now()
-    
-    # Проверяем кэш
-    # if cache_key in _slots_cache and cache_key in _cache_timestamps:
-    #     cache_time = _cache_timestamps[cache_key]
-    # if (now - cache_time) < CACHE_TTL:
-    #     return _slots_cache[cache_key]
-
-
-    
-    tz = ZoneInfo("Asia/Almaty")
+    tz = ZoneInfo(settings.TIMEZONE)
     
     try:
         target_date = datetime.strptime(date_str, "%Y-%m-%d").date()
     except ValueError:
         return []
     
-    weekday = target_date.weekday()  # 0=Monday, 6=Sunday
-    
     try:
-        # 1️⃣ Получить часы работы ресторана на этот день недели
-        hours_result = await db.get(
-            table="restaurant_hours",
-            filters={
-                "restaurant_id": f"eq.{restaurant_id}",
-                "weekday": f"eq.{weekday}",
-                "is_closed": "eq.false"
-            }
-        )
-        
-        if not hours_result:
-            print(f"⚠️ Нет restaurant_hours для ресторана {restaurant_id} на день {weekday}")
-            # ✅ FALLBACK: Используем discount_rules напрямую!
-            # Не возвращаем пустой список, продолжаем дальше
-            hours = None
-        else:
-            hours = hours_result[0]
-
-        if hours:
-            open_time_str = hours.get("open_time", "10:00:00")
-            close_time_str = hours.get("close_time", "23:00:00")
-        else:
-            # Используем время из discount_rules
-            open_time_str = "10:00:00"
-            close_time_str = "23:00:00"
-
-        
-        # 2️⃣ Получить сервисы (услуги) в рамках часов работы
-        services_result = await db.get(
-            table="restaurant_services",
-            filters={
-                "restaurant_id": f"eq.{restaurant_id}",
-                "is_active": "eq.true"
-            }
+        if settings.AVAILABILITY_STORE_ENABLED:
+            # Материализованный день: из памяти, брони применяются дельтами
+            return await availability_store.slots(restaurant_id, target_date, tz)
+        
+        # Ошибка расчёта не кэшируется
+        return await slot_cache.get_or_compute(
+            (restaurant_id, target_date.isoformat()),
+            restaurant_id,
+            lambda: slot_service.get_slots(restaurant_id, target_date, tz)
         )
-
-        # FALLBACK: Если нет сервисов, используем discount_rules напрямую
-        if not services_result:
-            discount_result = await db.get(
-                table="discount_rules",
-                filters={
-                    "restaurant_id": f"eq.{restaurant_id}",
-                    "is_active": "eq.true",
-                    "valid_from": f"lte.{date_str}",
-                    "valid_to": f"gte.{date_str}"
-                }
-            )
-            
-            if not discount_result:
-                return []
-            
-            # Генерируем слоты из discount_rules
-            all_slots = []
-            for rule in discount_result:
-                time_start = rule.get("time_start", "10:00:00")
-                time_end = rule.get("time_end", "23:00:00")
-                discount = rule.get("discount", 0)
-                
-                # Парсим время и генерируем слоты каждый час
-                try:
-                    start_time = datetime.strptime(time_start, "%H:%M:%S").time()
-                    end_time = datetime.strptime(time_end, "%H:%M:%S").time()
-                except ValueError:
-                    start_time = datetime.strptime(time_start, "%H:%M").time()
-                    end_time = datetime.strptime(time_end, "%H:%M").time()
-                
-                slot_start = datetime.combine(target_date, start_time)  # ✅ ПРАВИЛЬНО!
-                slot_end = datetime.combine(target_date, end_time)      # ✅ ПРАВИЛЬНО!
-
-                step = timedelta(minutes=60)  # 60 мин интервал
-                current = slot_start
-                
-                while current + step <= slot_end:
-                    all_slots.append({
-                        "time": current.strftime("%H:%M"),
-                        "available": True,
-                        "discount": discount
-                    })
-                    current += step
-            
-            _slots_cache[cache_key] = all_slots
-            _cache_timestamps[cache_key] = now
-            return all_slots
-        
-
-        
-        # 3️⃣ Получить capacity для каждого сервиса
-        all_slots = []
-        
-        for service in services_result:
-            service_id = service.get("id")
-            slot_step = service.get("slot_step_minutes", 60)
-            
-            # Получить capacity для этого сервиса
-            capacity_result = await db.get(
-                table="service_capacity",
-                filters={
-                    "service_id": f"eq.{service_id}",
-                    "date": "is.null"
-                }
-            )
-            
-            if not capacity_result:
-                capacity = 16
-            else:
-                capacity = capacity_result[0].get("capacity_seats", 16)
-            
-            # 4️⃣ Получить discount_rules для этого сервиса ПЕРЕД генерацией слотов!
-            print(f"🔍 Ищу скидки для сервиса {service_id}, дата: {date_str}")
-            discount_result = await db.get(
-                table="discount_rules",
-                filters={
-                    "service_id": f"eq.{service_id}",
-                    "is_active": "eq.true",
-                    "valid_from": f"lte.{date_str}",
-                    "valid_to": f"gte.{date_str}"
-                }
-            )
-
-            print(f"📊 Найдено скидок: {len(discount_result)}")
-            for rule in discount_result:
-                print(f"  - {rule.get('valid_from')} до {rule.get('valid_to')}: {rule.get('discount')}%")
-                print(f"    Время: {rule.get('time_start')} - {rule.get('time_end')}")
-            
-            # FALLBACK: Если нет по service_id, ищем по restaurant_id
-            if not discount_result:
-                print(f"⚠️ FALLBACK: Нет скидок по service_id, ищу по restaurant_id")
-                discount_result = await db.get(
-                    table="discount_rules",
-                    filters={
-                        "restaurant_id": f"eq.{restaurant_id}",
-                        "is_active": "eq.true",
-                        "valid_from": f"lte.{date_str}",
-                        "valid_to": f"gte.{date_str}"
-                    }
-                )
-                print(f"📊 FALLBACK: Найдено скидок: {len(discount_result)}")
-            
-            discount = 0
-            if discount_result:
-                discount = discount_result[0].get("discount", 0)
-            
-            # ✅ НОВОЕ: Используй время из discount_rules, если есть
-            if discount_result:
-                start_time_str = discount_result[0].get("time_start", "10:00:00")
-                end_time_str = discount_result[0].get("time_end", "23:00:00")
-                print(f"✅ Используем время из discount_rules: {start_time_str} - {end_time_str}")
-            else:
-                start_time_str = service.get("start_time", "10:00:00")
-                end_time_str = service.get("end_time", "15:00:00")
-                print(f"✅ Используем время из service: {start_time_str} - {end_time_str}")
-            
-            # Парсим время
-            try:
-                slot_start_time = datetime.strptime(start_time_str, "%H:%M:%S").time()
-                slot_end_time = datetime.strptime(end_time_str, "%H:%M:%S").time()
-            except ValueError:
-                try:
-                    slot_start_time = datetime.strptime(start_time_str, "%H:%M").time()
-                    slot_end_time = datetime.strptime(end_time_str, "%H:%M").time()
-                except ValueError:
-                    continue
-            
-            # Создаём datetime объекты
-            slot_start = datetime.combine(target_date, slot_start_time).replace(tzinfo=tz)
-            slot_end = datetime.combine(target_date, slot_end_time).replace(tzinfo=tz)
-            
-            # 5️⃣ Получить брони на эту дату
-            bookings = await booking_service.get_all(
-                restaurant_id=restaurant_id,
-                limit=500
-            )
-            
-            # Фильтруем брони на нужную дату и статус
-            target_bookings = [
-                b for b in bookings
-                if b.get("status") in ["confirmed", "completed"]
-                and b.get("booking_datetime", "").startswith(date_str)
-            ]
-            
-            # 6️⃣ Генерируем слоты
-            step = timedelta(minutes=slot_step)
-            current = slot_start
-            
-            while current + step <= slot_end:
-                slot_time_start = current
-                slot_time_end = current + step
-                
-                # Считаем гостей в этом слоте
-                booked_guests = 0
-                for booking in target_bookings:
-                    booking_datetime_str = booking.get("booking_datetime", "")
-                    if not booking_datetime_str:
-                        continue
-                    
-                    try:
-                        booking_start = datetime.fromisoformat(
-                            booking_datetime_str.replace("+00", "+00:00")
-                        )
-                        booking_duration = booking.get("duration_minutes", 60)
-                        booking_end = booking_start + timedelta(minutes=booking_duration)
-                        
-                        # Проверяем пересечение
-                        if booking_start < slot_time_end and booking_end > slot_time_start:
-                            booked_guests += booking.get("party_size", 1)
-                    except (ValueError, TypeError):
-                        continue
-                
-                # Рассчитываем load
-                load = booked_guests / capacity if capacity > 0 else 0
-                
-                # Определяем статус
-                is_available = load < 0.9
-                
-                all_slots.append({
-                    "time": current.strftime("%H:%M"),
-                    "available": is_available,
-                    "discount": discount,
-                    "service_id": service_id if service_id else None,
-                    "booked_guests": booked_guests,
-                    "capacity": capacity,
-                    "load": round(load * 100)
-                })
-                
-                current += step
-
-        
-        # Удаляем дубликаты по времени (берём первый слот с максимальной скидкой)
-        seen_times = {}
-        unique_slots = []
-        
-        for slot in all_slots:
-            time_key = slot["time"]
-            if time_key not in seen_times:
-                seen_times[time_key] = slot
-                unique_slots.append(slot)
-            else:
-                # Если уже есть слот на это время, берём с большей скидкой
-                if slot["discount"] > seen_times[time_key]["discount"]:
-                    # Заменяем старый слот на новый
-                    idx = next(i for i, s in enumerate(unique_slots) if s["time"] == time_key)
-                    unique_slots[idx] = slot
-                    seen_times[time_key] = slot
-        
-        # Сохраняем в кэш
-        _slots_cache[cache_key] = unique_slots
-        _cache_timestamps[cache_key] = now
-        
-        return unique_slots
     
-    except Exception as e:
-        print(f"❌ Ошибка в get_cached_slots: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        log.exception("Slot engine failed", extra={"restaurant_id": restaurant_id, "date": date_str})
         return []
 
 
 # app/api/bookings.py
 
-@router.get("/")
+@router.get("/", response_class=ORJSONResponse)
 async def get_bookings(
     phone: Optional[str] = Query(None),
     restaurant_id: Optional[int] = Query(None),
@@ -348,11 +127,6 @@ async def get_bookings(
     ✅ Возвращает массив броней напрямую (не объект!)
     """
     try:
-        print("=== DEBUG get_bookings ===")
-        print(f"Phone filter: {phone}")
-        print(f"Restaurant ID filter: {restaurant_id}")
-        print(f"Status filter: {status}")
-        
         bookings = await booking_service.get_all(
             phone=phone,
             restaurant_id=restaurant_id,
@@ -360,32 +134,164 @@ async def get_bookings(
             limit=limit
         )
         
-        print(f"✅ Bookings loaded: {len(bookings)}")
         # ✅ ДОБАВЬ ЭТО - убедись что discount_applied есть в каждой брони
         for booking in bookings:
             if 'discount_applied' not in booking:
                 booking['discount_applied'] = 0
-            print(f"  Бронь #{booking.get('id')}: скидка {booking.get('discount_applied')}%")
+        
+        log.debug("Bookings loaded", extra={
+            "restaurant_id": restaurant_id,
+            "status_filter": status,
+            "count": len(bookings)
+        })
         
         # ✅ ИСПРАВЛЕНИЕ: Возвращаем массив напрямую
-        return bookings  # НЕ {"count": ..., "bookings": ...}
+        return ORJSONResponse(bookings)  # НЕ {"count": ..., "bookings": ...}
         
-    except Exception as e:
-        print(f"❌ Error getting bookings: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        log.exception("Error getting bookings")
         return []  # Возвращаем пустой массив в случае ошибки
 
 
 
-@router.get("/available-slots")
+@router.get("/available-slots", response_class=ORJSONResponse)
 async def available_slots(
     restaurant_id: int = Query(...),
     date: str = Query(...)
 ):
     """Получить доступные слоты"""
     slots = await get_cached_slots(restaurant_id, date)
-    return slots
+    return ORJSONResponse(slots)
+
+
+@router.get("/available-slots/range", response_class=ORJSONResponse)
+async def available_slots_range(
+    restaurant_id: int = Query(...),
+    date_from: str = Query(..., alias="from"),
+    date_to: str = Query(..., alias="to"),
+    format: str = Query("rows", pattern="^(rows|columnar)$")
+):
+    """
+    Слоты на несколько дней (неделя в BookingForm) за одну загрузку данных.
+
+    - from / to: YYYY-MM-DD включительно, не больше SLOT_RANGE_MAX_DAYS дней
+    - format=rows: {"days": {"2025-01-20": [{time, available, discount, ...}]}}
+    - format=columnar: {"days": {"2025-01-20": {"time": [...], "available": [...], ...}}}
+
+    Источник тот же, что у /available-slots: при AVAILABILITY_STORE_ENABLED
+    дни берутся из availability_store (недостающие - одной загрузкой и
+    материализуются), иначе из кэша слотов. Уже готовые дни не
+    пересчитываются, посчитанные видит и /available-slots.
+    """
+    try:
+        first_day = datetime.strptime(date_from, "%Y-%m-%d").date()
+        last_day = datetime.strptime(date_to, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Даты должны быть в формате YYYY-MM-DD")
+    
+    days = (last_day - first_day).days + 1
+    if days < 1:
+        raise HTTPException(status_code=400, detail="'to' раньше 'from'")
+    if days > settings.SLOT_RANGE_MAX_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Максимальное окно - {settings.SLOT_RANGE_MAX_DAYS} дней"
+        )
+    
+    if settings.AVAILABILITY_STORE_ENABLED:
+        try:
+            result = await availability_store.slots_range(
+                restaurant_id, first_day, last_day, ZoneInfo(settings.TIMEZONE)
+            )
+        except Exception:
+            log.exception("Slot engine failed", extra={
+                "restaurant_id": restaurant_id,
+                "from": date_from,
+                "to": date_to
+            })
+            raise HTTPException(status_code=500, detail="Не удалось рассчитать слоты")
+        return _range_response(restaurant_id, first_day, last_day, format, result)
+    
+    result = {}
+    missing = []
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        slots = slot_cache.get((restaurant_id, day.isoformat()))
+        if slots is None:
+            missing.append(day)
+        else:
+            result[day] = slots
+    
+    if missing:
+        generation = slot_cache.generation(restaurant_id)
+        try:
+            computed = await slot_service.get_slots_range(
+                restaurant_id,
+                missing[0],
+                missing[-1],
+                ZoneInfo(settings.TIMEZONE)
+            )
+        except Exception:
+            log.exception("Slot engine failed", extra={
+                "restaurant_id": restaurant_id,
+                "from": date_from,
+                "to": date_to
+            })
+            raise HTTPException(status_code=500, detail="Не удалось рассчитать слоты")
+        for day in missing:
+            result[day] = computed[day]
+            slot_cache.put((restaurant_id, day.isoformat()), restaurant_id, computed[day], generation)
+    
+    return _range_response(restaurant_id, first_day, last_day, format, result)
+
+
+def _range_response(restaurant_id: int, first_day, last_day, format: str, result: dict) -> ORJSONResponse:
+    to_payload = slot_service.to_columns if format == "columnar" else (lambda slots: slots)
+    return ORJSONResponse({
+        "restaurant_id": restaurant_id,
+        "from": first_day.isoformat(),
+        "to": last_day.isoformat(),
+        "format": format,
+        "days": {day.isoformat(): to_payload(result[day]) for day in sorted(result)}
+    })
+
+
+@router.get("/occupancy-heatmap", response_class=ORJSONResponse)
+async def occupancy_heatmap(
+    restaurant_id: int = Query(...),
+    date_from: Optional[str] = Query(None, alias="from"),
+    days: int = Query(30, ge=1),
+    bucket: int = Query(15, ge=5, le=240)
+):
+    """
+    Загрузка ресторана за окно (по умолчанию 30 дней с сегодня) для партнёра.
+
+    - bucket: размер интервала в минутах (делитель 1440)
+    - {"days": [...], "times": ["10:00", ...], "guests": [[...]],
+       "capacity": [[...]], "load": [[% или null]]} - строки по дням, колонки по времени
+    """
+    tz = ZoneInfo(settings.TIMEZONE)
+    try:
+        first_day = datetime.strptime(date_from, "%Y-%m-%d").date() if date_from else datetime.now(tz).date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Дата должна быть в формате YYYY-MM-DD")
+    if days > settings.HEATMAP_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Максимальное окно - {settings.HEATMAP_MAX_DAYS} дней")
+    if 1440 % bucket:
+        raise HTTPException(status_code=400, detail="bucket должен делить сутки (5, 10, 15, 30, 60, ...)")
+    
+    try:
+        heatmap = await heatmap_service.get_heatmap(restaurant_id, first_day, days, bucket, tz)
+    except Exception:
+        log.exception("Heatmap failed", extra={"restaurant_id": restaurant_id, "from": first_day.isoformat(), "days": days})
+        raise HTTPException(status_code=500, detail="Не удалось рассчитать загрузку")
+    
+    return ORJSONResponse({
+        "restaurant_id": restaurant_id,
+        "from": first_day.isoformat(),
+        "bucket_minutes": bucket,
+        **heatmap
+    })
 
 
 @router.get("/completed")
@@ -403,10 +309,12 @@ async def get_completed_bookings(limit: int = 50):
             return []
         
         # Get restaurant names for all bookings
-        booking_ids = [b["restaurant_id"] for b in bookings]
-        restaurants = await db.get(
-            "restaurants",
-            filters={"id": f"in.({','.join(map(str, booking_ids))})"}
+        booking_ids = list({b["restaurant_id"] for b in bookings})
+        restaurants = await (
+            db.query("restaurants")
+            .select("id", "name")
+            .in_("id", booking_ids)
+            .execute()
         )
         
         restaurant_map = {r["id"]: r["name"] for r in restaurants or []}
@@ -462,7 +370,14 @@ async def create_booking(
         "table_id": None,
     }
     
-    booking = await booking_service.create(booking_data)
+    if settings.BOOKING_CAPACITY_CHECK:
+        # Проверка мест и insert атомарно для слота (см. reservation_service)
+        try:
+            booking = await reservation_service.reserve(booking_data, almaty_tz)
+        except SlotFullError:
+            raise HTTPException(status_code=409, detail="Нет свободных мест на это время")
+    else:
+        booking = await booking_service.create(booking_data)
     # ... остальной код ...
 
     
@@ -472,6 +387,9 @@ async def create_booking(
     # Если это список, берём первый элемент
     booking_record = booking[0] if isinstance(booking, list) else booking
     
+    # 🔥 Новая бронь меняет загрузку слотов ресторана
+    booking_changed({"restaurant_id": restaurant_id, **booking_record})
+    
     return {
         "success": True,
         "message": "Бронь успешно создана",
@@ -722,14 +640,14 @@ async def get_discount_rules(restaurant_id: int = Query(...)):
 async def get_bookings_by_restaurant(restaurant_id: int):
     """Получить все брони ресторана"""
     try:
-        bookings = await db.get(
-            "bookings",
-            filters={"restaurant_id": f"eq.{restaurant_id}"},
-            limit=500
-        )
-        
-        if not bookings:
-            return []
+        # Все брони постранично (раньше молча обрезалось на 500)
+        bookings = [
+            booking async for booking in db.iter_rows(
+                "bookings",
+                filters={"restaurant_id": f"eq.{restaurant_id}"},
+                keyset="id"
+            )
+        ]
         
         return bookings
     
@@ -767,7 +685,11 @@ async def create_discount_rule(
         }
         
         result = await db.post("discount_rules", data)
-        invalidate_cache(restaurant_id)
+        active_rules.apply(result)
+        invalidate_cache(restaurant_id, rules_changed=True)
+        for row in previous or []:
+            if row.get("restaurant_id") is not None and int(row["restaurant_id"]) != restaurant_id:
+                invalidate_cache(row["restaurant_id"], rules_changed=True)
         return result
     except Exception as e:
         print(f"❌ Error creating discount: {e}")
@@ -775,6 +697,38 @@ async def create_discount_rule(
 
 
 
+@router.post("/discount_rules/bulk")
+async def create_discount_rules_bulk(rules: List[dict]):
+    """
+    Создать много скидок одним запросом (например, сетка на месяц вперёд).
+
+    Принимает JSON массив объектов с теми же полями, что и POST /discount_rules.
+    Возвращает {"inserted": [...], "failed": [{"index", "row", "error"}]}.
+    """
+    if not rules:
+        raise HTTPException(status_code=400, detail="Список скидок пуст")
+    
+    rows = []
+    for rule in rules:
+        if "restaurant_id" not in rule:
+            raise HTTPException(status_code=400, detail="У каждой скидки должен быть restaurant_id")
+        service_id = rule.get("service_id")
+        rows.append({
+            **rule,
+            "service_id": service_id if service_id and str(service_id).strip() else None,
+            "is_active": rule.get("is_active", True),
+        })
+    
+    result = await db.bulk_insert("discount_rules", rows)
+    active_rules.apply(result["inserted"])
+    
+    for restaurant_id in {row["restaurant_id"] for row in rows}:
+        invalidate_cache(restaurant_id, rules_changed=True)
+    
+    return result
+
+
+
 @router.patch("/{booking_id}/status")
 async def update_booking_status(booking_id: int, request: Request):
     """Обновить статус брони"""
@@ -794,7 +748,7 @@ async def update_booking_status(booking_id: int, request: Request):
     
     # 🔥 Инвалидируем кэш
     if booking:
-        invalidate_cache(booking.get("restaurant_id"))
+        booking_changed({**booking, "status": status})
     
     return {"success": True, "message": "Статус обновлен"}
 
@@ -811,8 +765,7 @@ async def cancel_booking(booking_id: int):
         raise HTTPException(status_code=400, detail="Ошибка отмены брони")
     
     # 🔥 Инвалидируем кэш
-    if booking:
-        invalidate_cache(booking.get("restaurant_id"))
+    booking_changed(booking, deleted=True)
     
     return {"success": True, "message": "Бронь отменена"}
 
@@ -851,6 +804,14 @@ async def update_discount_rule(
         
         print(f"  Отправляю в БД: {data}")
         
+        # Правило могло переехать в другой ресторан: кэши старого тоже сбрасываются
+        previous = await db.get(
+            "discount_rules",
+            filters={"id": f"eq.{discount_id}"},
+            select="restaurant_id",
+            limit=1
+        )
+        
         result = await db.update(
             "discount_rules",
             filters={"id": f"eq.{discount_id}"},
@@ -859,7 +820,11 @@ async def update_discount_rule(
         
         print(f"  Результат обновления: {result}")
         
-        invalidate_cache(restaurant_id)
+        active_rules.apply(result)
+        invalidate_cache(restaurant_id, rules_changed=True)
+        for row in previous or []:
+            if row.get("restaurant_id") is not None and int(row["restaurant_id"]) != restaurant_id:
+                invalidate_cache(row["restaurant_id"], rules_changed=True)
         return result
     except Exception as e:
         print(f"❌ Error updating discount: {e}")
@@ -875,7 +840,8 @@ async def delete_discount_rule(discount_id: int, restaurant_id: int = Query(...)
             "discount_rules",
             filters={"id": f"eq.{discount_id}"}
         )
-        invalidate_cache(restaurant_id)
+        active_rules.discard(discount_id)
+        invalidate_cache(restaurant_id, rules_changed=True)
         return {"success": True}
     except Exception as e:
         print(f"❌ Error deleting discount: {e}")
@@ -4,6 +4,7 @@ import uuid
 
 from app.core.database import db
 from app.services.restaurant_service import restaurant_service
+from app.services.catalog import catalog
 from app.utils.image_utils import compress_image, validate_image
 from app.core.config import settings
 
@@ -71,6 +72,7 @@ async def upload_restaurant_photo(
                 content={"success": False, "message": "Ошибка обновления БД"},
                 status_code=500
             )
+        catalog.invalidate()
         
         # Get updated restaurant
         restaurant = await restaurant_service.get_by_id(restaurant_id)
@@ -107,6 +109,7 @@ async def delete_restaurant_photo(restaurant_id: int, photo_index: int):
                 content={"success": False, "message": "Ошибка удаления из БД"},
                 status_code=400
             )
+        catalog.invalidate()
         
         # Delete from storage
         if photo_url:
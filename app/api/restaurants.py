@@ -4,136 +4,256 @@ Restaurant API endpoints - FIXED VERSION
 Handles CRUD operations for restaurants without RPC calls that hang
 """
 from fastapi import APIRouter, HTTPException, Query, Request, Form, UploadFile, File
+from fastapi.responses import ORJSONResponse
 from typing import Optional, List
+import asyncio
 import json
 import uuid
 from app.api.bookings import invalidate_cache
 from datetime import datetime, timedelta 
-from app.services.restaurant_service import restaurant_service, timeslot_service
+from zoneinfo import ZoneInfo
+from app.services.restaurant_service import (
+    restaurant_service, timeslot_service, LISTING_COLUMNS, TIMESLOT_COLUMNS,
+    listing_sort_key, paginate, encode_cursor, decode_cursor
+)
+from app.services.slot_service import slot_service, slot_cache
+from app.services.catalog import catalog
+from app.services.availability_store import availability_store
+from app.services.active_rules import active_rules
+from app.core.config import settings
 from app.core.database import db
+from app.core.logger import get_logger
+
+log = get_logger(__name__)
 
 router = APIRouter()
 
-@router.get("/")
+def _listing_response(restaurants: list, filters: tuple, next_key: Optional[tuple]) -> ORJSONResponse:
+    """Массив как раньше; курсор следующей страницы - в заголовке X-Next-Cursor"""
+    headers = {"X-Next-Cursor": encode_cursor(filters, next_key)} if next_key is not None else None
+    return ORJSONResponse(restaurants, headers=headers)
+
+
+@router.get("/", response_class=ORJSONResponse)
 async def get_restaurants(
     search: Optional[str] = None,
     category: Optional[str] = None,
     city: Optional[str] = None,
     sort_by: Optional[str] = None,
     avg_check_filter: Optional[str] = None,
-    limit: int = Query(default=100, le=500)
+    limit: int = Query(default=100, le=500),
+    cursor: Optional[str] = None,
+    page_size: Optional[int] = Query(default=None, ge=1, le=settings.LISTING_MAX_PAGE_SIZE)
 ):
     """
     Получает все рестораны с фильтрацией и поиском.
-    ИСПРАВЛЕННАЯ ВЕРСИЯ: Использует restaurant_service.get_all() вместо RPC
+
+    Из снимка каталога (app/services/catalog.py), если он включён и собран;
+    иначе - из базы с фильтрами в запросе (restaurant_service.get_listing).
+
+    Постранично (page_size и/или cursor): page_size строк (по умолчанию
+    LISTING_PAGE_SIZE) в порядке sort_by + id, курсор следующей страницы -
+    в заголовке X-Next-Cursor (нет заголовка - страниц больше нет).
+    Курсор - keyset по ключу последней строки: вставки и удаления между
+    запросами не дают дублей и пропусков. Курсор действует только с
+    теми же фильтрами. Без page_size и cursor - прежний ответ до limit строк.
+
+    timeslots - действующие сегодня (settings.TIMEZONE: период и день
+    недели) активные скидки из индекса active_rules; пока он не загружен -
+    все скидки ресторана.
     """
-    print("\n" + "="*50)
-    print(f"🔍 GET /api/restaurants/ (ИСПРАВЛЕННАЯ ВЕРСИЯ)")
-    print(f"📊 Category: {category}, Search: {search}, City: {city}, Sort: {sort_by}")
-    print("="*50)
-    
+    filters = (search, category, city, sort_by, avg_check_filter)
+    paged = cursor is not None or page_size is not None
+    after = None
+    if paged:
+        page_size = page_size or settings.LISTING_PAGE_SIZE
+        if cursor:
+            after = decode_cursor(cursor, filters, sort_by)
+            if after is None:
+                raise HTTPException(status_code=400, detail="Неверный курсор или фильтры изменились")
+
     try:
-        # ✅ ИСПРАВЛЕНИЕ: Используем restaurant_service.get_all() вместо RPC
-        print("📡 Step 1: Fetching all restaurants from database...")
-        restaurants = await restaurant_service.get_all(limit=limit)
-        print(f"✅ Step 1 DONE: Got {len(restaurants)} restaurants")
+        next_key = None
+        if settings.CATALOG_ENABLED:
+            snapshot = await catalog.snapshot()
+            if snapshot is not None:
+                if paged:
+                    cards, next_key = snapshot.page(*filters, after, page_size)
+                else:
+                    cards = snapshot.filter(*filters, limit)
+                if settings.ACTIVE_RULES_ENABLED and active_rules.ready:
+                    # Карточки снимка общие: копии с сегодняшними правилами
+                    cards = [{**card} for card in cards]
+                    active_rules.attach(cards)
+                return _listing_response(cards, filters, next_key)
+        
+        # Фильтры, сортировка и limit - в запросе к базе (на странице +1 строка: есть ли следующая)
+        restaurants = await restaurant_service.get_listing(
+            *filters, page_size + 1 if paged else limit, columns=LISTING_COLUMNS, after=after
+        )
+        if restaurants is None:
+            # База не выполнила запрос с фильтрами: первые limit строк и фильтры в Python
+            log.warning("Listing filters fell back to Python")
+            restaurants = restaurant_service.filter_listing(
+                await restaurant_service.get_all(limit=limit, columns=LISTING_COLUMNS),
+                *filters
+            )
+            if paged:
+                restaurants, next_key = paginate(
+                    sorted(restaurants, key=listing_sort_key(sort_by)), listing_sort_key(sort_by), after, page_size
+                )
+        elif paged and len(restaurants) > page_size:
+            restaurants = restaurants[:page_size]
+            next_key = listing_sort_key(sort_by)(restaurants[-1])
         
         if not restaurants:
-            print("⚠️ No restaurants found in database")
+            log.info("No restaurants found in database")
             return []
         
-        # Фильтрация по поиску (поиск в названии)
-        if search and search.strip():
-            print(f"🔎 Filtering by search term: '{search}'")
-            search_lower = search.lower()
-            restaurants = [
-                r for r in restaurants 
-                if search_lower in r.get('name', '').lower() or 
-                   search_lower in ' '.join(r.get('cuisine', [])).lower()
-            ]
-            print(f"✅ Found {len(restaurants)} restaurants matching search")
-        
-        # Фильтрация по категории
-        if category and category != 'all':
-            print(f"🏷️ Filtering by category: '{category}'")
-            restaurants = [r for r in restaurants if r.get('category') == category]
-            print(f"✅ Found {len(restaurants)} restaurants in category")
-        
-        # Фильтрация по городу
-        if city and city != 'all':
-            print(f"🏙️ Filtering by city: '{city}'")
-            restaurants = [r for r in restaurants if r.get('city') == city]
-            print(f"✅ Found {len(restaurants)} restaurants in city")
-        
-        # Фильтрация по среднему чеку
-        if avg_check_filter and avg_check_filter != 'all':
-            print(f"💰 Filtering by avg_check: '{avg_check_filter}'")
-            filtered = []
-            for r in restaurants:
-                avg_check = r.get('avg_check', 0)
-                if avg_check_filter == '0-5000' and 0 <= avg_check <= 5000:
-                    filtered.append(r)
-                elif avg_check_filter == '5000-10000' and 5000 < avg_check <= 10000:
-                    filtered.append(r)
-                elif avg_check_filter == '10000-15000' and 10000 < avg_check <= 15000:
-                    filtered.append(r)
-                elif avg_check_filter == '15000+' and avg_check > 15000:
-                    filtered.append(r)
-            restaurants = filtered
-            print(f"✅ Found {len(restaurants)} restaurants in avg_check range")
-        
-        # Сортировка
-        if sort_by:
-            print(f"📊 Sorting by: '{sort_by}'")
-            if sort_by == 'popularity':
-                restaurants.sort(key=lambda r: r.get('popularity', 0), reverse=True)
-            elif sort_by == 'rating_desc':
-                restaurants.sort(key=lambda r: r.get('rating', 0), reverse=True)
-            elif sort_by == 'avg_check_asc':
-                restaurants.sort(key=lambda r: r.get('avg_check', 0))
-            elif sort_by == 'avg_check_desc':
-                restaurants.sort(key=lambda r: r.get('avg_check', 0), reverse=True)
-            print(f"✅ Sorted {len(restaurants)} restaurants")
-        
-        # Загрузка таймслотов для каждого ресторана
-        if restaurants:
-            print("📡 Step 2: Fetching timeslots for restaurants...")
-            today = datetime.now().strftime("%Y-%m-%d")
+        # Таймслоты: действующие сегодня правила из индекса, без запроса;
+        # индекс ещё не загружен - все правила ресторанов из базы, как раньше
+        if settings.ACTIVE_RULES_ENABLED and active_rules.ready:
+            active_rules.attach(restaurants)
+        else:
             restaurant_ids = [r["id"] for r in restaurants]
             
             try:
-                all_timeslots = await db.get(
-                    "discount_rules",
-                    filters={"restaurant_id": f"in.({','.join(map(str, restaurant_ids))})"},
-                    limit=1000
-                )
-                
                 timeslots_by_restaurant = {}
-                if all_timeslots:
-                    for slot in all_timeslots:
-                        rid = slot["restaurant_id"]
-                        if rid not in timeslots_by_restaurant:
-                            timeslots_by_restaurant[rid] = []
-                        timeslots_by_restaurant[rid].append(slot)
+                rules_query = (
+                    db.query("discount_rules")
+                    .select(TIMESLOT_COLUMNS)
+                    .in_("restaurant_id", restaurant_ids)
+                )
+                async for slot in rules_query.iter_rows(keyset="id"):
+                    rid = slot["restaurant_id"]
+                    if rid not in timeslots_by_restaurant:
+                        timeslots_by_restaurant[rid] = []
+                    timeslots_by_restaurant[rid].append(slot)
                 
                 for r in restaurants:
                     r["timeslots"] = timeslots_by_restaurant.get(r.get("id"), [])
-                
-                print(f"✅ Step 2 DONE: Loaded timeslots for {len(timeslots_by_restaurant)} restaurants")
             except Exception as e:
-                print(f"⚠️ Could not batch load timeslots: {e}")
+                log.warning("Could not batch load timeslots: %s", e)
                 for r in restaurants:
                     r["timeslots"] = []
         
-        print(f"🎉 RETURNING {len(restaurants)} restaurants\n")
-        return restaurants
+        log.debug("Restaurants listed", extra={
+            "search": search,
+            "category": category,
+            "city": city,
+            "sort_by": sort_by,
+            "count": len(restaurants)
+        })
+        # Данные из базы уже JSON-совместимы: отдаём напрямую, без jsonable_encoder
+        return _listing_response(restaurants, filters, next_key)
     
-    except Exception as e:
-        print(f"❌ UNEXPECTED FATAL ERROR in get_restaurants: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        log.exception("Unexpected error in get_restaurants")
         return []
 
+@router.get("/next-slots", response_class=ORJSONResponse)
+async def get_next_slots(
+    ids: str = Query(..., description="ID ресторанов через запятую"),
+    date: Optional[str] = Query(None, description="YYYY-MM-DD, по умолчанию сегодня")
+):
+    """
+    Ближайший свободный слот и лучшая скидка для пачки ресторанов
+    (страница списка): {"date": ..., "restaurants": {"<id>": {next_slot, best_discount, available_slots}}}
+
+    Сегодня учитываются только слоты не раньше текущего времени (settings.TIMEZONE).
+    Источник тот же, что у /available-slots: availability_store (при
+    AVAILABILITY_STORE_ENABLED) или кэш слотов. Рестораны, чьих дней там
+    нет, считаются одной загрузкой данных на всю пачку, а не вызовом
+    движка на каждый ресторан.
+    """
+    try:
+        restaurant_ids = list(dict.fromkeys(int(part) for part in ids.split(",") if part.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids - список целых чисел через запятую")
+    if not restaurant_ids:
+        raise HTTPException(status_code=400, detail="Нужен хотя бы один ID ресторана")
+    if len(restaurant_ids) > settings.NEXT_SLOTS_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Максимум {settings.NEXT_SLOTS_MAX_IDS} ресторанов за запрос"
+        )
+    
+    tz = ZoneInfo(settings.TIMEZONE)
+    now = datetime.now(tz)
+    try:
+        target_date = datetime.strptime(date, "%Y-%m-%d").date() if date else now.date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Дата должна быть в формате YYYY-MM-DD")
+    date_key = target_date.isoformat()
+    after = now.strftime("%H:%M") if target_date == now.date() else None
+    
+    if settings.AVAILABILITY_STORE_ENABLED:
+        # Тот же источник, что у /available-slots: материализованные дни
+        try:
+            slots_by_id = await availability_store.slots_many(restaurant_ids, target_date, tz)
+        except Exception:
+            log.exception("Slot engine failed", extra={"restaurants": len(restaurant_ids), "date": date_key})
+            raise HTTPException(status_code=500, detail="Не удалось рассчитать слоты")
+        return _next_slots_response(date_key, restaurant_ids, slots_by_id, after)
+    
+    slots_by_id = {}
+    missing = []
+    for rid in restaurant_ids:
+        slots = slot_cache.get((rid, date_key))
+        if slots is None:
+            missing.append(rid)
+        else:
+            slots_by_id[rid] = slots
+    
+    if missing:
+        generations = {rid: slot_cache.generation(rid) for rid in missing}
+        try:
+            computed = await slot_service.get_slots_many(missing, target_date, tz)
+        except Exception:
+            log.exception("Slot engine failed", extra={"restaurants": len(missing), "date": date_key})
+            raise HTTPException(status_code=500, detail="Не удалось рассчитать слоты")
+        for rid in missing:
+            slots_by_id[rid] = computed[rid]
+            slot_cache.put((rid, date_key), rid, computed[rid], generations[rid])
+    
+    return _next_slots_response(date_key, restaurant_ids, slots_by_id, after)
+
+
+def _next_slots_response(date_key: str, restaurant_ids: list, slots_by_id: dict, after: Optional[str]) -> ORJSONResponse:
+    return ORJSONResponse({
+        "date": date_key,
+        "restaurants": {
+            str(rid): slot_service.next_slot(slots_by_id[rid], after)
+            for rid in restaurant_ids
+        }
+    })
+
+@router.get("/autocomplete", response_class=ORJSONResponse)
+async def autocomplete_restaurants(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(default=8, ge=1, le=20)
+):
+    """
+    Подсказки поиска: {"query", "restaurants": [{id, name, category, city, score}], "cuisines": [{name, count}]}
+
+    Из поискового индекса снимка каталога (регистр, транслитерация
+    кириллица <-> латиница, префикс, опечатки); без снимка - подстрока
+    в названии через базу.
+    """
+    snapshot = await catalog.snapshot() if settings.CATALOG_ENABLED else None
+    if snapshot is not None:
+        return ORJSONResponse(snapshot.suggest(q, limit))
+    
+    rows = await restaurant_service.search(q)
+    return ORJSONResponse({
+        "query": q,
+        "restaurants": [
+            {"id": r.get("id"), "name": r.get("name"), "category": r.get("category"), "city": r.get("city"), "score": None}
+            for r in rows[:limit]
+        ],
+        "cuisines": []
+    })
+
 @router.get("/partner/{partner_id}")
 async def get_partner_restaurant(partner_id: int):
     """
@@ -203,6 +323,13 @@ async def get_restaurant(restaurant_id: int):
     print("="*50)
 
     try:
+        # Снимок каталога; ресторана нет в снимке (создан в другом процессе) - база
+        snapshot = await catalog.snapshot() if settings.CATALOG_ENABLED else None
+        restaurant = snapshot.restaurant(restaurant_id) if snapshot is not None else None
+        if restaurant is not None:
+            log.debug("Restaurant served from catalog snapshot", extra={"restaurant_id": restaurant_id})
+            return restaurant
+        
         print(f"📡 Step 1: Fetching restaurant with ID {restaurant_id} directly from DB...")
         
         restaurants = await db.get(
@@ -222,16 +349,8 @@ async def get_restaurant(restaurant_id: int):
         print("📡 Step 2: Fetching timeslots for this restaurant...")
         today = datetime.now().strftime("%Y-%m-%d")
         try:
-            timeslots = await db.get(
-                "discount_rules",
-                filters={
-                    "restaurant_id": f"eq.{restaurant_id}",
-                    "is_active": "eq.true",
-                    "valid_from": f"lte.{today}",
-                    "valid_to": f"gte.{today}"
-                }
-            )
-            restaurant["timeslots"] = timeslots or []
+            timeslots = await restaurant_service.get_timeslots_by_restaurant(restaurant_id, today)
+            restaurant["timeslots"] = timeslots
             print(f"✅ Step 2 DONE: Found {len(timeslots or [])} timeslots.")
         except Exception as e:
             print(f"⚠️ Could not load timeslots: {e}")
@@ -311,20 +430,6 @@ async def create_restaurant(
 
         restaurant_id = restaurant["id"]
 
-        # Создаём запись в restaurant_owners если передан owner_id
-        if owner_id:
-            print(f"📝 Creating restaurant_owner link: user_id={owner_id}, restaurant_id={restaurant_id}")
-            owner_data = {
-                "user_id": owner_id,
-                "restaurant_id": restaurant_id
-            }
-            
-            owner_result = await db.post("restaurant_owners", owner_data, return_rep=True)
-            if not owner_result:
-                print(f"⚠️ Warning: Could not create restaurant_owner link")
-            else:
-                print(f"✅ Restaurant owner link created")
-
         print(f"📝 Creating restaurant_service for restaurant {restaurant_id}...")
         service_id = str(uuid.uuid4())
 
@@ -338,13 +443,34 @@ async def create_restaurant(
             "is_active": True
         }
 
-        service_result = await db.post("restaurant_services", service_data, return_rep=True)
+        # Связь с владельцем не зависит от сервиса - пишем параллельно
+        owner_write = None
+        if owner_id:
+            print(f"📝 Creating restaurant_owner link: user_id={owner_id}, restaurant_id={restaurant_id}")
+            owner_data = {
+                "user_id": owner_id,
+                "restaurant_id": restaurant_id
+            }
+            owner_write = db.post("restaurant_owners", owner_data, return_rep=True)
+
+        if owner_write:
+            service_result, owner_result = await asyncio.gather(
+                db.post("restaurant_services", service_data, return_rep=True),
+                owner_write
+            )
+            if not owner_result:
+                print(f"⚠️ Warning: Could not create restaurant_owner link")
+            else:
+                print(f"✅ Restaurant owner link created")
+        else:
+            service_result = await db.post("restaurant_services", service_data, return_rep=True)
+
         if not service_result:
             raise HTTPException(status_code=400, detail="Ошибка создания сервиса ресторана")
 
         print(f"✅ Service created: {service_id}")
 
-        print(f"📝 Creating service_capacity...")
+        print(f"📝 Creating service_capacity and discount_rules...")
         capacity_data = {
             "service_id": service_id,
             "restaurant_id": restaurant_id,
@@ -352,13 +478,6 @@ async def create_restaurant(
             "date": None
         }
 
-        capacity_result = await db.post("service_capacity", capacity_data, return_rep=True)
-        if not capacity_result:
-            raise HTTPException(status_code=400, detail="Ошибка создания вместимости")
-
-        print(f"✅ Capacity created")
-
-        print(f"📝 Creating discount_rules...")
         today = datetime.now().date()
         end_date = today + timedelta(days=30)
 
@@ -374,11 +493,22 @@ async def create_restaurant(
             "valid_to": end_date.isoformat()
         }
 
-        timeslot_result = await db.post("discount_rules", timeslot_data, return_rep=True)
+        # Вместимость и скидка зависят только от сервиса - одним раундом
+        capacity_result, timeslot_result = await asyncio.gather(
+            db.post("service_capacity", capacity_data, return_rep=True),
+            db.post("discount_rules", timeslot_data, return_rep=True)
+        )
+        if not capacity_result:
+            raise HTTPException(status_code=400, detail="Ошибка создания вместимости")
+
+        print(f"✅ Capacity created")
+
         if not timeslot_result:
             raise HTTPException(status_code=400, detail="Ошибка создания скидки")
 
         print(f"✅ Discount rule created")
+        active_rules.apply(timeslot_result)
+        invalidate_cache(restaurant_id, rules_changed=True)
 
         photos_uploaded = 0
         photo_urls = []
@@ -421,6 +551,7 @@ async def create_restaurant(
                 data={"photos": photo_urls}
             )
             print(f"✅ Photos saved to restaurant: {len(photo_urls)} files")
+            catalog.invalidate()
         
         print(f"🎉 Restaurant created successfully: {restaurant_id}")
         return {
@@ -439,6 +570,99 @@ async def create_restaurant(
         raise HTTPException(status_code=400, detail=f"Ошибка создания: {str(e)}")
 
 
+@router.post("/import")
+async def import_restaurants(items: List[dict]):
+    """
+    Массовый импорт ресторанов (JSON массив).
+
+    Каждый объект - поля ресторана плюс необязательные:
+    time_start, time_end, discount, capacity_seats, slot_step_minutes.
+    Для всех ресторанов создаются сервис, вместимость и скидка на 30 дней -
+    всего три раунда bulk-запросов вместо 4 запросов на ресторан.
+    """
+    if not items:
+        raise HTTPException(status_code=400, detail="Список ресторанов пуст")
+
+    extra_fields = ("time_start", "time_end", "discount", "capacity_seats", "slot_step_minutes")
+    restaurant_rows = []
+    for item in items:
+        if not item.get("name"):
+            raise HTTPException(status_code=400, detail="У каждого ресторана должно быть name")
+        row = {k: v for k, v in item.items() if k not in extra_fields}
+        row.setdefault("photos", [])
+        restaurant_rows.append(row)
+
+    # 1️⃣ Рестораны
+    created = await db.bulk_insert("restaurants", restaurant_rows)
+    failed_indexes = {f["index"] for f in created["failed"]}
+    ok_indexes = [i for i in range(len(items)) if i not in failed_indexes]
+    # PostgREST возвращает вставленные строки в порядке входного массива
+    restaurant_ids = {i: row["id"] for i, row in zip(ok_indexes, created["inserted"])}
+
+    # 2️⃣ Сервисы (id генерируем сами, чтобы сразу ссылаться на них)
+    today = datetime.now().date()
+    service_rows, capacity_rows, rule_rows = [], [], []
+    for i, restaurant_id in restaurant_ids.items():
+        item = items[i]
+        service_id = str(uuid.uuid4())
+        time_start = item.get("time_start", "10:00:00")
+        time_end = item.get("time_end", "23:00:00")
+        service_rows.append({
+            "id": service_id,
+            "restaurant_id": restaurant_id,
+            "name": "Основной зал",
+            "start_time": time_start,
+            "end_time": time_end,
+            "slot_step_minutes": item.get("slot_step_minutes", 60),
+            "is_active": True
+        })
+        capacity_rows.append({
+            "service_id": service_id,
+            "restaurant_id": restaurant_id,
+            "capacity_seats": item.get("capacity_seats", 16),
+            "date": None
+        })
+        if item.get("discount") is not None:
+            rule_rows.append({
+                "service_id": service_id,
+                "restaurant_id": restaurant_id,
+                "time_start": time_start,
+                "time_end": time_end,
+                "discount": int(item["discount"]),
+                "description": "на все меню",
+                "is_active": True,
+                "valid_from": today.isoformat(),
+                "valid_to": (today + timedelta(days=30)).isoformat()
+            })
+
+    services = await db.bulk_insert("restaurant_services", service_rows, return_rep=False)
+
+    # 3️⃣ Вместимость и скидки параллельно
+    capacities, rules = await asyncio.gather(
+        db.bulk_insert("service_capacity", capacity_rows, return_rep=False),
+        db.bulk_insert("discount_rules", rule_rows, return_rep=False)
+    )
+
+    for restaurant_id in restaurant_ids.values():
+        invalidate_cache(restaurant_id, rules_changed=True)
+    # Вставка без return=representation: правила импортированных ресторанов - одним запросом
+    if settings.ACTIVE_RULES_ENABLED and active_rules.ready:
+        try:
+            await active_rules.reload(list(restaurant_ids.values()))
+        except Exception as e:
+            log.warning("Active rules reload after import failed: %s", e)
+
+    return {
+        "success": not (created["failed"] or services["failed"] or capacities["failed"] or rules["failed"]),
+        "imported": len(restaurant_ids),
+        "restaurant_ids": list(restaurant_ids.values()),
+        "failed": [{"index": f["index"], "error": f["error"]} for f in created["failed"]],
+        "failed_services": len(services["failed"]),
+        "failed_capacities": len(capacities["failed"]),
+        "failed_discount_rules": len(rules["failed"])
+    }
+
+
 @router.post("/{restaurant_id}/upload-photo")
 async def upload_restaurant_photo(restaurant_id: int, file: UploadFile = File(...)):
     """
@@ -473,6 +697,7 @@ async def upload_restaurant_photo(restaurant_id: int, file: UploadFile = File(..
         current_photos.append(public_url)
         
         await restaurant_service.update(restaurant_id, photos=current_photos)
+        catalog.invalidate()
         
         return {
             "success": True,
@@ -526,6 +751,7 @@ async def delete_restaurant_photo(restaurant_id: int, photo_index: int):
         photos.pop(photo_index)
         
         await restaurant_service.update(restaurant_id, photos=photos)
+        catalog.invalidate()
         
         return {
             "success": True,
@@ -678,6 +904,7 @@ async def update_restaurant(
             
             if success:
                 print(f"✅ Restaurant updated successfully")
+                catalog.invalidate()
             else:
                 print(f"⚠️ Failed to update restaurant")
         
@@ -732,6 +959,8 @@ async def delete_restaurant(restaurant_id: int):
         )
         print(f"✅ Deleted restaurant")
         
+        active_rules.discard_restaurant(restaurant_id)
+        invalidate_cache(restaurant_id, rules_changed=True)
         return {"success": True, "message": "Ресторан удален"}
     
     except Exception as e:
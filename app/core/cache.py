@@ -0,0 +1,164 @@
+"""
+Cache module
+Bounded async cache: LRU + TTL, tag index for O(1) invalidation and
+per-key locks against cache stampede
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+
+class TaggedCache:
+    """
+    LRU + TTL кэш для результатов async вычислений.
+
+    - не больше max_entries ключей (вытесняется самый давно использованный)
+    - запись живёт ttl секунд
+    - у ключа есть тег (например restaurant_id): invalidate(tag) удаляет
+      все его ключи без перебора всего кэша
+    - на промахе вычисление по ключу выполняет один вызывающий, остальные
+      ждут его результат (per-key lock)
+    - результат вычисления, начатого до invalidate(tag), не сохраняется
+      (поколение тега), чтобы не вернуть в кэш устаревшие данные
+
+    Значения отдаются всем вызывающим как есть - не изменяйте их.
+    Исключение из compute не кэшируется и пробрасывается.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Hashable, Any]]" = OrderedDict()
+        self._tags: Dict[Hashable, Set[Hashable]] = {}
+        self._generations: Dict[Hashable, int] = {}
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+        self._lock_users: Dict[Hashable, int] = {}
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        expires_at, _, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return
+        tag = entry[1]
+        keys = self._tags.get(tag)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+    def _store(self, key: Hashable, tag: Hashable, value: Any) -> None:
+        self._remove(key)
+        self._data[key] = (time.monotonic() + self.ttl, tag, value)
+        self._tags.setdefault(tag, set()).add(key)
+        while len(self._data) > self.max_entries:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Значение или None (счётчики hit/miss обновляются)"""
+        found, value = self._lookup(key)
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return value if found else None
+
+    def generation(self, tag: Hashable) -> Tuple[int, int]:
+        """Токен поколения тега: снять до вычисления, передать в put()"""
+        return (self._epoch, self._generations.get(tag, 0))
+
+    def put(self, key: Hashable, tag: Hashable, value: Any, generation: Optional[Tuple[int, int]] = None) -> bool:
+        """Сохранить значение; False, если тег инвалидировали после снятия generation"""
+        if generation is not None and generation != self.generation(tag):
+            return False
+        self._store(key, tag, value)
+        return True
+
+    async def get_or_compute(self, key: Hashable, tag: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Значение из кэша или результат compute() (один compute на ключ одновременно)"""
+        found, value = self._lookup(key)
+        if found:
+            self.hits += 1
+            return value
+
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        elif lock.locked():
+            self.waits += 1
+        self._lock_users[key] = self._lock_users.get(key, 0) + 1
+
+        try:
+            async with lock:
+                # Пока ждали lock, значение мог посчитать другой запрос
+                found, value = self._lookup(key)
+                if found:
+                    self.hits += 1
+                    return value
+
+                self.misses += 1
+                generation = self.generation(tag)
+                value = await compute()
+                self.put(key, tag, value, generation)
+                return value
+        finally:
+            # Lock живёт, пока им кто-то пользуется: словарь не растёт с числом ключей
+            self._lock_users[key] -= 1
+            if not self._lock_users[key]:
+                del self._lock_users[key]
+                del self._locks[key]
+
+    def invalidate(self, tag: Hashable) -> int:
+        """Удалить все ключи тега; возвращает число удалённых"""
+        self._generations[tag] = self._generations.get(tag, 0) + 1
+        keys = self._tags.pop(tag, set())
+        for key in keys:
+            self._data.pop(key, None)
+        self.invalidations += 1
+        return len(keys)
+
+    def clear(self) -> None:
+        self._epoch += 1
+        self._generations.clear()
+        self._data.clear()
+        self._tags.clear()
+        self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "stampede_waits": self.waits,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "tags": len(self._tags)
+        }
@@ -19,12 +19,48 @@ class Settings(BaseSettings):
     SUPABASE_URL: str = ""
     SUPABASE_ANON_KEY: str = ""
     SUPABASE_SERVICE_KEY: str = ""
-    
+
+    # HTTP pool for Supabase (один клиент на всё приложение)
+    SUPABASE_HTTP2: bool = False
+    SUPABASE_MAX_CONNECTIONS: int = 100
+    SUPABASE_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    SUPABASE_KEEPALIVE_EXPIRY: float = 30.0  # seconds
+    SUPABASE_CONNECT_TIMEOUT: float = 5.0  # seconds
+    SUPABASE_TIMEOUT: float = 10.0  # seconds, REST/RPC/auth
+    SUPABASE_STORAGE_TIMEOUT: float = 30.0  # seconds, uploads
+    SUPABASE_COALESCE_READS: bool = True  # single-flight для одинаковых GET/RPC
+    SUPABASE_ADAPTIVE_TIMEOUTS: bool = True  # таймаут чтения = p99 таблицы * multiplier
+    SUPABASE_TIMEOUT_MIN: float = 1.0  # seconds, нижняя граница адаптивного таймаута
+    SUPABASE_TIMEOUT_MULTIPLIER: float = 3.0
+    SUPABASE_LATENCY_WINDOW: int = 256  # замеров в скользящем окне на таблицу
+    SUPABASE_HEDGE_READS: bool = False  # второй запрос после p95 таблицы
+    SUPABASE_HEDGE_MIN_DELAY: float = 0.05  # seconds
+    SUPABASE_READ_RETRIES: int = 1
+    SUPABASE_RETRY_BUDGET_RATIO: float = 0.1  # retries/hedges <= 10% трафика
+
+    # Database backend: supabase | memory (in-process PostgREST для тестов и бенчмарков)
+    DB_BACKEND: str = "supabase"
+    MEMORY_DB_LATENCY_MS: float = 0.0  # искусственная задержка на каждый запрос
+    MEMORY_DB_JITTER_MS: float = 0.0  # + случайные 0..jitter
+    MEMORY_DB_SEED: str = ""  # JSON фикстура {"table": [rows]}
+
+    # Tracing (Server-Timing, гистограммы по маршрутам в /metrics)
+    TRACING_ENABLED: bool = True
+    TRACE_ROUTE_WINDOW: int = 512  # запросов в скользящем окне на маршрут
+    TRACE_SLOW_REQUEST_MS: float = 1000.0  # медленный запрос -> warning со списком вызовов
+    TRACE_MAX_DB_CALLS: int = 20  # больше вызовов на запрос -> warning (N+1)
+
     # Server Configuration
     HOST: str = "127.0.0.1"
     PORT: int = 8000
     DEBUG: bool = True
     
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVELS: str = ""  # per-module: "app.core.database=DEBUG,app.api.bookings=WARNING"
+    LOG_FORMAT: str = "json"  # json | text
+    LOG_DEBUG_SAMPLE_RATE: float = 0.1  # доля high-volume DEBUG событий, попадающих в лог
+    
     # Frontend Configuration (для CORS)
     FRONTEND_URL: str = "http://localhost:3000"
     
@@ -40,9 +76,46 @@ class Settings(BaseSettings):
     IMAGE_QUALITY: int = 85
     IMAGE_MAX_WIDTH: int = 1920
     
+    # Listing projection (колонки для /api/restaurants/ - без description и т.п.)
+    RESTAURANT_LIST_COLUMNS: str = "id,name,category,city,address,phone,cuisine,rating,avg_check,popularity,photos"
+    LISTING_PAGE_SIZE: int = 20  # page_size по умолчанию для листинга с курсором
+    LISTING_MAX_PAGE_SIZE: int = 100
+    
+    # Catalog snapshot (рестораны + discount_rules в памяти для листинга)
+    CATALOG_ENABLED: bool = True
+    CATALOG_REFRESH_SECONDS: float = 60.0  # максимальный возраст снимка
+    
+    # Active rules (действующие сегодня discount_rules для листинга, app/services/active_rules.py)
+    ACTIVE_RULES_ENABLED: bool = True
+    ACTIVE_RULES_RELOAD_SECONDS: float = 300.0  # полная перезагрузка: изменения других процессов
+    
+    # Slot cache (LRU + TTL, инвалидация по ресторану)
+    SLOT_CACHE_TTL_SECONDS: float = 300.0
+    SLOT_CACHE_MAX_ENTRIES: int = 4096
+    SLOT_RANGE_MAX_DAYS: int = 31  # окно /available-slots/range
+    NEXT_SLOTS_MAX_IDS: int = 300  # ресторанов в /api/restaurants/next-slots
+    HEATMAP_MAX_DAYS: int = 62  # окно /api/bookings/occupancy-heatmap
+    
+    # Discount index (скомпилированные discount_rules, сброс через /discount_rules)
+    DISCOUNT_INDEX_TTL_SECONDS: float = 3600.0
+    DISCOUNT_INDEX_MAX_RESTAURANTS: int = 4096
+    
+    # Availability store (материализованная занятость для /available-slots)
+    AVAILABILITY_STORE_ENABLED: bool = True
+    AVAILABILITY_MAX_DAYS: int = 4096  # пар (ресторан, день) в памяти; ~40 КБ на день (массивы + слоты) - до ~160 МБ
+    AVAILABILITY_RECONCILE_SECONDS: float = 300.0  # фоновая сверка с базой, 0 - выключена
+    
     # Booking settings
     DEFAULT_SLOT_DURATION: int = 60  # minutes
     DEFAULT_PARTY_SIZE: int = 2
+    BOOKING_CAPACITY_CHECK: bool = True  # резервирование мест при создании брони
+    # Порог загрузки слота (гости / capacity), один для выдачи и для брони:
+    # слот доступен, пока load < SLOT_MAX_LOAD; бронь отклоняется, если
+    # после неё load > SLOT_MAX_LOAD (в занятый слот бронь не пройдёт)
+    SLOT_MAX_LOAD: float = 0.9
+    # Postgres функция атомарной брони; пусто - insert + проверка (строго только
+    # в одном процессе). При нескольких воркерах задайте её
+    BOOKING_RESERVE_RPC: str = ""
     
     class Config:
         env_file = ".env"
@@ -110,7 +183,9 @@ print(f"✅ Debug: {settings.DEBUG}")
 print("="*50 + "\n")
 
 # Validate critical settings
-if not settings.SUPABASE_URL or not settings.SUPABASE_ANON_KEY:
+if settings.DB_BACKEND == "memory":
+    print("🧪 DB_BACKEND=memory: Supabase REST/Storage served from process memory")
+elif not settings.SUPABASE_URL or not settings.SUPABASE_ANON_KEY:
     print("⚠️  WARNING: Supabase credentials not fully configured!")
     print("   Please check your .env file and ensure:")
     print("   - SUPABASE_URL is set")
@@ -2,9 +2,34 @@
 Database module
 Supabase async client for REST API operations
 """
+import asyncio
 import httpx
-from typing import Optional, List, Dict, Any
+import orjson
+import logging
+import time
+from typing import Optional, List, Dict, Any, AsyncIterator
 from app.core.config import settings
+from app.core.http import get_http_client, build_timeout
+from app.core.singleflight import SingleFlight
+from app.core.latency import LatencyTracker, RetryBudget
+from app.core.query import Query
+from app.core.logger import get_logger
+
+
+log = get_logger(__name__)
+
+# bulk_insert делит чанк пополам только на ошибках данных
+_SPLIT_STATUSES = (400, 409, 422)
+
+
+def _decode(resp: httpx.Response) -> Any:
+    """Тело ответа -> Python объекты (orjson, один проход по байтам)"""
+    return orjson.loads(resp.content)
+
+
+def _encode(data: Any) -> bytes:
+    """Тело запроса в JSON (orjson; date/datetime/UUID сериализуются сами)"""
+    return orjson.dumps(data, default=str)
 
 
 class SupabaseClient:
@@ -20,12 +45,34 @@ class SupabaseClient:
     
     def __init__(self):
         """Initialize Supabase client with credentials from settings"""
+        self.backend = settings.DB_BACKEND
         self.url = settings.SUPABASE_URL
         self.key = settings.SUPABASE_ANON_KEY
-        self.timeout = 10.0
-        
+        if self.backend == "memory":
+            # Все запросы перехватывает MemoryTransport, URL нужен только для формы запроса
+            self.url = self.url or "http://memory.local"
+            self.key = self.key or "memory"
+        self.timeout = build_timeout(settings.SUPABASE_TIMEOUT)
+        self.storage_timeout = build_timeout(settings.SUPABASE_STORAGE_TIMEOUT)
+        self.coalesce_reads = settings.SUPABASE_COALESCE_READS
+        self.singleflight = SingleFlight()
+        self.hedge_reads = settings.SUPABASE_HEDGE_READS
+        self.adaptive_timeouts = settings.SUPABASE_ADAPTIVE_TIMEOUTS
+        self.read_retries = settings.SUPABASE_READ_RETRIES
+        self.latency = LatencyTracker(
+            window=settings.SUPABASE_LATENCY_WINDOW,
+            min_timeout=settings.SUPABASE_TIMEOUT_MIN,
+            max_timeout=settings.SUPABASE_TIMEOUT,
+            multiplier=settings.SUPABASE_TIMEOUT_MULTIPLIER,
+            min_hedge_delay=settings.SUPABASE_HEDGE_MIN_DELAY
+        )
+        self.retry_budget = RetryBudget(ratio=settings.SUPABASE_RETRY_BUDGET_RATIO)
+        self.hedges = 0
+        self.hedge_wins = 0
+
         if not self.url or not self.key:
-            raise ValueError("Supabase credentials not configured in .env file")
+            # Не падаем при импорте: запросы вернут None, /health покажет "not configured"
+            log.warning("Supabase credentials not configured, database calls will fail")
     
     def get_headers(self) -> Dict[str, str]:
         """Get HTTP headers for Supabase requests"""
@@ -34,24 +81,116 @@ class SupabaseClient:
             "Authorization": f"Bearer {self.key}",
             "Content-Type": "application/json"
         }
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Общий пул соединений (keep-alive), см. app/core/http.py"""
+        return get_http_client()
+
+    async def _coalesced(self, key: tuple, send) -> httpx.Response:
+        """
+        Выполнить идемпотентное чтение через single-flight.
+
+        Все участники получают один и тот же Response; каждый сам
+        декодирует JSON, поэтому мутации результата не пересекаются.
+        """
+        if not self.coalesce_reads:
+            return await send()
+        return await self.singleflight.do(key, send)
+
+    async def _timed_get(self, table: str, url: str, timeout: httpx.Timeout) -> httpx.Response:
+        """GET с записью латентности в гистограмму таблицы"""
+        started = time.perf_counter()
+        try:
+            resp = await self.http.get(url, headers=self.get_headers(), timeout=timeout)
+        except httpx.TimeoutException:
+            # Таймаут тоже замер: иначе при деградации таймаут никогда не вырастет
+            self.latency.record(table, time.perf_counter() - started)
+            raise
+        if resp.status_code < 500:
+            self.latency.record(table, time.perf_counter() - started)
+        return resp
+
+    async def _hedged_get(self, table: str, url: str, timeout: httpx.Timeout) -> httpx.Response:
+        """
+        Hedged request: если ответа нет дольше p95 таблицы, отправляем
+        второй такой же запрос и берём тот, что ответит первым.
+        """
+        primary = asyncio.ensure_future(self._timed_get(table, url, timeout))
+        delay = self.latency.hedge_delay(table)
+        if delay is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not self.retry_budget.try_spend():
+            return await primary
+
+        self.hedges += 1
+        secondary = asyncio.ensure_future(self._timed_get(table, url, timeout))
+        pending = {primary, secondary}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is secondary:
+                            self.hedge_wins += 1
+                        return task.result()
+            # Оба запроса упали - отдаём ошибку основного
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _read(self, table: str, url: str) -> httpx.Response:
+        """
+        Идемпотентное чтение: адаптивный таймаут, hedging и повтор
+        при таймауте/обрыве соединения в пределах retry budget.
+        """
+        if self.adaptive_timeouts:
+            timeout = build_timeout(self.latency.timeout_for(table))
+        else:
+            timeout = self.timeout
+        send = self._hedged_get if self.hedge_reads else self._timed_get
+
+        self.retry_budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                return await send(table, url, timeout)
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                attempt += 1
+                if attempt > self.read_retries or not self.retry_budget.try_spend():
+                    raise
+                log.warning("Retrying database read", extra={"table": table, "attempt": attempt, "error": repr(e)})
+
+    def latency_stats(self) -> Dict[str, Any]:
+        """Гистограммы латентности, hedging и retry budget для /metrics"""
+        return {
+            "tables": self.latency.stats(),
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "retry_budget": self.retry_budget.stats()
+        }
     
     # --- МЕТОДЫ ДЛЯ РАБОТЫ С ДАННЫМИ ---
 
+    def query(self, table: str) -> Query:
+        """Typed query builder: db.query("restaurants").select("id", "name").eq("city", c)"""
+        return Query(self, table)
+
     async def get(
         self, 
         table: str, 
         filters: Optional[Dict[str, str]] = None, 
         select: str = "*",
         order: Optional[str] = None,
-        limit: Optional[int] = None
+        limit: Optional[int] = None,
+        offset: Optional[int] = None
     ) -> Optional[List[Dict[str, Any]]]:
         """GET request to Supabase table"""
         url = f"{self.url}/rest/v1/{table}?select={select}"
         
-        print(f"=== DEBUG db.get ===")
-        print(f"Table: '{table}'")
-        print(f"Filters: {filters}")
-        
         if filters:
             for key, value in filters.items():
                 url += f"&{key}={value}"
@@ -59,23 +198,126 @@ class SupabaseClient:
             url += f"&order={order}"
         if limit:
             url += f"&limit={limit}"
+        if offset:
+            url += f"&offset={offset}"
         
-        print(f"URL: {url}")
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("db.get", extra={"table": table, "filters": filters, "url": url, "sampled": True})
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout ) as client:
-                resp = await client.get(url, headers=self.get_headers())
-                if resp.status_code == 200:
-                    return resp.json()
-                print(f"⚠️  Supabase GET error [{resp.status_code}]: {resp.text}")
-                return None
+            key = ("get", table, tuple(sorted((filters or {}).items())), select, order, limit, offset)
+            resp = await self._coalesced(key, lambda: self._read(table, url))
+            if resp.status_code == 200:
+                return _decode(resp)
+            log.warning("Supabase GET error", extra={"table": table, "status": resp.status_code, "body": resp.text})
+            return None
         except httpx.TimeoutException:
-            print(f"❌ Database GET timeout for table '{table}'" )
+            log.error("Database GET timeout", extra={"table": table})
             return None
         except Exception as e:
-            print(f"❌ Database GET error: {e}")
+            log.error("Database GET error: %s", e, extra={"table": table})
             return None
     
+    async def iter_rows(
+        self,
+        table: str,
+        filters: Optional[Dict[str, str]] = None,
+        select: str = "*",
+        order: Optional[str] = None,
+        page_size: int = 1000,
+        keyset: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Постраничное чтение таблицы без лимита на общее число строк.
+
+        - keyset="id": keyset paging (order=id.asc, and=(id.gt.<last>)),
+          стабильно при вставках и не деградирует на глубоких страницах
+        - иначе offset paging с `order` (по умолчанию id.asc)
+
+        В памяти держится одна страница. Ошибка чтения страницы
+        поднимает RuntimeError, чтобы строки не терялись молча.
+
+        Пример:
+            async for booking in db.iter_rows("bookings", {"restaurant_id": "eq.1"}, keyset="id"):
+                ...
+        """
+        filters = dict(filters or {})
+        if keyset:
+            order = f"{keyset}.asc"
+        elif not order:
+            order = "id.asc"
+
+        offset = 0
+        last_key = None
+        while True:
+            page_filters = filters
+            if keyset and last_key is not None:
+                value = f'"{last_key}"' if isinstance(last_key, str) else last_key
+                condition = f"{keyset}.gt.{value}"
+                existing = filters.get("and")
+                page_filters = {
+                    **filters,
+                    "and": f"({existing[1:-1]},{condition})" if existing else f"({condition})"
+                }
+
+            rows = await self.get(
+                table,
+                filters=page_filters,
+                select=select,
+                order=order,
+                limit=page_size,
+                offset=None if keyset else offset
+            )
+            if rows is None:
+                raise RuntimeError(f"Failed to read page from '{table}' (offset={offset}, after={last_key})")
+
+            for row in rows:
+                yield row
+
+            if len(rows) < page_size:
+                return
+            offset += len(rows)
+            if keyset:
+                last_key = rows[-1].get(keyset)
+                if last_key is None:
+                    raise RuntimeError(f"Keyset column '{keyset}' missing from select on '{table}'")
+
+    async def count(
+        self,
+        table: str,
+        filters: Optional[Dict[str, str]] = None,
+        method: str = "exact"
+    ) -> Optional[int]:
+        """
+        Количество строк через Prefer: count=exact|planned|estimated.
+
+        planned/estimated берут оценку из статистики Postgres и не
+        сканируют таблицу - подходят для больших таблиц.
+        """
+        if method not in ("exact", "planned", "estimated"):
+            raise ValueError(f"Unknown count method: {method}")
+
+        url = f"{self.url}/rest/v1/{table}?select=*"
+        for key, value in (filters or {}).items():
+            url += f"&{key}={value}"
+        headers = self.get_headers()
+        headers["Prefer"] = f"count={method}"
+
+        try:
+            resp = await self.http.head(url, headers=headers, timeout=self.timeout)
+            if resp.status_code not in (200, 206):
+                log.warning("Supabase COUNT error", extra={"table": table, "status": resp.status_code})
+                return None
+            # Content-Range: 0-24/3573 или */3573
+            total = resp.headers.get("content-range", "").rsplit("/", 1)[-1]
+            return int(total) if total.isdigit() else None
+        except httpx.TimeoutException:
+            log.error("Database COUNT timeout", extra={"table": table})
+            return None
+        except Exception as e:
+            log.error("Database COUNT error: %s", e, extra={"table": table})
+            return None
+
     async def post(
         self, 
         table: str, 
@@ -89,19 +331,104 @@ class SupabaseClient:
             headers["Prefer"] = "return=representation"
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout ) as client:
-                resp = await client.post(url, json=data, headers=headers)
-                if resp.status_code in (200, 201):
-                    return resp.json() if return_rep else [{"success": True}]
-                print(f"⚠️  Supabase POST error [{resp.status_code}]: {resp.text}")
-                return None
+            resp = await self.http.post(url, content=_encode(data), headers=headers, timeout=self.timeout)
+            if resp.status_code in (200, 201):
+                return _decode(resp) if return_rep else [{"success": True}]
+            log.warning("Supabase POST error", extra={"table": table, "status": resp.status_code, "body": resp.text})
+            return None
         except httpx.TimeoutException:
-            print(f"❌ Database POST timeout for table '{table}'" )
+            log.error("Database POST timeout", extra={"table": table})
             return None
         except Exception as e:
-            print(f"❌ Database POST error: {e}")
+            log.error("Database POST error: %s", e, extra={"table": table})
             return None
     
+    async def bulk_insert(
+        self,
+        table: str,
+        rows: List[Dict[str, Any]],
+        on_conflict: Optional[str] = None,
+        chunk_size: int = 500,
+        concurrency: int = 4,
+        return_rep: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Массовая вставка / upsert JSON-массивами.
+
+        - строки режутся на чанки по chunk_size, до `concurrency` чанков параллельно
+        - on_conflict="col1,col2" включает upsert (Prefer: resolution=merge-duplicates)
+        - отсутствующие в строке колонки получают DEFAULT (Prefer: missing=default)
+        - если чанк отклонён из-за данных (400/409/422), он делится пополам,
+          пока не останутся отдельные плохие строки; остальные вставляются.
+          Любой другой ответ (401/403/404/429, 5xx) или ошибка сети - весь
+          чанк в failed с одной ошибкой
+
+        Returns:
+            {"inserted": [строки из ответа], "failed": [{"index", "row", "error"}]}
+        """
+        if not rows:
+            return {"inserted": [], "failed": []}
+
+        columns = []
+        for row in rows:
+            for column in row:
+                if column not in columns:
+                    columns.append(column)
+
+        url = f"{self.url}/rest/v1/{table}?columns={','.join(columns)}"
+        if on_conflict:
+            url += f"&on_conflict={on_conflict}"
+
+        prefer = ["return=representation" if return_rep else "return=minimal", "missing=default"]
+        if on_conflict:
+            prefer.append("resolution=merge-duplicates")
+        headers = self.get_headers()
+        headers["Prefer"] = ",".join(prefer)
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        inserted: Dict[int, List[Dict[str, Any]]] = {}
+        failed: List[Dict[str, Any]] = []
+
+        async def send_chunk(start: int, chunk: List[Dict[str, Any]]) -> None:
+            async with semaphore:
+                try:
+                    resp = await self.http.post(url, content=_encode(chunk), headers=headers, timeout=self.timeout)
+                except httpx.HTTPError as e:
+                    error, retry_split = f"{type(e).__name__}: {e}", False
+                else:
+                    if resp.status_code in (200, 201):
+                        inserted[start] = _decode(resp) if return_rep else []
+                        return
+                    error = f"[{resp.status_code}] {resp.text}"
+                    # Ошибка в данных (400/409/422) - делим чанк до плохих строк.
+                    # Авторизация, таблица, rate limit, 5xx, сеть - весь чанк
+                    # падает одной ошибкой: деление только умножило бы запросы
+                    retry_split = resp.status_code in _SPLIT_STATUSES
+
+            if retry_split and len(chunk) > 1:
+                middle = len(chunk) // 2
+                await asyncio.gather(
+                    send_chunk(start, chunk[:middle]),
+                    send_chunk(start + middle, chunk[middle:])
+                )
+                return
+
+            log.warning("Supabase BULK INSERT chunk failed", extra={"table": table, "rows": len(chunk), "error": error})
+            failed.extend(
+                {"index": start + i, "row": row, "error": error}
+                for i, row in enumerate(chunk)
+            )
+
+        await asyncio.gather(*(
+            send_chunk(start, rows[start:start + chunk_size])
+            for start in range(0, len(rows), chunk_size)
+        ))
+
+        return {
+            "inserted": [row for start in sorted(inserted) for row in inserted[start]],
+            "failed": sorted(failed, key=lambda f: f["index"])
+        }
+    
     async def patch(
         self, 
         table: str, 
@@ -114,17 +441,16 @@ class SupabaseClient:
         url += filter_str
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout ) as client:
-                resp = await client.patch(url, json=data, headers=self.get_headers())
-                if resp.status_code in (200, 204):
-                    return True
-                print(f"⚠️  Supabase PATCH error [{resp.status_code}]: {resp.text}")
-                return False
+            resp = await self.http.patch(url, content=_encode(data), headers=self.get_headers(), timeout=self.timeout)
+            if resp.status_code in (200, 204):
+                return True
+            log.warning("Supabase PATCH error", extra={"table": table, "status": resp.status_code, "body": resp.text})
+            return False
         except httpx.TimeoutException:
-            print(f"❌ Database PATCH timeout for table '{table}'" )
+            log.error("Database PATCH timeout", extra={"table": table})
             return False
         except Exception as e:
-            print(f"❌ Database PATCH error: {e}")
+            log.error("Database PATCH error: %s", e, extra={"table": table})
             return False
 
     async def update(
@@ -138,27 +464,25 @@ class SupabaseClient:
         filter_str = "&".join([f"{k}={v}" for k, v in filters.items()])
         url += filter_str
         
-        print(f"\n=== DEBUG db.update ===")
-        print(f"Table: '{table}'")
-        print(f"Filters: {filters}")
-        print(f"Data: {data}")
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("db.update", extra={"table": table, "filters": filters, "data": data})
         
         headers = self.get_headers()
         headers["Prefer"] = "return=representation"
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout ) as client:
-                resp = await client.patch(url, json=data, headers=headers)
-                if resp.status_code == 200:
-                    print(f"✅ Updated {len(resp.json())} record(s)")
-                    return resp.json()
-                print(f"⚠️  Supabase UPDATE error [{resp.status_code}]: {resp.text}")
-                return None
+            resp = await self.http.patch(url, content=_encode(data), headers=headers, timeout=self.timeout)
+            if resp.status_code == 200:
+                rows = _decode(resp)
+                log.debug("db.update done", extra={"table": table, "rows": len(rows)})
+                return rows
+            log.warning("Supabase UPDATE error", extra={"table": table, "status": resp.status_code, "body": resp.text})
+            return None
         except httpx.TimeoutException:
-            print(f"❌ Database UPDATE timeout for table '{table}'" )
+            log.error("Database UPDATE timeout", extra={"table": table})
             return None
         except Exception as e:
-            print(f"❌ Database UPDATE error: {e}")
+            log.error("Database UPDATE error: %s", e, extra={"table": table})
             return None
     
     async def delete(self, table: str, filters: Dict[str, str]) -> bool:
@@ -168,48 +492,49 @@ class SupabaseClient:
         url += filter_str
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout ) as client:
-                resp = await client.delete(url, headers=self.get_headers())
-                if resp.status_code == 204:
-                    return True
-                print(f"⚠️  Supabase DELETE error [{resp.status_code}]: {resp.text}")
-                return False
+            resp = await self.http.delete(url, headers=self.get_headers(), timeout=self.timeout)
+            if resp.status_code == 204:
+                return True
+            log.warning("Supabase DELETE error", extra={"table": table, "status": resp.status_code, "body": resp.text})
+            return False
         except httpx.TimeoutException:
-            print(f"❌ Database DELETE timeout for table '{table}'" )
+            log.error("Database DELETE timeout", extra={"table": table})
             return False
         except Exception as e:
-            print(f"❌ Database DELETE error: {e}")
+            log.error("Database DELETE error: %s", e, extra={"table": table})
             return False
 
     # --- НОВЫЙ МЕТОД ДЛЯ RPC ---
-    async def rpc(self, function_name: str, params: dict) -> Optional[List[Dict[str, Any]]]:
+    async def rpc(self, function_name: str, params: dict, coalesce: bool = True) -> Optional[List[Dict[str, Any]]]:
         """
         Выполняет вызов удаленной процедуры (RPC) в Supabase.
+
+        coalesce=False - для функций, которые пишут: одинаковые параллельные
+        вызовы не должны схлопываться в один.
         """
         url = f"{self.url}/rest/v1/rpc/{function_name}"
         
-        print(f"=== DEBUG db.rpc ===")
-        print(f"Function: '{function_name}'")
-        print(f"Params: {params}")
-        print(f"URL: {url}")
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("db.rpc", extra={"function": function_name, "params": params, "sampled": True})
 
         try:
-            async with httpx.AsyncClient(timeout=self.timeout ) as client:
-                resp = await client.post(url, json=params, headers=self.get_headers())
+            body = orjson.dumps(params, option=orjson.OPT_SORT_KEYS, default=str)
+            send = lambda: self.http.post(url, content=body, headers=self.get_headers(), timeout=self.timeout)
+            if coalesce:
+                resp = await self._coalesced(("rpc", function_name, body), send)
+            else:
+                resp = await send()
                 
-                if resp.status_code == 200:
-                    print(f"✅ Supabase RPC success: Got {len(resp.json())} items")
-                    return resp.json()
+            if resp.status_code == 200:
+                return _decode(resp)
                 
-                print(f"⚠️  Supabase RPC error [{resp.status_code}]: {resp.text}")
-                return None
+            log.warning("Supabase RPC error", extra={"function": function_name, "status": resp.status_code, "body": resp.text})
+            return None
         except httpx.TimeoutException:
-            print(f"❌ Database RPC timeout for function '{function_name}'" )
+            log.error("Database RPC timeout", extra={"function": function_name})
             return None
-        except Exception as e:
-            print(f"❌ UNEXPECTED RPC error: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            log.exception("Unexpected RPC error", extra={"function": function_name})
             return None
 
     # --- МЕТОДЫ ДЛЯ РАБОТЫ С ХРАНИЛИЩЕМ (STORAGE) ---
@@ -230,19 +555,18 @@ class SupabaseClient:
         }
         
         try:
-            async with httpx.AsyncClient(timeout=30.0 ) as client:
-                resp = await client.post(url, content=file_bytes, headers=headers)
-                if resp.status_code in (200, 201):
-                    public_url = f"{self.url}/storage/v1/object/public/{bucket}/{path}"
-                    print(f"✅ File uploaded: {public_url}")
-                    return public_url
-                print(f"⚠️  Storage upload error [{resp.status_code}]: {resp.text}")
-                return None
+            resp = await self.http.post(url, content=file_bytes, headers=headers, timeout=self.storage_timeout)
+            if resp.status_code in (200, 201):
+                public_url = f"{self.url}/storage/v1/object/public/{bucket}/{path}"
+                log.info("File uploaded", extra={"bucket": bucket, "path": path})
+                return public_url
+            log.warning("Storage upload error", extra={"bucket": bucket, "path": path, "status": resp.status_code, "body": resp.text})
+            return None
         except httpx.TimeoutException:
-            print(f"❌ Storage upload timeout for '{path}'" )
+            log.error("Storage upload timeout", extra={"bucket": bucket, "path": path})
             return None
         except Exception as e:
-            print(f"❌ Storage upload error: {e}")
+            log.error("Storage upload error: %s", e, extra={"bucket": bucket, "path": path})
             return None
     
     async def storage_delete(self, bucket: str, path: str) -> bool:
@@ -254,18 +578,17 @@ class SupabaseClient:
         }
         
         try:
-            async with httpx.AsyncClient(timeout=10.0 ) as client:
-                resp = await client.delete(url, headers=headers)
-                if resp.status_code == 200:
-                    print(f"✅ File deleted: {path}")
-                    return True
-                print(f"⚠️  Storage delete error [{resp.status_code}]: {resp.text}")
-                return False
+            resp = await self.http.delete(url, headers=headers, timeout=self.timeout)
+            if resp.status_code == 200:
+                log.info("File deleted", extra={"bucket": bucket, "path": path})
+                return True
+            log.warning("Storage delete error", extra={"bucket": bucket, "path": path, "status": resp.status_code, "body": resp.text})
+            return False
         except httpx.TimeoutException:
-            print(f"❌ Storage delete timeout for '{path}'" )
+            log.error("Storage delete timeout", extra={"bucket": bucket, "path": path})
             return False
         except Exception as e:
-            print(f"❌ Storage delete error: {e}")
+            log.error("Storage delete error: %s", e, extra={"bucket": bucket, "path": path})
             return False
 
 # ============================================
@@ -0,0 +1,84 @@
+"""
+HTTP module
+Shared pooled httpx client for all upstream calls (Supabase REST, Storage, Auth)
+"""
+import importlib.util
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.tracing import TracingTransport
+
+log = get_logger(__name__)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    """HTTP/2 требует пакет h2 (httpx[http2])"""
+    return importlib.util.find_spec("h2") is not None
+
+
+def build_timeout(read: Optional[float] = None) -> httpx.Timeout:
+    """Timeout для конкретной операции: общий connect, свой read/write"""
+    read = settings.SUPABASE_TIMEOUT if read is None else read
+    return httpx.Timeout(
+        read,
+        connect=settings.SUPABASE_CONNECT_TIMEOUT,
+        pool=settings.SUPABASE_CONNECT_TIMEOUT
+    )
+
+
+def _create_client() -> httpx.AsyncClient:
+    if settings.DB_BACKEND == "memory":
+        # Импорт здесь: в продакшене модуль не нужен
+        from app.core.memory_db import memory_backend
+        transport: httpx.AsyncBaseTransport = memory_backend.transport()
+    else:
+        http2 = settings.SUPABASE_HTTP2
+        if http2 and not _http2_available():
+            log.warning("SUPABASE_HTTP2 enabled but 'h2' is not installed, falling back to HTTP/1.1")
+            http2 = False
+
+        transport = httpx.AsyncHTTPTransport(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.SUPABASE_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.SUPABASE_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.SUPABASE_KEEPALIVE_EXPIRY
+            )
+        )
+
+    if settings.TRACING_ENABLED:
+        transport = TracingTransport(transport)
+    return httpx.AsyncClient(transport=transport, timeout=build_timeout())
+
+
+async def open_http_client() -> httpx.AsyncClient:
+    """Открыть общий клиент (вызывается из lifespan приложения)"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _create_client()
+    return _client
+
+
+async def close_http_client() -> None:
+    """Закрыть общий клиент и все keep-alive соединения"""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Получить общий клиент.
+
+    Если lifespan ещё не отработал (скрипты, REPL), клиент создаётся лениво.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _create_client()
+    return _client
@@ -0,0 +1,124 @@
+"""
+Latency module
+Rolling latency histograms per table, adaptive timeouts and retry budget
+"""
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+
+class LatencyWindow:
+    """Скользящее окно последних N замеров (секунды) с ленивой сортировкой"""
+
+    def __init__(self, size: int):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._sorted: Optional[List[float]] = None
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self._sorted = None
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Квантиль (nearest-rank), None если замеров нет"""
+        if not self._samples:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self._samples)
+        idx = min(len(self._sorted) - 1, int(q * len(self._sorted)))
+        return self._sorted[idx]
+
+
+class LatencyTracker:
+    """
+    Латентность upstream запросов по таблицам.
+
+    - timeout_for(table): p99 * multiplier, в пределах [min_timeout, max_timeout]
+    - hedge_delay(table): p95, но не меньше min_hedge_delay
+    Пока замеров меньше min_samples, используются статические значения.
+    """
+
+    def __init__(
+        self,
+        window: int,
+        min_timeout: float,
+        max_timeout: float,
+        multiplier: float,
+        min_hedge_delay: float,
+        min_samples: int = 20
+    ):
+        self.window = window
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.multiplier = multiplier
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self._windows: Dict[str, LatencyWindow] = {}
+
+    def record(self, key: str, seconds: float) -> None:
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = LatencyWindow(self.window)
+        window.record(seconds)
+
+    def _quantile(self, key: str, q: float) -> Optional[float]:
+        window = self._windows.get(key)
+        if window is None or len(window) < self.min_samples:
+            return None
+        return window.quantile(q)
+
+    def timeout_for(self, key: str) -> float:
+        p99 = self._quantile(key, 0.99)
+        if p99 is None:
+            return self.max_timeout
+        return min(self.max_timeout, max(self.min_timeout, p99 * self.multiplier))
+
+    def hedge_delay(self, key: str) -> Optional[float]:
+        p95 = self._quantile(key, 0.95)
+        if p95 is None:
+            return None
+        return max(self.min_hedge_delay, p95)
+
+    def stats(self) -> Dict[str, Any]:
+        result = {}
+        for key, window in self._windows.items():
+            result[key] = {
+                "samples": len(window),
+                "p50_ms": round((window.quantile(0.5) or 0) * 1000, 1),
+                "p95_ms": round((window.quantile(0.95) or 0) * 1000, 1),
+                "p99_ms": round((window.quantile(0.99) or 0) * 1000, 1),
+                "timeout_s": round(self.timeout_for(key), 3)
+            }
+        return result
+
+
+class RetryBudget:
+    """
+    Бюджет повторов (token bucket, как retry budget в Finagle/gRPC).
+
+    Каждый обычный запрос добавляет `ratio` токена, каждый retry/hedge
+    тратит один. Так повторы не превышают ~ratio от трафика и не
+    умножают нагрузку на базу во время аварии.
+    """
+
+    def __init__(self, ratio: float, min_tokens: float = 10.0, max_tokens: float = 100.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = min_tokens
+        self.spent = 0
+        self.denied = 0
+
+    def deposit(self) -> None:
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            self.spent += 1
+            return True
+        self.denied += 1
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"tokens": round(self.tokens, 2), "spent": self.spent, "denied": self.denied}
@@ -0,0 +1,42 @@
+"""
+Locks module
+asyncio.Lock на ключ: словарь держит только ключи, которыми кто-то пользуется
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Hashable
+
+
+class KeyedLock:
+    """
+    Отдельный asyncio.Lock на каждый ключ (например (restaurant_id, date)).
+
+    Lock удаляется, когда его больше никто не держит и не ждёт, поэтому
+    число записей не растёт с числом ключей. Защищает только в пределах
+    процесса (одного event loop).
+    """
+
+    def __init__(self):
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+        self._users: Dict[Hashable, int] = {}
+        self.waits = 0
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable) -> AsyncIterator[None]:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        elif lock.locked():
+            self.waits += 1
+        self._users[key] = self._users.get(key, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._users[key] -= 1
+            if not self._users[key]:
+                del self._users[key]
+                del self._locks[key]
@@ -0,0 +1,557 @@
+"""
+Memory DB module
+In-process PostgREST stand-in: tables in memory behind an httpx transport,
+so SupabaseClient (coalescing, paging, bulk insert) runs unchanged offline
+"""
+import asyncio
+import inspect
+import random
+import re
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+import httpx
+import orjson
+
+from app.core.config import settings
+from app.core.logger import get_logger
+
+
+log = get_logger(__name__)
+
+# Параметры query string, которые не являются фильтрами
+_RESERVED_PARAMS = {"select", "order", "limit", "offset", "columns", "on_conflict"}
+
+_OPERATORS = {"eq", "neq", "gt", "gte", "lt", "lte", "like", "ilike", "in", "is"}
+
+Condition = Tuple[str, Any]  # ("filter", (column, op, value, negate)) | ("and"/"or", [conditions], negate)
+
+
+# ============================================
+# ПАРСИНГ ГРАММАТИКИ POSTGREST
+# ============================================
+
+def _split_top_level(text: str) -> List[str]:
+    """'a.eq.1,b.in.(1,2),c.eq."x,y"' -> ['a.eq.1', 'b.in.(1,2)', 'c.eq."x,y"']"""
+    parts, depth, quoted, escaped, current = [], 0, False, False, []
+    for ch in text:
+        if escaped:
+            current.append(ch)
+            escaped = False
+            continue
+        if ch == "\\":
+            current.append(ch)
+            escaped = True
+            continue
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and ch == ",":
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(ch)
+    if current:
+        parts.append("".join(current))
+    return [p for p in parts if p]
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return re.sub(r"\\(.)", r"\1", value[1:-1])
+    return value
+
+
+def _parse_operation(column: str, expression: str) -> Condition:
+    """'not.gte.5' / 'in.(1,2)' / 'is.null' -> condition"""
+    negate = False
+    if expression.startswith("not."):
+        negate, expression = True, expression[4:]
+    operator, _, value = expression.partition(".")
+    if operator not in _OPERATORS:
+        raise ValueError(f"Unsupported operator '{operator}' on column '{column}'")
+    if operator == "in":
+        value = [_unquote(v) for v in _split_top_level(value.strip()[1:-1])]
+    else:
+        value = _unquote(value)
+    return ("filter", (column, operator, value, negate))
+
+
+def _parse_logic(kind: str, body: str, negate: bool = False) -> Condition:
+    """and=(a.gt.1,or(b.eq.2,c.is.null)) -> дерево условий"""
+    conditions = []
+    for item in _split_top_level(body.strip()[1:-1]):
+        item_negate = item.startswith("not.")
+        stripped = item[4:] if item_negate else item
+        for nested in ("and", "or"):
+            if stripped.startswith(nested + "("):
+                conditions.append(_parse_logic(nested, stripped[len(nested):], item_negate))
+                break
+        else:
+            column, _, expression = item.partition(".")
+            conditions.append(_parse_operation(column, expression))
+    return (kind, conditions, negate)
+
+
+def parse_filters(params: List[Tuple[str, str]]) -> List[Condition]:
+    """Все фильтры запроса (query params без select/order/...) -> список условий (AND)"""
+    conditions = []
+    for key, value in params:
+        if key in _RESERVED_PARAMS:
+            continue
+        if key in ("and", "or", "not.and", "not.or"):
+            negate = key.startswith("not.")
+            conditions.append(_parse_logic(key.rsplit(".", 1)[-1], value, negate))
+        else:
+            conditions.append(_parse_operation(key, value))
+    return conditions
+
+
+@lru_cache(maxsize=256)
+def _like_regex(pattern: str, case_insensitive: bool) -> "re.Pattern[str]":
+    """PostgREST like: '*' и '%' - любая подстрока, '_' - один символ, '\\' экранирует"""
+    out, i = [], 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\" and i + 1 < len(pattern):
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+            continue
+        if ch in "*%":
+            out.append(".*")
+        elif ch == "_":
+            out.append(".")
+        else:
+            out.append(re.escape(ch))
+        i += 1
+    return re.compile("".join(out), re.DOTALL | (re.IGNORECASE if case_insensitive else 0))
+
+
+# ============================================
+# ВЫЧИСЛЕНИЕ УСЛОВИЙ
+# ============================================
+
+def _as_datetime(value: str) -> Optional[datetime]:
+    """ISO дата/время -> aware datetime (naive считаем UTC), иначе None"""
+    if len(value) < 10 or value[4] != "-":
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _comparable(row_value: Any, raw: str) -> Tuple[Any, Any]:
+    """Привести значение из строки и значение фильтра к одному типу"""
+    if isinstance(row_value, bool):
+        return row_value, raw.lower() == "true"
+    if isinstance(row_value, (int, float)):
+        try:
+            return row_value, float(raw)
+        except ValueError:
+            return str(row_value), raw
+    if isinstance(row_value, str):
+        left, right = _as_datetime(row_value), _as_datetime(raw)
+        if left is not None and right is not None:
+            return left, right
+        return row_value, raw
+    return orjson.dumps(row_value, default=str).decode(), raw
+
+
+def _match_filter(row: Dict[str, Any], column: str, operator: str, value: Any) -> bool:
+    current = row.get(column)
+    if operator == "is":
+        target = {"null": None, "true": True, "false": False}.get(str(value).lower(), value)
+        return current is target
+    if current is None:
+        return False  # NULL не проходит сравнения, как в SQL
+    if operator == "in":
+        return any(_eq(current, item) for item in value)
+    if operator in ("like", "ilike"):
+        return _like_regex(value, operator == "ilike").fullmatch(str(current)) is not None
+
+    left, right = _comparable(current, value)
+    try:
+        if operator == "eq":
+            return left == right
+        if operator == "neq":
+            return left != right
+        if operator == "gt":
+            return left > right
+        if operator == "gte":
+            return left >= right
+        if operator == "lt":
+            return left < right
+        if operator == "lte":
+            return left <= right
+    except TypeError:
+        return False
+    return False
+
+
+def _eq(current: Any, raw: str) -> bool:
+    left, right = _comparable(current, raw)
+    return left == right
+
+
+def _matches(row: Dict[str, Any], condition: Condition) -> bool:
+    kind = condition[0]
+    if kind == "filter":
+        column, operator, value, negate = condition[1]
+        return _match_filter(row, column, operator, value) != negate
+    _, conditions, negate = condition
+    combine = all if kind == "and" else any
+    return combine(_matches(row, c) for c in conditions) != negate
+
+
+def _sort_rows(rows: List[Dict[str, Any]], order: str) -> None:
+    """order=rating.desc.nullslast,id.asc (по умолчанию nulls last для asc, first для desc)"""
+    for item in reversed(_split_top_level(order)):
+        parts = item.split(".")
+        column = parts[0]
+        desc = "desc" in parts[1:]
+        if "nullsfirst" in parts[1:]:
+            nulls_first = True
+        elif "nullslast" in parts[1:]:
+            nulls_first = False
+        else:
+            nulls_first = desc
+        null_flag = int(nulls_first == desc)
+
+        def sort_key(row, column=column, null_flag=null_flag):
+            value = row.get(column)
+            if value is None:
+                return (null_flag, 0)
+            if isinstance(value, str):
+                parsed = _as_datetime(value)
+                if parsed is not None:
+                    return (1 - null_flag, parsed.timestamp())
+            return (1 - null_flag, value)
+
+        rows.sort(key=sort_key, reverse=desc)
+
+
+def _singular(table: str) -> str:
+    return table[:-1] if table.endswith("s") else table
+
+
+# ============================================
+# BACKEND
+# ============================================
+
+RpcHandler = Callable[["MemoryBackend", Dict[str, Any]], Union[Any, Awaitable[Any]]]
+
+
+class MemoryBackend:
+    """
+    Таблицы PostgREST в памяти процесса.
+
+    Поддерживает:
+    - фильтры eq/neq/gt/gte/lt/lte/like/ilike/in/is, not., and=(...)/or=(...)
+    - select с проекцией и embed по соглашению <table>_id
+    - order (asc/desc, nullsfirst/nullslast), limit, offset, Prefer: count=
+    - POST (return=representation/minimal, on_conflict, merge-duplicates), PATCH, DELETE
+    - RPC через register_rpc() и Storage (upload/delete)
+    - искусственную задержку latency + jitter на каждый запрос
+
+    Неизвестная таблица считается пустой. Значения хранятся как JSON
+    (даты - ISO строки), ответы сериализуются, поэтому вызывающий код
+    не может изменить данные хранилища через результат.
+
+    Пример:
+        backend = MemoryBackend(latency=0.02)
+        backend.load("restaurants", [{"id": 1, "name": "Del Papa"}])
+        client = httpx.AsyncClient(transport=backend.transport())
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.buckets: Dict[str, Dict[str, bytes]] = {}
+        self.rpcs: Dict[str, RpcHandler] = {}
+        self.requests = 0
+        self._sequences: Dict[str, int] = {}
+
+    # --- ДАННЫЕ ---
+
+    def load(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        """Заменить содержимое таблицы (строки копируются через JSON)"""
+        self.tables[table] = orjson.loads(orjson.dumps(rows, default=str))
+        ids = [row["id"] for row in self.tables[table] if isinstance(row.get("id"), int)]
+        self._sequences[table] = max(ids, default=0)
+
+    def load_json(self, path: str) -> None:
+        """Загрузить фикстуру {"table": [rows], ...}"""
+        with open(path, "rb") as f:
+            for table, rows in orjson.loads(f.read()).items():
+                self.load(table, rows)
+
+    def clear(self) -> None:
+        self.tables.clear()
+        self.buckets.clear()
+        self._sequences.clear()
+
+    def register_rpc(self, name: str, handler: RpcHandler) -> None:
+        """handler(backend, params) -> JSON-совместимый результат (можно async)"""
+        self.rpcs[name] = handler
+
+    def _table(self, table: str) -> List[Dict[str, Any]]:
+        return self.tables.setdefault(table, [])
+
+    def _next_id(self, table: str) -> int:
+        self._sequences[table] = self._sequences.get(table, 0) + 1
+        return self._sequences[table]
+
+    # --- ОПЕРАЦИИ ---
+
+    def select(self, table: str, params: List[Tuple[str, str]]) -> Tuple[List[Dict[str, Any]], int]:
+        """Строки после фильтров/сортировки/limit и общее число строк до limit"""
+        query = dict(params)
+        conditions = parse_filters(params)
+        rows = [row for row in self._table(table) if all(_matches(row, c) for c in conditions)]
+        if query.get("order"):
+            _sort_rows(rows, query["order"])
+        total = len(rows)
+        offset = int(query.get("offset") or 0)
+        if query.get("limit"):
+            rows = rows[offset:offset + int(query["limit"])]
+        elif offset:
+            rows = rows[offset:]
+        return [self._project(table, row, query.get("select", "*")) for row in rows], total
+
+    def _project(self, table: str, row: Dict[str, Any], select: str) -> Dict[str, Any]:
+        result: Dict[str, Any] = {}
+        for item in _split_top_level(select or "*"):
+            item = item.strip()
+            if item == "*":
+                result.update(row)
+            elif item.endswith(")") and "(" in item:
+                relation, columns = item[:-1].split("(", 1)
+                result[relation] = self._embed(table, row, relation, columns)
+            else:
+                column = item.split("::", 1)[0]
+                result[column] = row.get(column)
+        return result
+
+    def _embed(self, table: str, row: Dict[str, Any], relation: str, columns: str) -> Any:
+        """many-to-one по <relation>_id в строке, иначе one-to-many по <table>_id в relation"""
+        parent_key = f"{_singular(relation)}_id"
+        if parent_key in row:
+            for other in self._table(relation):
+                if other.get("id") == row[parent_key]:
+                    return self._project(relation, other, columns or "*")
+            return None
+        child_key = f"{_singular(table)}_id"
+        return [
+            self._project(relation, other, columns or "*")
+            for other in self._table(relation)
+            if other.get(child_key) == row.get("id")
+        ]
+
+    def insert(
+        self,
+        table: str,
+        rows: List[Dict[str, Any]],
+        columns: Optional[List[str]] = None,
+        on_conflict: Optional[List[str]] = None,
+        resolution: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        INSERT / upsert; конфликт без resolution поднимает KeyError (-> 409).
+        Запрос атомарен, как statement в Postgres: при ошибке таблица
+        остаётся как до него.
+        """
+        storage = self._table(table)
+        conflict_columns = on_conflict or (["id"] if resolution else [])
+        now = datetime.now(timezone.utc).isoformat()
+        written = []
+        length = len(storage)
+        merged: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []  # (строка, до merge)
+        try:
+            self._insert_rows(table, storage, rows, columns, conflict_columns, resolution, now, written, merged)
+        except Exception:
+            del storage[length:]
+            for existing, before in reversed(merged):
+                existing.clear()
+                existing.update(before)
+            # Выданные id не возвращаются, как и у sequence в Postgres
+            raise
+        return [dict(row) for row in written]
+
+    def _insert_rows(self, table, storage, rows, columns, conflict_columns, resolution, now, written, merged) -> None:
+        for source in rows:
+            row = {k: v for k, v in source.items() if columns is None or k in columns}
+            if row.get("id") is not None:
+                if any(existing.get("id") == row["id"] for existing in storage) and not conflict_columns:
+                    raise KeyError(f"duplicate key value violates unique constraint \"{table}_pkey\"")
+            existing = None
+            if conflict_columns and all(row.get(c) is not None for c in conflict_columns):
+                existing = next(
+                    (r for r in storage if all(r.get(c) == row[c] for c in conflict_columns)),
+                    None
+                )
+            if existing is not None:
+                if resolution == "merge-duplicates":
+                    merged.append((existing, dict(existing)))
+                    existing.update(row)
+                    written.append(existing)
+                elif resolution != "ignore-duplicates":
+                    raise KeyError(f"duplicate key value violates unique constraint on ({','.join(conflict_columns)})")
+                continue
+            if row.get("id") is None:
+                row["id"] = self._next_id(table)
+            elif isinstance(row["id"], int):
+                self._sequences[table] = max(self._sequences.get(table, 0), row["id"])
+            row.setdefault("created_at", now)
+            storage.append(row)
+            written.append(row)
+
+    def update(self, table: str, params: List[Tuple[str, str]], data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        conditions = parse_filters(params)
+        updated = []
+        for row in self._table(table):
+            if all(_matches(row, c) for c in conditions):
+                row.update(data)
+                updated.append(dict(row))
+        return updated
+
+    def delete(self, table: str, params: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        conditions = parse_filters(params)
+        kept, deleted = [], []
+        for row in self._table(table):
+            (deleted if all(_matches(row, c) for c in conditions) else kept).append(row)
+        self.tables[table] = kept
+        return deleted
+
+    # --- HTTP ---
+
+    def transport(self) -> "MemoryTransport":
+        return MemoryTransport(self)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        """Обработать запрос, адресованный Supabase (/rest/v1, /storage/v1)"""
+        self.requests += 1
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        path = request.url.path
+        try:
+            if path.startswith("/rest/v1/rpc/"):
+                return await self._handle_rpc(request, path[len("/rest/v1/rpc/"):])
+            if path.startswith("/rest/v1/"):
+                return self._handle_rest(request, path[len("/rest/v1/"):])
+            if path.startswith("/storage/v1/object/"):
+                return self._handle_storage(request, path[len("/storage/v1/object/"):])
+        except ValueError as e:
+            return _json_response(400, {"code": "PGRST100", "message": str(e)})
+        except KeyError as e:
+            return _json_response(409, {"code": "23505", "message": str(e.args[0])})
+        return _json_response(404, {"message": f"Memory backend does not serve {path}"})
+
+    def _handle_rest(self, request: httpx.Request, table: str) -> httpx.Response:
+        params = request.url.params.multi_items()
+        prefer = _parse_prefer(request.headers.get("prefer", ""))
+        method = request.method
+
+        if method in ("GET", "HEAD"):
+            rows, total = self.select(table, params)
+            offset = int(dict(params).get("offset") or 0)
+            headers = {}
+            if "count" in prefer:
+                headers["content-range"] = (
+                    f"{offset}-{offset + len(rows) - 1}/{total}" if rows else f"*/{total}"
+                )
+            if method == "HEAD":
+                return httpx.Response(200, headers=headers)
+            return _json_response(200, rows, headers)
+
+        representation = prefer.get("return") == "representation"
+        if method == "POST":
+            body = orjson.loads(request.content or b"[]")
+            rows = body if isinstance(body, list) else [body]
+            query = dict(params)
+            columns = query["columns"].split(",") if query.get("columns") else None
+            on_conflict = query["on_conflict"].split(",") if query.get("on_conflict") else None
+            written = self.insert(table, rows, columns, on_conflict, prefer.get("resolution"))
+            return _json_response(201, written) if representation else httpx.Response(201)
+        if method == "PATCH":
+            updated = self.update(table, params, orjson.loads(request.content or b"{}"))
+            return _json_response(200, updated) if representation else httpx.Response(204)
+        if method == "DELETE":
+            deleted = self.delete(table, params)
+            return _json_response(200, deleted) if representation else httpx.Response(204)
+        return _json_response(405, {"message": f"Method {method} not allowed"})
+
+    async def _handle_rpc(self, request: httpx.Request, name: str) -> httpx.Response:
+        handler = self.rpcs.get(name)
+        if handler is None:
+            return _json_response(404, {"code": "PGRST202", "message": f"Could not find the function {name}"})
+        result = handler(self, orjson.loads(request.content or b"{}"))
+        if inspect.isawaitable(result):
+            result = await result
+        return _json_response(200, result)
+
+    def _handle_storage(self, request: httpx.Request, path: str) -> httpx.Response:
+        if path.startswith("public/"):
+            path = path[len("public/"):]
+        bucket, _, name = path.partition("/")
+        files = self.buckets.setdefault(bucket, {})
+        if request.method == "POST":
+            files[name] = request.content
+            return _json_response(200, {"Key": f"{bucket}/{name}"})
+        if request.method == "DELETE":
+            files.pop(name, None)
+            return _json_response(200, {"message": "Successfully deleted"})
+        if request.method == "GET" and name in files:
+            return httpx.Response(200, content=files[name])
+        return _json_response(404, {"message": "Object not found"})
+
+
+class MemoryTransport(httpx.AsyncBaseTransport):
+    """httpx transport, который отдаёт запросы в MemoryBackend вместо сети"""
+
+    def __init__(self, backend: MemoryBackend):
+        self.backend = backend
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        return await self.backend.handle(request)
+
+
+def _parse_prefer(header: str) -> Dict[str, str]:
+    """'return=representation,count=exact' -> {"return": "representation", "count": "exact"}"""
+    prefer = {}
+    for item in header.split(","):
+        key, _, value = item.strip().partition("=")
+        if key:
+            prefer[key] = value
+    return prefer
+
+
+def _json_response(status_code: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+    return httpx.Response(
+        status_code,
+        content=orjson.dumps(payload, default=str),
+        headers={"content-type": "application/json", **(headers or {})}
+    )
+
+
+# ============================================
+# GLOBAL INSTANCE
+# ============================================
+
+memory_backend = MemoryBackend(
+    latency=settings.MEMORY_DB_LATENCY_MS / 1000,
+    jitter=settings.MEMORY_DB_JITTER_MS / 1000
+)
+
+if settings.MEMORY_DB_SEED:
+    memory_backend.load_json(settings.MEMORY_DB_SEED)
+    log.info("Memory backend seeded", extra={"path": settings.MEMORY_DB_SEED, "tables": len(memory_backend.tables)})
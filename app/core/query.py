@@ -0,0 +1,241 @@
+"""
+Query builder module
+Typed builder for PostgREST reads: projection, embedded resources,
+URL-encoded filters, in.() lists and ordering
+"""
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from urllib.parse import quote
+
+if TYPE_CHECKING:
+    from app.core.database import SupabaseClient
+
+
+# Символы, которые внутри in.(...) / and=(...) надо брать в двойные кавычки
+_RESERVED_CHARS = set(',.:()"\\ ')
+
+
+@lru_cache(maxsize=512)
+def compile_select(columns: Tuple[str, ...], embeds: Tuple[Tuple[str, Tuple[str, ...]], ...]) -> str:
+    """('id', 'name'), (('discount_rules', ('discount',)),) -> 'id,name,discount_rules(discount)'"""
+    parts = list(columns)
+    for relation, relation_columns in embeds:
+        parts.append(f"{relation}({','.join(relation_columns) or '*'})")
+    return ",".join(parts) or "*"
+
+
+@lru_cache(maxsize=512)
+def compile_order(order: Tuple[Tuple[str, bool, Optional[str]], ...]) -> Optional[str]:
+    """(('rating', True, 'nullslast'), ('id', False, None)) -> 'rating.desc.nullslast,id.asc'"""
+    if not order:
+        return None
+    parts = []
+    for column, desc, nulls in order:
+        item = f"{column}.{'desc' if desc else 'asc'}"
+        if nulls:
+            item += f".{nulls}"
+        parts.append(item)
+    return ",".join(parts)
+
+
+def encode_value(value: Any) -> str:
+    """Значение фильтра для query string (& % + # и пробелы не ломают URL)"""
+    if isinstance(value, bool):
+        value = "true" if value else "false"
+    return quote(str(value), safe="")
+
+
+def quote_item(value: Any) -> str:
+    """Элемент списка in.(...) / and=(...): в кавычках, если есть спецсимволы"""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    text = str(value)
+    if any(ch in _RESERVED_CHARS for ch in text):
+        text = '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    return text
+
+
+def escape_like(text: str) -> str:
+    """Экранировать %, _ и \\ в пользовательском тексте для (i)like, '*' убрать"""
+    return (
+        text.replace("\\", "\\\\")
+        .replace("%", "\\%")
+        .replace("_", "\\_")
+        .replace("*", "")
+    )
+
+
+class Query:
+    """
+    Builder для чтения из PostgREST.
+
+    Пример:
+        rows = await (
+            db.query("restaurants")
+            .select("id", "name", "rating")
+            .embed("discount_rules", "discount", "time_start")
+            .eq("city", city)
+            .in_("category", ["cafe", "bar"])
+            .order("rating", desc=True)
+            .limit(20)
+            .execute()
+        )
+
+    Повторный фильтр на ту же колонку (например gte + lt по дате)
+    уходит в параметр and=(...), поэтому словарь фильтров db.get
+    не теряет условия.
+    """
+
+    def __init__(self, client: "SupabaseClient", table: str):
+        self._client = client
+        self.table = table
+        self._columns: Tuple[str, ...] = ("*",)
+        self._embeds: List[Tuple[str, Tuple[str, ...]]] = []
+        self._filters: List[Tuple[str, str, str]] = []  # (column, operator, raw value)
+        self._or: List[str] = []  # сырые условия or=(...)
+        self._order: List[Tuple[str, bool, Optional[str]]] = []
+        self._limit: Optional[int] = None
+        self._offset: Optional[int] = None
+
+    # --- ПРОЕКЦИЯ ---
+
+    def select(self, *columns: Union[str, Iterable[str]]) -> "Query":
+        """Колонки ответа: select("id", "name") или select(LISTING_COLUMNS)"""
+        flat: List[str] = []
+        for column in columns:
+            if isinstance(column, str):
+                flat.append(column)
+            else:
+                flat.extend(column)
+        self._columns = tuple(flat) or ("*",)
+        return self
+
+    def embed(self, relation: str, *columns: str) -> "Query":
+        """Embedded resource по foreign key: relation(col1,col2)"""
+        self._embeds.append((relation, tuple(columns)))
+        return self
+
+    # --- ФИЛЬТРЫ ---
+
+    def _add(self, column: str, operator: str, value: str) -> "Query":
+        self._filters.append((column, operator, value))
+        return self
+
+    def eq(self, column: str, value: Any) -> "Query":
+        return self._add(column, "eq", value)
+
+    def neq(self, column: str, value: Any) -> "Query":
+        return self._add(column, "neq", value)
+
+    def gt(self, column: str, value: Any) -> "Query":
+        return self._add(column, "gt", value)
+
+    def gte(self, column: str, value: Any) -> "Query":
+        return self._add(column, "gte", value)
+
+    def lt(self, column: str, value: Any) -> "Query":
+        return self._add(column, "lt", value)
+
+    def lte(self, column: str, value: Any) -> "Query":
+        return self._add(column, "lte", value)
+
+    def is_(self, column: str, value: Optional[bool]) -> "Query":
+        """is.null / is.true / is.false"""
+        return self._add(column, "is", "null" if value is None else value)
+
+    def or_(self, *conditions: str) -> "Query":
+        """
+        Хотя бы одно из условий в синтаксисе PostgREST:
+        or_("rating.lt.4.5", "and(rating.eq.4.5,id.gt.17)", "rating.is.null").
+        Значения подставляет вызывающий (числа, null) - они не экранируются.
+        """
+        self._or.extend(conditions)
+        return self
+
+    def in_(self, column: str, values: Sequence[Any]) -> "Query":
+        """in.(a,b,c) - значения со спецсимволами берутся в кавычки"""
+        return self._add(column, "in", "(" + ",".join(quote_item(v) for v in values) + ")")
+
+    def ilike(self, column: str, pattern: str) -> "Query":
+        """Сырой шаблон: '*' - любая подстрока. Пользовательский текст - через contains()"""
+        return self._add(column, "ilike", pattern)
+
+    def contains(self, column: str, text: str) -> "Query":
+        """Регистронезависимый поиск подстроки с экранированием % и _"""
+        return self._add(column, "ilike", f"*{escape_like(text)}*")
+
+    # --- СОРТИРОВКА / ЛИМИТЫ ---
+
+    def order(self, column: str, desc: bool = False, nulls: Optional[str] = None) -> "Query":
+        """nulls: 'nullsfirst' | 'nullslast'"""
+        self._order.append((column, desc, nulls))
+        return self
+
+    def limit(self, limit: Optional[int]) -> "Query":
+        self._limit = limit
+        return self
+
+    def offset(self, offset: Optional[int]) -> "Query":
+        self._offset = offset
+        return self
+
+    # --- КОМПИЛЯЦИЯ ---
+
+    @property
+    def select_str(self) -> str:
+        return compile_select(self._columns, tuple(self._embeds))
+
+    @property
+    def order_str(self) -> Optional[str]:
+        return compile_order(tuple(self._order))
+
+    def to_filters(self) -> Dict[str, str]:
+        """Фильтры в формате db.get: {column: 'op.<urlencoded value>'}"""
+        filters: Dict[str, str] = {}
+        extra: List[str] = []
+        for column, operator, value in self._filters:
+            if operator == "in":
+                encoded = quote(value, safe="(),\"")
+            else:
+                encoded = encode_value(value)
+            if column not in filters:
+                filters[column] = f"{operator}.{encoded}"
+            else:
+                raw = value if operator == "in" else quote_item(value)
+                extra.append(quote(f"{column}.{operator}.{raw}", safe="(),.\""))
+        if extra:
+            filters["and"] = f"({','.join(extra)})"
+        if self._or:
+            filters["or"] = f"({','.join(quote(condition, safe='(),.') for condition in self._or)})"
+        return filters
+
+    # --- ВЫПОЛНЕНИЕ ---
+
+    async def execute(self) -> Optional[List[Dict[str, Any]]]:
+        """Выполнить запрос (через db.get: coalescing, hedging, адаптивные таймауты)"""
+        return await self._client.get(
+            self.table,
+            filters=self.to_filters(),
+            select=self.select_str,
+            order=self.order_str,
+            limit=self._limit,
+            offset=self._offset
+        )
+
+    async def first(self) -> Optional[Dict[str, Any]]:
+        """Первая строка или None"""
+        if self._limit is None:
+            self._limit = 1
+        rows = await self.execute()
+        return rows[0] if rows else None
+
+    def iter_rows(self, page_size: int = 1000, keyset: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Постраничное чтение без лимита (см. SupabaseClient.iter_rows)"""
+        return self._client.iter_rows(
+            self.table,
+            filters=self.to_filters(),
+            select=self.select_str,
+            order=self.order_str,
+            page_size=page_size,
+            keyset=keyset
+        )
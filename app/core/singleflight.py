@@ -0,0 +1,56 @@
+"""
+Single-flight module
+Объединяет одинаковые параллельные запросы в один upstream вызов
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Request coalescing (как golang.org/x/sync/singleflight).
+
+    Пока запрос с ключом `key` выполняется, все остальные вызовы с тем же
+    ключом не идут в сеть, а ждут результата первого ("лидера").
+    Результат не кэшируется: после завершения ключ сразу освобождается.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0      # всего вызовов do()
+        self.leaders = 0    # реальных upstream запросов
+        self.merged = 0     # вызовов, присоединившихся к чужому запросу
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Выполнить fn() или присоединиться к уже выполняющемуся вызову с тем же ключом"""
+        self.calls += 1
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.merged += 1
+            return await asyncio.shield(task)
+
+        self.leaders += 1
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._forget(key, t))
+
+        # shield: отмена одного ожидающего не отменяет запрос для остальных
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Помечаем исключение как полученное, даже если все ожидающие отменены
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики для мониторинга"""
+        return {
+            "calls": self.calls,
+            "upstream": self.leaders,
+            "merged": self.merged,
+            "inflight": len(self._inflight),
+            "merge_ratio": round(self.merged / self.calls, 4) if self.calls else 0.0
+        }
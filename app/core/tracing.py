@@ -0,0 +1,161 @@
+"""
+Tracing module
+Per-request record of upstream (Supabase) calls, Server-Timing header
+and rolling per-route latency histograms
+"""
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+from app.core.latency import LatencyWindow
+
+
+class RequestTrace:
+    """
+    Upstream вызовы одного входящего запроса.
+
+    loop_cpu - thread_time потока event loop от начала до конца запроса.
+    Это CPU всего loop за это время: при параллельных запросах туда
+    попадает и их работа, поэтому это не CPU обработчика, а верхняя оценка
+    (под нагрузкой - загрузка loop).
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.loop_cpu_started = time.thread_time()
+        self.calls: List[Tuple[str, str, Any, float]] = []  # (method, target, status, seconds)
+
+    def record(self, method: str, target: str, status: Any, seconds: float) -> None:
+        self.calls.append((method, target, status, seconds))
+
+    @property
+    def db_time(self) -> float:
+        """Сумма длительностей вызовов (параллельные вызовы суммируются)"""
+        return sum(call[3] for call in self.calls)
+
+    def finish(self) -> Tuple[float, float]:
+        """(wall, loop_cpu) в секундах с начала запроса"""
+        return time.perf_counter() - self.started, time.thread_time() - self.loop_cpu_started
+
+    def by_target(self) -> Dict[str, Tuple[int, float]]:
+        """{target: (calls, seconds)}"""
+        result: Dict[str, Tuple[int, float]] = {}
+        for _, target, _, seconds in self.calls:
+            count, total = result.get(target, (0, 0.0))
+            result[target] = (count + 1, total + seconds)
+        return result
+
+    def server_timing(self, wall: float, loop_cpu: float) -> str:
+        """Server-Timing: db;dur=12.3;desc="4 calls", db.bookings;dur=8.1;desc="3", app;dur=..., loop_cpu;dur=..."""
+        parts = [f'db;dur={self.db_time * 1000:.1f};desc="{len(self.calls)} calls"']
+        for target, (count, seconds) in sorted(self.by_target().items(), key=lambda item: -item[1][1]):
+            parts.append(f'db.{target};dur={seconds * 1000:.1f};desc="{count}"')
+        parts.append(f"app;dur={wall * 1000:.1f}")
+        parts.append(f"loop_cpu;dur={loop_cpu * 1000:.1f}")
+        return ", ".join(parts)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Вызовы для лога медленных запросов"""
+        return [
+            {"method": method, "target": target, "status": status, "ms": round(seconds * 1000, 1)}
+            for method, target, status, seconds in self.calls
+        ]
+
+
+# Trace текущего HTTP запроса (ставится middleware в main.py)
+trace_var: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def upstream_target(url: httpx.URL) -> str:
+    """/rest/v1/bookings -> bookings, /rest/v1/rpc/fn -> rpc.fn, /storage/v1/object/b/... -> storage.b"""
+    parts = [p for p in url.path.split("/") if p]
+    if len(parts) >= 3 and parts[0] == "rest":
+        return f"rpc.{parts[3]}" if parts[2] == "rpc" and len(parts) > 3 else parts[2]
+    if len(parts) >= 4 and parts[0] == "storage":
+        bucket = parts[4] if parts[3] == "public" and len(parts) > 4 else parts[3]
+        return f"storage.{bucket}"
+    return parts[0] if parts else "unknown"
+
+
+class TracingTransport(httpx.AsyncBaseTransport):
+    """
+    Обёртка над транспортом общего клиента: каждый upstream вызов
+    попадает в trace текущего запроса (включая таймауты и отменённые hedge).
+    """
+
+    def __init__(self, inner: httpx.AsyncBaseTransport):
+        self.inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        trace = trace_var.get()
+        if trace is None:
+            return await self.inner.handle_async_request(request)
+
+        started = time.perf_counter()
+        status: Any = "error"
+        try:
+            response = await self.inner.handle_async_request(request)
+            status = response.status_code
+            return response
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        except Exception as e:
+            status = type(e).__name__
+            raise
+        finally:
+            trace.record(request.method, upstream_target(request.url), status, time.perf_counter() - started)
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+class RouteStats:
+    """Скользящие гистограммы по шаблону маршрута: время, db время, число вызовов"""
+
+    def __init__(self, window: int):
+        self.window = window
+        self._routes: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, route: str, wall: float, db: float, calls: int, loop_cpu: float) -> None:
+        stats = self._routes.get(route)
+        if stats is None:
+            stats = self._routes[route] = {
+                "requests": 0,
+                "wall": LatencyWindow(self.window),
+                "db": LatencyWindow(self.window),
+                "loop_cpu": LatencyWindow(self.window),
+                "calls": LatencyWindow(self.window),
+            }
+        stats["requests"] += 1
+        stats["wall"].record(wall)
+        stats["db"].record(db)
+        stats["loop_cpu"].record(loop_cpu)
+        stats["calls"].record(calls)
+
+    def stats(self) -> Dict[str, Any]:
+        result = {}
+        for route, stats in self._routes.items():
+            ms = lambda name, q: round((stats[name].quantile(q) or 0) * 1000, 1)
+            result[route] = {
+                "requests": stats["requests"],
+                "p50_ms": ms("wall", 0.5),
+                "p95_ms": ms("wall", 0.95),
+                "p99_ms": ms("wall", 0.99),
+                "db_p95_ms": ms("db", 0.95),
+                "loop_cpu_p95_ms": ms("loop_cpu", 0.95),
+                "db_calls_p50": stats["calls"].quantile(0.5),
+                "db_calls_max": stats["calls"].quantile(1.0),
+            }
+        return result
+
+
+# ============================================
+# GLOBAL INSTANCE
+# ============================================
+
+route_stats = RouteStats(settings.TRACE_ROUTE_WINDOW)
@@ -0,0 +1,271 @@
+"""
+Active Rules
+Действующие сегодня discount_rules по ресторанам в памяти процесса: листинг
+прикладывает timeslots без запроса к базе. Индекс обновляется точечно
+эндпоинтами скидок и переключается на новый день в полночь settings.TIMEZONE
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from zoneinfo import ZoneInfo
+
+from app.core.config import settings
+from app.core.database import db
+from app.core.logger import get_logger
+from app.services.restaurant_service import TIMESLOT_COLUMNS
+
+log = get_logger(__name__)
+
+
+def _day(value: Any) -> str:
+    """'2026-10-17' / '2026-10-17T00:00:00' -> '2026-10-17' (сравнение строк = сравнение дат)"""
+    return str(value or "")[:10]
+
+
+class ActiveRuleIndex:
+    """
+    Правила с is_active и valid_to >= сегодня.
+
+    _rules: restaurant_id -> {rule_id: правило} - сегодняшние и будущие;
+    _today: restaurant_id -> [правила, у которых valid_from <= сегодня <=
+    valid_to и day_of_week - null или сегодняшний день недели (0 =
+    понедельник, как в DiscountIndex.for_day)] по id. _today пересчитывается для одного ресторана при его
+    изменении и целиком при смене дня (просроченные правила выбрасываются).
+
+    apply/discard - после create/update/delete в этом процессе; reload() -
+    полная загрузка (старт и раз в reload_interval: изменения других
+    процессов). Изменения во время загрузки переигрываются поверх неё.
+    До первой успешной загрузки ready = False и листинг идёт в базу.
+    """
+
+    def __init__(self, reload_interval: float, timezone: str):
+        self.reload_interval = reload_interval
+        self.tz = ZoneInfo(timezone)
+        self.ready = False
+        self._rules: Dict[int, Dict[Any, Dict[str, Any]]] = {}
+        self._today: Dict[int, List[Dict[str, Any]]] = {}
+        self._date = ""
+        self._weekday: Optional[int] = None
+        self._rollover_at = 0.0  # time.time() ближайшей полуночи
+        self._pending: Optional[List[tuple]] = None  # изменения во время reload()
+        self._loading: Optional[asyncio.Future] = None
+        self._task: Optional[asyncio.Task] = None
+        self.reloads = 0
+        self.rollovers = 0
+        self.updates = 0
+
+    # ---------- чтение ----------
+
+    def today(self, restaurant_id: Any) -> List[Dict[str, Any]]:
+        """Действующие сегодня правила ресторана (список общий - не изменять)"""
+        if time.time() >= self._rollover_at:
+            self._rollover()
+        return self._today.get(int(restaurant_id), [])
+
+    def attach(self, restaurants: Iterable[Dict[str, Any]]) -> None:
+        """r["timeslots"] = сегодняшние правила для каждой строки листинга"""
+        if time.time() >= self._rollover_at:
+            self._rollover()
+        for restaurant in restaurants:
+            restaurant["timeslots"] = self._today.get(restaurant.get("id"), [])
+
+    # ---------- смена дня ----------
+
+    def _rollover(self) -> None:
+        now = datetime.now(self.tz)
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=self.tz)
+        self._rollover_at = midnight.timestamp()
+        today = now.date().isoformat()
+        if today == self._date:
+            return
+        self._date = today
+        self._weekday = now.date().weekday()
+        for restaurant_id in list(self._rules):
+            rules = self._rules[restaurant_id]
+            for rule_id in [rule_id for rule_id, rule in rules.items() if _day(rule.get("valid_to")) < today]:
+                del rules[rule_id]
+            self._refresh(restaurant_id)
+        self.rollovers += 1
+        log.debug("Active rules rolled over", extra={"date": today, "restaurants": len(self._today)})
+
+    def _refresh(self, restaurant_id: int) -> None:
+        """Пересчитать _today одного ресторана"""
+        rules = self._rules.get(restaurant_id)
+        current = sorted(
+            (rule for rule in (rules or {}).values() if self._is_today(rule)),
+            key=lambda rule: rule.get("id") or 0
+        )
+        if not rules:
+            self._rules.pop(restaurant_id, None)
+        if current:
+            self._today[restaurant_id] = current
+        else:
+            self._today.pop(restaurant_id, None)
+
+    def _is_today(self, rule: Dict[str, Any]) -> bool:
+        """Действует сегодня (valid_to и is_active уже проверены при добавлении)"""
+        if _day(rule.get("valid_from")) > self._date:
+            return False
+        weekday = rule.get("day_of_week")
+        try:
+            return weekday is None or int(weekday) == self._weekday
+        except (TypeError, ValueError):
+            return False
+
+    # ---------- изменения ----------
+
+    def apply(self, rows: Optional[Sequence[Dict[str, Any]]]) -> None:
+        """Правила созданы или изменены (строки из базы после записи)"""
+        for rule in rows or []:
+            self._record(("apply", rule))
+            self._apply(rule)
+
+    def discard(self, rule_id: Any) -> None:
+        """Правило удалено"""
+        self._record(("discard", rule_id))
+        self._discard(rule_id)
+
+    def discard_restaurant(self, restaurant_id: Any) -> None:
+        """Удалены все правила ресторана"""
+        self._record(("restaurant", restaurant_id))
+        self._rules.pop(int(restaurant_id), None)
+        self._today.pop(int(restaurant_id), None)
+
+    def _record(self, change: tuple) -> None:
+        self.updates += 1
+        if self._pending is not None:
+            self._pending.append(change)
+
+    def _apply(self, rule: Dict[str, Any]) -> None:
+        if rule.get("id") is None or rule.get("restaurant_id") is None:
+            return
+        # Правило могло сменить ресторан
+        self._discard(rule["id"])
+        if time.time() >= self._rollover_at:
+            self._rollover()
+        if not rule.get("is_active") or _day(rule.get("valid_to")) < self._date:
+            return
+        restaurant_id = int(rule["restaurant_id"])
+        self._rules.setdefault(restaurant_id, {})[rule["id"]] = rule
+        self._refresh(restaurant_id)
+
+    def _discard(self, rule_id: Any) -> None:
+        for restaurant_id, rules in self._rules.items():
+            if rules.pop(rule_id, None) is not None:
+                self._refresh(restaurant_id)
+                return
+
+    # ---------- загрузка ----------
+
+    async def reload(self, restaurant_ids: Optional[Sequence[Any]] = None) -> None:
+        """
+        Загрузить правила из базы: все или только restaurant_ids (после
+        вставки без return=representation). Полные загрузки не
+        запускаются параллельно.
+        """
+        if restaurant_ids is None and self._loading is not None:
+            return await asyncio.shield(self._loading)
+        if restaurant_ids is not None and not restaurant_ids:
+            return
+
+        today = datetime.now(self.tz).date().isoformat()
+        query = (
+            db.query("discount_rules")
+            .select(TIMESLOT_COLUMNS)
+            .eq("is_active", True)
+            .gte("valid_to", today)
+        )
+        if restaurant_ids is not None:
+            query = query.in_("restaurant_id", [int(restaurant_id) for restaurant_id in restaurant_ids])
+            rows = [rule async for rule in query.iter_rows(keyset="id")]
+            for restaurant_id in restaurant_ids:
+                self.discard_restaurant(restaurant_id)
+            self.apply(rows)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading = future
+        self._pending = []
+        try:
+            rules: Dict[int, Dict[Any, Dict[str, Any]]] = {}
+            async for rule in query.iter_rows(keyset="id"):
+                if rule.get("restaurant_id") is not None:
+                    rules.setdefault(int(rule["restaurant_id"]), {})[rule.get("id")] = rule
+
+            pending, self._pending = self._pending, None
+            self._rules = rules
+            self._today = {}
+            self._date = ""
+            self._rollover_at = 0.0
+            self._rollover()
+            for kind, value in pending:
+                if kind == "apply":
+                    self._apply(value)
+                elif kind == "discard":
+                    self._discard(value)
+                else:
+                    self._rules.pop(int(value), None)
+                    self._today.pop(int(value), None)
+            self.ready = True
+            self.reloads += 1
+            future.set_result(None)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # ждущих может не быть
+            raise
+        finally:
+            self._pending = None
+            if self._loading is future:
+                self._loading = None
+
+    async def _reload_loop(self) -> None:
+        while True:
+            try:
+                await self.reload()
+            except Exception:
+                log.exception("Active rules reload failed")
+            # Просыпаемся и к полуночи: новый день готов до первого запроса
+            until_midnight = max(self._rollover_at - time.time(), 0) + 1
+            interval = min(self.reload_interval, until_midnight) if self.reload_interval > 0 else until_midnight
+            await asyncio.sleep(interval if self.ready else 5)
+            if time.time() >= self._rollover_at:
+                self._rollover()
+
+    def start(self) -> None:
+        """Загрузить индекс и запустить фоновое обновление (lifespan)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._reload_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "date": self._date or None,
+            "restaurants": len(self._rules),
+            "active_today": sum(len(rules) for rules in self._today.values()),
+            "reloads": self.reloads,
+            "rollovers": self.rollovers,
+            "updates": self.updates
+        }
+
+
+# ============================================
+# GLOBAL INSTANCE
+# ============================================
+
+active_rules = ActiveRuleIndex(
+    reload_interval=settings.ACTIVE_RULES_RELOAD_SECONDS,
+    timezone=settings.TIMEZONE
+)
@@ -3,12 +3,12 @@ FastAPI Authentication Service
 Работает с Supabase через REST API
 """
 
-import httpx
 import os
 from dotenv import load_dotenv
 from fastapi import HTTPException, status
 from pydantic import EmailStr
 from typing import Optional
+from app.core.http import get_http_client
 
 load_dotenv()
 
@@ -37,81 +37,81 @@ class SupabaseClient:
     async def sign_up(self, email: str, password: str) -> dict:
         """Создать пользователя в Supabase Auth"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.auth_url}/signup",
-                    json={"email": email, "password": password},
-                    headers={"apikey": self.key}
-                )
-                if response.status_code not in [200, 201]:
-                    error_detail = response.json().get("message", response.text)
-                    raise Exception(f"Sign up failed: {error_detail}")
-                return response.json()
+            client = get_http_client()
+            response = await client.post(
+                f"{self.auth_url}/signup",
+                json={"email": email, "password": password},
+                headers={"apikey": self.key}
+            )
+            if response.status_code not in [200, 201]:
+                error_detail = response.json().get("message", response.text)
+                raise Exception(f"Sign up failed: {error_detail}")
+            return response.json()
         except Exception as e:
             raise Exception(f"Sign up error: {str(e)}")
     
     async def sign_in(self, email: str, password: str) -> dict:
         """Логин пользователя"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.auth_url}/token?grant_type=password",
-                    json={"email": email, "password": password},
-                    headers={"apikey": self.key}
-                )
-                if response.status_code != 200:
-                    raise Exception("Invalid email or password")
-                return response.json()
+            client = get_http_client()
+            response = await client.post(
+                f"{self.auth_url}/token?grant_type=password",
+                json={"email": email, "password": password},
+                headers={"apikey": self.key}
+            )
+            if response.status_code != 200:
+                raise Exception("Invalid email or password")
+            return response.json()
         except Exception as e:
             raise Exception(f"Sign in error: {str(e)}")
     
     async def get_user(self, token: str) -> dict:
         """Получить данные пользователя по токену"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.auth_url}/user",
-                    headers={"apikey": self.key, "Authorization": f"Bearer {token}"}
-                )
-                if response.status_code != 200:
-                    raise Exception("Invalid token")
-                return response.json()
+            client = get_http_client()
+            response = await client.get(
+                f"{self.auth_url}/user",
+                headers={"apikey": self.key, "Authorization": f"Bearer {token}"}
+            )
+            if response.status_code != 200:
+                raise Exception("Invalid token")
+            return response.json()
         except Exception as e:
             raise Exception(f"Get user error: {str(e)}")
     
     async def insert_user(self, user_data: dict) -> dict:
         """Вставить пользователя в таблицу users"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.rest_url}/users",
-                    json=user_data,
-                    headers={
-                        "apikey": self.key,
-                        "Authorization": f"Bearer {self.service_key}" if self.service_key else "",
-                        "Content-Type": "application/json"
-                    }
-                )
-                if response.status_code not in [200, 201]:
-                    raise Exception(f"Insert user failed: {response.text}")
-                return response.json()
+            client = get_http_client()
+            response = await client.post(
+                f"{self.rest_url}/users",
+                json=user_data,
+                headers={
+                    "apikey": self.key,
+                    "Authorization": f"Bearer {self.service_key}" if self.service_key else "",
+                    "Content-Type": "application/json"
+                }
+            )
+            if response.status_code not in [200, 201]:
+                raise Exception(f"Insert user failed: {response.text}")
+            return response.json()
         except Exception as e:
             raise Exception(f"Insert user error: {str(e)}")
     
     async def get_user_by_email(self, email: str) -> dict:
         """Получить пользователя по email"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.rest_url}/users?email=eq.{email}",
-                    headers={"apikey": self.key}
-                )
-                if response.status_code != 200:
-                    raise Exception("Failed to get user")
-                data = response.json()
-                if not data:
-                    raise Exception("User not found")
-                return data[0]
+            client = get_http_client()
+            response = await client.get(
+                f"{self.rest_url}/users?email=eq.{email}",
+                headers={"apikey": self.key}
+            )
+            if response.status_code != 200:
+                raise Exception("Failed to get user")
+            data = response.json()
+            if not data:
+                raise Exception("User not found")
+            return data[0]
         except Exception as e:
             raise Exception(f"Get user by email error: {str(e)}")
 
@@ -224,11 +224,11 @@ class AuthService:
 
     async def verify_google_token(self, token: str) -> dict:
         """Проверить Google ID token"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                "https://oauth2.googleapis.com/tokeninfo",
-                params={"id_token": token}
-            )
+        client = get_http_client()
+        response = await client.get(
+            "https://oauth2.googleapis.com/tokeninfo",
+            params={"id_token": token}
+        )
 
         if response.status_code != 200:
             raise HTTPException(
@@ -274,27 +274,27 @@ class AuthService:
         }
 
     async def log_action(self, user_id: str, action: str, resource: str, details: dict):
-        async with httpx.AsyncClient() as client:
-            await client.post(
-                f"{supabase.rest_url}/audit_logs",
-                json={
-                    "user_id": user_id,
-                    "action": action,
-                    "resource": resource,
-                    "details": details
-                },
-                headers={
-                    "apikey": SUPABASE_KEY,
-                    "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
-                    "Content-Type": "application/json"
-                }
-            )
+        client = get_http_client()
+        await client.post(
+            f"{supabase.rest_url}/audit_logs",
+            json={
+                "user_id": user_id,
+                "action": action,
+                "resource": resource,
+                "details": details
+            },
+            headers={
+                "apikey": SUPABASE_KEY,
+                "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
+                "Content-Type": "application/json"
+            }
+        )
     async def check_admin_role(self, user_id: str) -> bool:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{supabase.rest_url}/users?id=eq.{user_id}",
-                headers={"apikey": SUPABASE_KEY}
-            )
+        client = get_http_client()
+        response = await client.get(
+            f"{supabase.rest_url}/users?id=eq.{user_id}",
+            headers={"apikey": SUPABASE_KEY}
+        )
 
         if response.status_code != 200:
             return False
@@ -0,0 +1,455 @@
+"""
+Availability Store
+Материализованная занятость: на (ресторан, день) - конфигурация движка
+слотов и поминутные массивы гостей. Брони меняют массивы инкрементально,
+/available-slots читает из памяти, фоновая сверка пересобирает дни из базы
+"""
+import asyncio
+from array import array
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, tzinfo
+from itertools import accumulate
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.services.booking_service import booking_service, OCCUPYING_STATUSES
+from app.services.slot_service import slot_service, SlotContext, booking_interval, micros
+
+log = get_logger(__name__)
+
+_MINUTE = 60_000_000  # micros
+
+
+class DayAvailability:
+    """
+    Один (ресторан, локальный день).
+
+    Сетка - минуты от локальной полуночи. starts[m] - гости броней,
+    начинающихся в минуту m (floor), ends[m] - гости броней, заканчивающихся
+    к минуте m (ceil; всё после конца дня - в последней ячейке). Для слота
+    [S, E) на границах минут:
+
+        guests = sum(starts[< E]) - sum(ends[<= S])
+
+    floor/ceil сохраняют точность: start < E <=> floor(start) < E и
+    end <= S <=> ceil(end) <= S, если S и E - целые минуты. Брони
+    с отрицательной длительностью, нецелыми гостями и слоты не на
+    границе минуты считаются перебором, как в OccupancyIndex.
+
+    version растёт с каждой дельтой - по нему сверка понимает, что день
+    менялся, пока она читала базу.
+    """
+
+    def __init__(self, context: SlotContext, day: date, tz: tzinfo):
+        self.day = day
+        self.tz = tz
+        self.context = SlotContext(
+            hours=context.hours,
+            services=context.services,
+            capacities=context.capacities,
+            discounts=context.discounts,
+            bookings=[]
+        )
+        day_start, day_end = booking_service.local_day_bounds(day, tz)
+        self._origin = micros(day_start)
+        self.minutes = (micros(day_end) - self._origin) // _MINUTE
+        self.starts = array("q", bytes(8 * (self.minutes + 2)))
+        self.ends = array("q", bytes(8 * (self.minutes + 2)))
+        self.entries: Dict[Any, Tuple[int, int, int, int, int]] = {}  # id -> (start, end, guests, start_minute, end_minute)
+        self.exact: Dict[Any, Tuple[int, int, Any]] = {}  # id -> (start, end, guests) в micros
+        self.version = 0
+        self._prefix: Optional[Tuple[array, array]] = None
+        self._slots: Optional[List[Dict[str, Any]]] = None
+
+        for booking in context.bookings:
+            self.add(booking)
+
+    def add(self, booking: Dict[str, Any]) -> bool:
+        """Учесть бронь этого дня (статус не проверяется); False, если движок её пропускает"""
+        # Без сервисов слоты строятся из discount_rules и занятость не нужна
+        # (load_contexts_many такие брони и не загружает)
+        if not self.context.services:
+            return False
+        interval = booking_interval(booking)
+        if interval is None:
+            return False
+        start, end, guests = interval
+        booking_id = booking.get("id")
+        self.remove(booking_id)
+
+        if end < start or not isinstance(guests, int):
+            self.exact[booking_id] = (start, end, guests)
+        else:
+            start_minute = min(max((start - self._origin) // _MINUTE, 0), self.minutes + 1)
+            end_minute = min(max(-((self._origin - end) // _MINUTE), 0), self.minutes + 1)
+            self.starts[start_minute] += guests
+            self.ends[end_minute] += guests
+            self.entries[booking_id] = (start, end, guests, start_minute, end_minute)
+        self._changed()
+        return True
+
+    def remove(self, booking_id: Any) -> bool:
+        """Убрать бронь из занятости; False, если её не было"""
+        entry = self.entries.pop(booking_id, None)
+        if entry is not None:
+            _, _, guests, start_minute, end_minute = entry
+            self.starts[start_minute] -= guests
+            self.ends[end_minute] -= guests
+        elif self.exact.pop(booking_id, None) is None:
+            return False
+        self._changed()
+        return True
+
+    def _changed(self) -> None:
+        self.version += 1
+        self._prefix = None
+        self._slots = None
+
+    def guests(self, slot_start: datetime, slot_end: datetime):
+        """Сумма party_size броней, пересекающих [slot_start, slot_end)"""
+        s, e = micros(slot_start), micros(slot_end)
+        offset_s, offset_e = s - self._origin, e - self._origin
+        if offset_s % _MINUTE or offset_e % _MINUTE or not 0 <= offset_s <= offset_e <= self.minutes * _MINUTE:
+            total = sum(guests for start, end, guests, _, _ in self.entries.values() if start < e and end > s)
+        else:
+            if self._prefix is None:
+                # array("q"), как starts/ends: 8 байт на минуту, а не объект int
+                self._prefix = (
+                    array("q", accumulate(self.starts, initial=0)),
+                    array("q", accumulate(self.ends, initial=0))
+                )
+            start_prefix, end_prefix = self._prefix
+            total = start_prefix[offset_e // _MINUTE] - end_prefix[offset_s // _MINUTE + 1]
+
+        for start, end, guests in self.exact.values():
+            if start < e and end > s:
+                total += guests
+        return total
+
+    def slots(self) -> List[Dict[str, Any]]:
+        """Слоты дня; пересчитываются только после дельты"""
+        if self._slots is None:
+            self._slots = slot_service.build_slots(self.context, self.day, self.tz, occupancy=self)
+            # Префиксные суммы нужны только на время расчёта слотов
+            self._prefix = None
+        return self._slots
+
+    def occupancy(self) -> Dict[Any, Tuple]:
+        """{booking_id: интервал} - для сравнения при сверке"""
+        return {**self.entries, **self.exact}
+
+
+class AvailabilityStore:
+    """
+    (restaurant_id, day) -> DayAvailability, LRU не больше max_days дней.
+
+    - slots(): день из памяти; на промахе загружает его один вызывающий
+      (остальные ждут ту же загрузку)
+    - apply()/discard(): дельта брони в уже материализованный день; если
+      день как раз загружается, результат загрузки не сохраняется
+    - invalidate(restaurant_id): конфигурация ресторана изменилась
+      (скидки, сервисы, сам ресторан)
+    - reconcile(): пересобрать все дни из базы и посчитать расхождения
+    """
+
+    def __init__(self, max_days: int, reconcile_interval: float):
+        self.max_days = max_days
+        self.reconcile_interval = reconcile_interval
+        self._days: "OrderedDict[Tuple[Any, date], DayAvailability]" = OrderedDict()
+        self._building: Dict[Tuple[Any, date], asyncio.Future] = {}
+        self._stale: Set[Tuple[Any, date]] = set()
+        self._booking_keys: Dict[Any, Tuple[Any, date]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.deltas = 0
+        self.evictions = 0
+        self.reconciles = 0
+        self.drift = 0
+
+    def __len__(self) -> int:
+        return len(self._days)
+
+    @staticmethod
+    def _key_for(booking: Dict[str, Any], tz: tzinfo) -> Optional[Tuple[Any, date]]:
+        """(restaurant_id, локальный день начала брони)"""
+        try:
+            start = datetime.fromisoformat(booking["booking_datetime"].replace("+00", "+00:00"))
+            return int(booking["restaurant_id"]), start.astimezone(tz).date()
+        except (KeyError, AttributeError, ValueError, TypeError):
+            return None
+
+    def _store(self, key: Tuple[Any, date], day: DayAvailability) -> None:
+        self._drop(key)
+        self._days[key] = day
+        for booking_id in day.occupancy():
+            self._booking_keys[booking_id] = key
+        while len(self._days) > self.max_days:
+            self._drop(next(iter(self._days)))
+            self.evictions += 1
+
+    def _drop(self, key: Hashable) -> None:
+        day = self._days.pop(key, None)
+        if day is None:
+            return
+        for booking_id in day.occupancy():
+            if self._booking_keys.get(booking_id) == key:
+                del self._booking_keys[booking_id]
+
+    async def slots(self, restaurant_id: int, target_date: date, tz: Optional[tzinfo] = None) -> List[Dict[str, Any]]:
+        """Слоты ресторана на дату из материализации (на промахе - загрузка дня)"""
+        key = (restaurant_id, target_date)
+        day = self._days.get(key)
+        if day is not None:
+            self._days.move_to_end(key)
+            self.hits += 1
+            return day.slots()
+
+        building = self._building.get(key)
+        if building is not None:
+            self.waits += 1
+            return (await asyncio.shield(building)).slots()
+
+        self.misses += 1
+        tz = tz or ZoneInfo(settings.TIMEZONE)
+        future = asyncio.get_running_loop().create_future()
+        self._building[key] = future
+        try:
+            contexts = await slot_service.load_contexts(restaurant_id, target_date, target_date, tz)
+            day = DayAvailability(contexts[target_date], target_date, tz)
+            # Дельта пришла во время загрузки: результат мог её не увидеть
+            if key not in self._stale:
+                self._store(key, day)
+            future.set_result(day)
+            return day.slots()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # ждущих может не быть
+            raise
+        finally:
+            del self._building[key]
+            self._stale.discard(key)
+
+    async def slots_range(
+        self,
+        restaurant_id: int,
+        first: date,
+        last: date,
+        tz: Optional[tzinfo] = None
+    ) -> Dict[date, List[Dict[str, Any]]]:
+        """
+        Слоты на дни first..last: материализованные дни из памяти,
+        недостающие - одной загрузкой load_contexts; они тоже
+        материализуются и дальше отдаются /available-slots из памяти
+        """
+        tz = tz or ZoneInfo(settings.TIMEZONE)
+        keys = [(restaurant_id, first + timedelta(days=offset)) for offset in range((last - first).days + 1)]
+
+        async def load(missing):
+            contexts = await slot_service.load_contexts(restaurant_id, missing[0][1], missing[-1][1], tz)
+            return {key: contexts[key[1]] for key in missing}
+
+        days = await self._days_for(keys, load, tz)
+        return {key[1]: day.slots() for key, day in days.items()}
+
+    async def slots_many(
+        self,
+        restaurant_ids: List[int],
+        target_date: date,
+        tz: Optional[tzinfo] = None
+    ) -> Dict[int, List[Dict[str, Any]]]:
+        """Слоты пачки ресторанов на дату (/next-slots): недостающие - одной загрузкой load_contexts_many"""
+        tz = tz or ZoneInfo(settings.TIMEZONE)
+        keys = [(restaurant_id, target_date) for restaurant_id in restaurant_ids]
+
+        async def load(missing):
+            contexts = await slot_service.load_contexts_many([key[0] for key in missing], target_date, target_date, tz)
+            return {key: contexts[key[0]][target_date] for key in missing}
+
+        days = await self._days_for(keys, load, tz)
+        return {key[0]: day.slots() for key, day in days.items()}
+
+    async def _days_for(self, keys: List[Tuple[Any, date]], load, tz: tzinfo) -> Dict[Tuple[Any, date], "DayAvailability"]:
+        """
+        Дни по ключам: из памяти, ждущие чужой загрузки - её результат,
+        остальные - одним вызовом load(missing) -> {key: SlotContext}
+        и материализуются (как в slots())
+        """
+        result: Dict[Tuple[Any, date], DayAvailability] = {}
+        waiting: Dict[Tuple[Any, date], asyncio.Future] = {}
+        missing: List[Tuple[Any, date]] = []
+        for key in keys:
+            day = self._days.get(key)
+            if day is not None:
+                self._days.move_to_end(key)
+                self.hits += 1
+                result[key] = day
+            elif key in self._building:
+                self.waits += 1
+                waiting[key] = self._building[key]
+            else:
+                missing.append(key)
+
+        if missing:
+            self.misses += len(missing)
+            futures = {}
+            for key in missing:
+                futures[key] = self._building[key] = asyncio.get_running_loop().create_future()
+            try:
+                contexts = await load(missing)
+                for key in missing:
+                    day = DayAvailability(contexts[key], key[1], tz)
+                    # Дельта пришла во время загрузки: результат мог её не увидеть
+                    if key not in self._stale:
+                        self._store(key, day)
+                    futures[key].set_result(day)
+                    result[key] = day
+            except BaseException as e:
+                for future in futures.values():
+                    if future.done():
+                        continue
+                    if isinstance(e, asyncio.CancelledError):
+                        future.cancel()
+                    else:
+                        future.set_exception(e)
+                        future.exception()  # ждущих может не быть
+                raise
+            finally:
+                for key in missing:
+                    del self._building[key]
+                    self._stale.discard(key)
+
+        for key, future in waiting.items():
+            result[key] = await asyncio.shield(future)
+        return result
+
+    def apply(self, booking: Dict[str, Any], tz: Optional[tzinfo] = None) -> None:
+        """Бронь создана или изменена (полная строка: id, restaurant_id, booking_datetime, status, ...)"""
+        booking_id = booking.get("id")
+        self.discard(booking_id)
+        key = self._key_for(booking, tz or ZoneInfo(settings.TIMEZONE))
+        if key is None:
+            return
+        if key in self._building:
+            self._stale.add(key)
+        day = self._days.get(key)
+        if day is None or booking.get("status") not in OCCUPYING_STATUSES:
+            return
+        if day.add(booking):
+            self._booking_keys[booking_id] = key
+            self.deltas += 1
+
+    def discard(self, booking_id: Any) -> None:
+        """Бронь удалена (или больше не занимает места)"""
+        key = self._booking_keys.pop(booking_id, None)
+        if key is None:
+            return
+        if key in self._building:
+            self._stale.add(key)
+        day = self._days.get(key)
+        if day is not None and day.remove(booking_id):
+            self.deltas += 1
+
+    def invalidate(self, restaurant_id: Optional[int] = None) -> int:
+        """Забыть дни ресторана (или все); возвращает число удалённых"""
+        keys = [key for key in self._days if restaurant_id is None or key[0] == restaurant_id]
+        for key in keys:
+            self._drop(key)
+        self._stale.update(key for key in self._building if restaurant_id is None or key[0] == restaurant_id)
+        return len(keys)
+
+    async def reconcile(self, tz: Optional[tzinfo] = None) -> int:
+        """
+        Пересобрать материализованные дни из базы (одна пакетная загрузка
+        на каждый день) и заменить их; прошедшие дни удаляются.
+
+        День, который менялся во время загрузки (version), не трогается -
+        его исправит следующая сверка. Возвращает число расхождений
+        (брони, которые есть только в памяти или только в базе, или
+        отличаются).
+        """
+        tz = tz or ZoneInfo(settings.TIMEZONE)
+        today = datetime.now(tz).date()
+        for key in [key for key in self._days if key[1] < today]:
+            self._drop(key)
+
+        by_day: Dict[date, Dict[Any, DayAvailability]] = {}
+        for (restaurant_id, day_date), day in self._days.items():
+            by_day.setdefault(day_date, {})[restaurant_id] = day
+
+        drift = 0
+        for day_date, days in by_day.items():
+            versions = {restaurant_id: day.version for restaurant_id, day in days.items()}
+            contexts = await slot_service.load_contexts_many(list(days), day_date, day_date, tz)
+            for restaurant_id, old in days.items():
+                key = (restaurant_id, day_date)
+                if self._days.get(key) is not old or old.version != versions[restaurant_id]:
+                    continue
+                fresh = DayAvailability(contexts[restaurant_id][day_date], day_date, tz)
+                before, after = old.occupancy(), fresh.occupancy()
+                drift += sum(1 for booking_id in before.keys() | after.keys() if before.get(booking_id) != after.get(booking_id))
+                self._days[key] = fresh
+                for booking_id in before:
+                    if self._booking_keys.get(booking_id) == key:
+                        del self._booking_keys[booking_id]
+                for booking_id in after:
+                    self._booking_keys[booking_id] = key
+
+        self.reconciles += 1
+        self.drift += drift
+        log.info("Availability store reconciled", extra={"days": len(self._days), "drift": drift})
+        return drift
+
+    async def _reconcile_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            try:
+                await self.reconcile()
+            except Exception:
+                log.exception("Availability store reconcile failed")
+
+    def start(self) -> None:
+        """Запустить фоновую сверку (lifespan)"""
+        if self.reconcile_interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._reconcile_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "days": len(self._days),
+            "max_days": self.max_days,
+            "bookings": len(self._booking_keys),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "build_waits": self.waits,
+            "deltas": self.deltas,
+            "evictions": self.evictions,
+            "reconciles": self.reconciles,
+            "drift": self.drift
+        }
+
+
+# ============================================
+# GLOBAL INSTANCE
+# ============================================
+
+availability_store = AvailabilityStore(
+    max_days=settings.AVAILABILITY_MAX_DAYS,
+    reconcile_interval=settings.AVAILABILITY_RECONCILE_SECONDS
+)
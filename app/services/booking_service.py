@@ -1,11 +1,18 @@
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from typing import List, Optional, Dict, Any, Sequence, Tuple, Union
+from datetime import date as date_type, datetime, time, timedelta
 from zoneinfo import ZoneInfo
 from app.core.database import db
 from app.core.config import settings
 import traceback
 
 
+# Колонки, нужные движку слотов для расчёта загрузки
+OCCUPANCY_COLUMNS = ("id", "booking_datetime", "duration_minutes", "party_size", "status")
+
+# Статусы, которые занимают места
+OCCUPYING_STATUSES = ("confirmed", "completed")
+
+
 class BookingService:
     """Сервис для работы с бронированиями"""
     
@@ -15,38 +22,85 @@ class BookingService:
         restaurant_id: Optional[int] = None,
         status: Optional[str] = None,
         date: Optional[str] = None,
-        limit: int = 100
+        limit: int = 100,
+        columns: Optional[Sequence[str]] = None
     ) -> List[dict]:
-        """Получить список броней"""
-        filters = {}
+        """Получить список броней (columns - проекция, по умолчанию все колонки)"""
+        query = db.query("bookings").select(columns or "*")
         
+        # Значения URL-кодируются: "+7..." в телефоне больше не превращается в пробел
         if phone:
-            filters["guest_phone"] = f"eq.{phone.strip()}"
+            query.eq("guest_phone", phone.strip())
         
         if restaurant_id:
-            filters["restaurant_id"] = f"eq.{restaurant_id}"
+            query.eq("restaurant_id", restaurant_id)
         
         if status:
-            filters["status"] = f"eq.{status}"
+            query.eq("status", status)
         
-        bookings = await db.get(
-            "bookings",
-            filters=filters,
-            order="created_at.desc",
-            limit=limit
-        )
+        bookings = await query.order("created_at", desc=True).limit(limit).execute()
         
         return bookings or []
     
+    @staticmethod
+    def local_day_bounds(day: date_type, tz: Optional[ZoneInfo] = None) -> Tuple[datetime, datetime]:
+        """[начало дня, начало следующего дня) в часовом поясе ресторана (aware datetime)"""
+        tz = tz or ZoneInfo(settings.TIMEZONE)
+        start = datetime.combine(day, time.min, tzinfo=tz)
+        end = datetime.combine(day + timedelta(days=1), time.min, tzinfo=tz)
+        return start, end
+
+    @staticmethod
+    async def get_for_local_range(
+        restaurant_id: Union[int, Sequence[int]],
+        first_day: date_type,
+        last_day: date_type,
+        statuses: Sequence[str] = OCCUPYING_STATUSES,
+        columns: Sequence[str] = OCCUPANCY_COLUMNS,
+        tz: Optional[ZoneInfo] = None
+    ) -> List[dict]:
+        """
+        Брони ресторана (или списка ресторанов через in.()), начинающиеся
+        в локальные дни first_day..last_day включительно (settings.TIMEZONE).
+
+        Диапазон и статусы фильтруются в базе (booking_datetime >= начало
+        first_day и < начала дня после last_day, сравнение timestamptz не
+        зависит от формата хранения), без лимита: все страницы читаются
+        через keyset по id.
+        """
+        start, _ = BookingService.local_day_bounds(first_day, tz)
+        _, end = BookingService.local_day_bounds(last_day, tz)
+        query = (
+            db.query("bookings")
+            .select(columns)
+            .gte("booking_datetime", start.isoformat())
+            .lt("booking_datetime", end.isoformat())
+        )
+        if isinstance(restaurant_id, (int, str)):
+            query.eq("restaurant_id", restaurant_id)
+        elif not restaurant_id:
+            return []
+        else:
+            query.in_("restaurant_id", restaurant_id)
+        if statuses:
+            query.in_("status", statuses)
+        return [row async for row in query.iter_rows(keyset="id")]
+
+    @staticmethod
+    async def get_for_local_date(
+        restaurant_id: int,
+        day: date_type,
+        statuses: Sequence[str] = OCCUPYING_STATUSES,
+        columns: Sequence[str] = OCCUPANCY_COLUMNS,
+        tz: Optional[ZoneInfo] = None
+    ) -> List[dict]:
+        """Брони ресторана, начинающиеся в локальный день `day` (см. get_for_local_range)"""
+        return await BookingService.get_for_local_range(restaurant_id, day, day, statuses, columns, tz)
+
     @staticmethod
     async def get_by_id(booking_id: int) -> Optional[dict]:
         """Получить бронь по ID"""
-        filters = {"id": f"eq.{booking_id}"}
-        bookings = await db.get("bookings", filters=filters)
-        
-        if bookings and len(bookings) > 0:
-            return bookings[0]
-        return None
+        return await db.query("bookings").eq("id", booking_id).first()
     
     @staticmethod
     async def create(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
@@ -0,0 +1,279 @@
+"""
+Catalog Snapshot
+Каталог ресторанов в памяти процесса: все рестораны + их discount_rules.
+Листинг, фильтры, счётчики категорий и карточка ресторана читаются из
+снимка; снимок пересобирается в фоне и сбрасывается эндпоинтами,
+которые меняют рестораны, фото или скидки
+"""
+import asyncio
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from app.core.config import settings
+from app.core.database import db
+from app.core.logger import get_logger
+from app.services.restaurant_service import (
+    LISTING_COLUMNS, TIMESLOT_COLUMNS, AVG_CHECK_RANGES,
+    in_avg_check_range, listing_sort_key, paginate
+)
+from app.services.search_index import SearchIndex
+
+log = get_logger(__name__)
+
+# Категории /api/categories (порядок ответа)
+CATEGORIES = (
+    ("restaurant", "Рестораны"),
+    ("cafe", "Кофе"),
+    ("street_food", "Street Food"),
+    ("bar", "Бары"),
+    ("bakery", "Пекарни"),
+)
+
+class CatalogSnapshot:
+    """
+    Неизменяемый снимок каталога.
+
+    rows - полные строки restaurants по id, listing - карточки листинга
+    (LISTING_COLUMNS + timeslots: все discount_rules ресторана, как отдавал
+    листинг раньше). Строки listing общие для всех запросов - их отдают
+    сериализатору как есть и не изменяют.
+    """
+
+    def __init__(self, restaurants: List[Dict[str, Any]], rules: List[Dict[str, Any]]):
+        self.built_at = time.monotonic()
+        self.rules: Dict[Any, List[Dict[str, Any]]] = {}
+        for rule in rules:
+            self.rules.setdefault(rule.get("restaurant_id"), []).append(rule)
+
+        self.rows: Dict[Any, Dict[str, Any]] = {}
+        self.listing: List[Dict[str, Any]] = []
+        for row in restaurants:
+            self.rows[row.get("id")] = row
+            card = {column: row.get(column) for column in LISTING_COLUMNS}
+            card["timeslots"] = self.rules.get(row.get("id"), [])
+            self.listing.append(card)
+
+        self.category_counts = Counter(row.get("category") for row in restaurants)
+        self.search_index = SearchIndex(restaurants)
+
+    def age(self) -> float:
+        return time.monotonic() - self.built_at
+
+    def filter(
+        self,
+        search: Optional[str] = None,
+        category: Optional[str] = None,
+        city: Optional[str] = None,
+        sort_by: Optional[str] = None,
+        avg_check_filter: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Листинг с фильтрами /api/restaurants/ (limit - после фильтров и сортировки).
+        search - через поисковый индекс; без sort_by результат по релевантности.
+        """
+        result, _ = self._select(search, category, city, sort_by, avg_check_filter)
+        return result[:limit] if limit is not None else result
+
+    def page(
+        self,
+        search: Optional[str],
+        category: Optional[str],
+        city: Optional[str],
+        sort_by: Optional[str],
+        avg_check_filter: Optional[str],
+        after: Optional[tuple],
+        page_size: int
+    ) -> Tuple[List[Dict[str, Any]], Optional[tuple]]:
+        """Страница листинга после ключа курсора: (карточки, ключ для следующей страницы или None)"""
+        result, key = self._select(search, category, city, sort_by, avg_check_filter)
+        return paginate(result, key, after, page_size)
+
+    def _select(self, search, category, city, sort_by, avg_check_filter) -> Tuple[List[Dict[str, Any]], Callable]:
+        """Отфильтрованные карточки в порядке listing_sort_key и сам ключ"""
+        relevance = dict(self.search_index.search(search)) if search and search.strip() else None
+        key = listing_sort_key(sort_by, relevance)
+        bounds = AVG_CHECK_RANGES.get(avg_check_filter) if avg_check_filter and avg_check_filter != "all" else None
+        if avg_check_filter and avg_check_filter != "all" and bounds is None:
+            return [], key
+
+        result = []
+        for card in self.listing:
+            if relevance is not None and card.get("id") not in relevance:
+                continue
+            if category and category != "all" and card.get("category") != category:
+                continue
+            if city and city != "all" and card.get("city") != city:
+                continue
+            if bounds and not in_avg_check_range(card.get("avg_check"), bounds):
+                continue
+            result.append(card)
+
+        result.sort(key=key)
+        return result, key
+
+    def categories(self) -> List[Dict[str, Any]]:
+        """Счётчики /api/categories"""
+        return [{"id": "all", "name": "Все", "count": len(self.rows)}] + [
+            {"id": category_id, "name": name, "count": self.category_counts.get(category_id, 0)}
+            for category_id, name in CATEGORIES
+        ]
+
+    def suggest(self, query: str, limit: int) -> Dict[str, Any]:
+        """Автодополнение: рестораны по релевантности и подходящие кухни"""
+        restaurants = []
+        for restaurant_id, score in self.search_index.search(query, limit=limit):
+            row = self.rows[restaurant_id]
+            restaurants.append({
+                "id": restaurant_id,
+                "name": row.get("name"),
+                "category": row.get("category"),
+                "city": row.get("city"),
+                "score": score
+            })
+        return {
+            "query": query,
+            "restaurants": restaurants,
+            "cuisines": self.search_index.suggest_cuisines(query, limit)
+        }
+
+    def restaurant(self, restaurant_id: int) -> Optional[Dict[str, Any]]:
+        """Копия строки ресторана + активные на сегодня скидки (как get_restaurant)"""
+        row = self.rows.get(restaurant_id)
+        if row is None:
+            return None
+        today = datetime.now(ZoneInfo(settings.TIMEZONE)).date().isoformat()
+        return {
+            **row,
+            "timeslots": [
+                rule for rule in self.rules.get(restaurant_id, [])
+                if rule.get("is_active")
+                and str(rule.get("valid_from") or "")[:10] <= today <= str(rule.get("valid_to") or "")[:10]
+            ]
+        }
+
+
+class CatalogService:
+    """
+    Текущий снимок каталога.
+
+    snapshot() отдаёт снимок, если он моложе CATALOG_REFRESH_SECONDS, иначе
+    пересобирает его (одна сборка на всех ждущих). Фоновый цикл обновляет
+    снимок заранее, поэтому запросы обычно его не ждут. invalidate() после
+    изменений: следующий запрос увидит свежие данные, сборка, начатая до
+    сброса, не устанавливается. Другие процессы узнают об изменениях не
+    позже, чем через CATALOG_REFRESH_SECONDS.
+    """
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._building: Optional[asyncio.Future] = None
+        self._generation = 0
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.builds = 0
+        self.failures = 0
+        self.invalidations = 0
+
+    def current(self) -> Optional[CatalogSnapshot]:
+        return self._snapshot
+
+    async def snapshot(self) -> Optional[CatalogSnapshot]:
+        """Свежий снимок; None если собрать не удалось (вызывающий идёт в базу)"""
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.age() < self.refresh_interval:
+            self.hits += 1
+            return snapshot
+        try:
+            return await self.refresh()
+        except Exception:
+            log.exception("Catalog snapshot build failed")
+            # Устаревший снимок лучше, чем ничего
+            return self._snapshot
+
+    async def refresh(self) -> CatalogSnapshot:
+        """Пересобрать снимок (параллельные вызовы ждут одну сборку)"""
+        if self._building is not None:
+            return await asyncio.shield(self._building)
+
+        generation = self._generation
+        future = asyncio.get_running_loop().create_future()
+        self._building = future
+        try:
+            restaurants, rules = await asyncio.gather(
+                self._all_rows(db.query("restaurants")),
+                self._all_rows(db.query("discount_rules").select(TIMESLOT_COLUMNS))
+            )
+            # Индекс поиска на десятках тысяч ресторанов - сотни мс CPU: не в event loop
+            snapshot = await asyncio.to_thread(CatalogSnapshot, restaurants, rules)
+            self.builds += 1
+            if generation == self._generation:
+                self._snapshot = snapshot
+            future.set_result(snapshot)
+            return snapshot
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            self.failures += 1
+            future.set_exception(e)
+            future.exception()  # ждущих может не быть
+            raise
+        finally:
+            if self._building is future:
+                self._building = None
+
+    @staticmethod
+    async def _all_rows(query) -> List[Dict[str, Any]]:
+        return [row async for row in query.iter_rows(keyset="id")]
+
+    def invalidate(self) -> None:
+        """Рестораны, фото или скидки изменились"""
+        self._snapshot = None
+        self._building = None
+        self._generation += 1
+        self.invalidations += 1
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                log.exception("Catalog refresh failed")
+            await asyncio.sleep(self.refresh_interval / 2)
+
+    def start(self) -> None:
+        """Запустить фоновое обновление (lifespan)"""
+        if self.refresh_interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "restaurants": len(snapshot.rows) if snapshot else 0,
+            "age_seconds": round(snapshot.age(), 1) if snapshot else None,
+            "hits": self.hits,
+            "builds": self.builds,
+            "failures": self.failures,
+            "invalidations": self.invalidations
+        }
+
+
+# ============================================
+# GLOBAL INSTANCE
+# ============================================
+
+catalog = CatalogService(refresh_interval=settings.CATALOG_REFRESH_SECONDS)
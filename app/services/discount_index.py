@@ -0,0 +1,207 @@
+"""
+Discount Index
+discount_rules ресторана, скомпилированные в интервальный индекс:
+период действия (valid_from..valid_to) -> день недели -> время суток.
+"Лучшая скидка на время t" - bisect; индекс кэшируется и пересобирается
+только после изменения правил (/api/bookings/discount_rules)
+"""
+from bisect import bisect_right
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.cache import TaggedCache
+from app.core.config import settings
+from app.core.database import db
+from app.core.logger import get_logger
+
+log = get_logger(__name__)
+
+# Скомпилированные индексы: ключ и тег - restaurant_id
+discount_indexes = TaggedCache(
+    max_entries=settings.DISCOUNT_INDEX_MAX_RESTAURANTS,
+    ttl=settings.DISCOUNT_INDEX_TTL_SECONDS
+)
+
+
+def _seconds(value: Any) -> Optional[int]:
+    """'10:00:00' / '10:00' -> секунды от полуночи; None если формат другой"""
+    try:
+        parts = [int(part) for part in str(value).split(":")]
+    except ValueError:
+        return None
+    if len(parts) == 2:
+        parts.append(0)
+    if len(parts) != 3:
+        return None
+    hours, minutes, seconds = parts
+    return hours * 3600 + minutes * 60 + seconds
+
+
+class TimeIndex:
+    """
+    Правила одного дня и одного сервиса по времени суток.
+
+    Границы всех окон [time_start, time_end) режут сутки на элементарные
+    отрезки; для каждого хранится лучшая скидка покрывающих его правил.
+    best(t) - bisect по границам. Окна через полночь (end <= start)
+    не действуют, как и раньше в движке слотов.
+    """
+
+    def __init__(self, rules: Sequence[Tuple[int, int, int]]):
+        windows = [(start, end, discount) for start, end, discount in rules if end > start]
+        self._bounds: List[int] = sorted({start for start, _, _ in windows} | {end for _, end, _ in windows})
+        position = {bound: i for i, bound in enumerate(self._bounds)}
+        self._best: List[Optional[int]] = [None] * max(len(self._bounds) - 1, 0)
+        for start, end, discount in windows:
+            for i in range(position[start], position[end]):
+                if self._best[i] is None or discount > self._best[i]:
+                    self._best[i] = discount
+
+        # Объединённые окна - по ним движок строит сетку слотов
+        self.windows: List[Tuple[int, int]] = []
+        for i, best in enumerate(self._best):
+            if best is None:
+                continue
+            if self.windows and self.windows[-1][1] == self._bounds[i]:
+                self.windows[-1] = (self.windows[-1][0], self._bounds[i + 1])
+            else:
+                self.windows.append((self._bounds[i], self._bounds[i + 1]))
+
+    def __bool__(self) -> bool:
+        return bool(self.windows)
+
+    def best(self, seconds: int) -> int:
+        """Лучшая скидка правил, чьё окно содержит момент (секунды от полуночи)"""
+        i = bisect_right(self._bounds, seconds) - 1
+        if 0 <= i < len(self._best) and self._best[i] is not None:
+            return self._best[i]
+        return 0
+
+
+class DayDiscounts:
+    """Правила, действующие в конкретный день (период и день недели уже учтены)"""
+
+    def __init__(self, rules: Sequence[Tuple[Any, int, int, int]]):
+        self._rules = rules  # (service_id, start, end, discount)
+        self._services: Dict[Any, TimeIndex] = {}
+        self._any: Optional[TimeIndex] = None
+
+    def service(self, service_id: Any) -> TimeIndex:
+        """Правила сервиса плюс общие правила ресторана (service_id is null)"""
+        index = self._services.get(service_id)
+        if index is None:
+            index = self._services[service_id] = TimeIndex([
+                (start, end, discount) for rule_service, start, end, discount in self._rules
+                if rule_service is None or rule_service == service_id
+            ])
+        return index
+
+    def any(self) -> TimeIndex:
+        """Все правила дня (ресторан без сервисов)"""
+        if self._any is None:
+            self._any = TimeIndex([(start, end, discount) for _, start, end, discount in self._rules])
+        return self._any
+
+
+_NO_DISCOUNTS = DayDiscounts(())
+
+
+class DiscountIndex:
+    """
+    Все активные discount_rules ресторана.
+
+    Даты valid_from и valid_to + 1 день режут календарь на отрезки с
+    постоянным набором правил; for_day() находит отрезок bisect-ом и
+    компилирует (отрезок, день недели) в DayDiscounts один раз.
+    day_of_week: 0 = понедельник ... 6 = воскресенье, null - каждый день.
+    Правила без valid_from/valid_to или с невалидным временем пропускаются.
+    """
+
+    def __init__(self, rules: Sequence[Dict[str, Any]]):
+        compiled = []
+        for rule in rules:
+            try:
+                first = date.fromisoformat(str(rule["valid_from"])[:10])
+                last = date.fromisoformat(str(rule["valid_to"])[:10])
+                weekday = rule.get("day_of_week")
+                weekday = int(weekday) if weekday is not None else None
+            except (KeyError, TypeError, ValueError):
+                continue
+            start = _seconds(rule.get("time_start", "10:00:00"))
+            end = _seconds(rule.get("time_end", "23:00:00"))
+            if start is None or end is None or last < first:
+                continue
+            compiled.append((first, last, weekday, (rule.get("service_id"), start, end, rule.get("discount") or 0)))
+
+        self._cuts: List[date] = sorted({first for first, *_ in compiled} | {last + timedelta(days=1) for _, last, *_ in compiled})
+        position = {cut: i for i, cut in enumerate(self._cuts)}
+        self._segments: List[List[Tuple[Optional[int], Tuple]]] = [[] for _ in range(max(len(self._cuts) - 1, 0))]
+        for first, last, weekday, rule in compiled:
+            for i in range(position[first], position[last + timedelta(days=1)]):
+                self._segments[i].append((weekday, rule))
+        self._days: Dict[Tuple[int, int], DayDiscounts] = {}
+        self.rules = len(compiled)
+
+    def for_day(self, day: date) -> DayDiscounts:
+        i = bisect_right(self._cuts, day) - 1
+        if not 0 <= i < len(self._segments):
+            return _NO_DISCOUNTS
+        key = (i, day.weekday())
+        discounts = self._days.get(key)
+        if discounts is None:
+            discounts = self._days[key] = DayDiscounts([
+                rule for weekday, rule in self._segments[i]
+                if weekday is None or weekday == key[1]
+            ])
+        return discounts
+
+
+class DiscountService:
+    """Загрузка и кэш DiscountIndex"""
+
+    @staticmethod
+    async def get_indexes(restaurant_ids: Sequence[int]) -> Dict[int, DiscountIndex]:
+        """
+        Индексы ресторанов: из кэша, недостающие - одним запросом in.()
+        по всем активным правилам (без фильтра по датам, индекс покрывает
+        любое окно). Правило сервиса должно иметь restaurant_id - его
+        проставляют все эндпоинты создания скидок.
+        """
+        result: Dict[int, DiscountIndex] = {}
+        missing = []
+        for restaurant_id in restaurant_ids:
+            index = discount_indexes.get(restaurant_id)
+            if index is None:
+                missing.append(restaurant_id)
+            else:
+                result[restaurant_id] = index
+        if not missing:
+            return result
+
+        generations = {restaurant_id: discount_indexes.generation(restaurant_id) for restaurant_id in missing}
+        rules_by_restaurant: Dict[Any, List[Dict[str, Any]]] = {}
+        query = (
+            db.query("discount_rules")
+            .in_("restaurant_id", missing)
+            .eq("is_active", True)
+        )
+        # По id: порядок правил стабилен
+        async for rule in query.iter_rows(keyset="id"):
+            rules_by_restaurant.setdefault(rule.get("restaurant_id"), []).append(rule)
+
+        for restaurant_id in missing:
+            index = DiscountIndex(rules_by_restaurant.get(restaurant_id, []))
+            discount_indexes.put(restaurant_id, restaurant_id, index, generations[restaurant_id])
+            result[restaurant_id] = index
+        return result
+
+    @staticmethod
+    def invalidate(restaurant_id: Optional[int] = None) -> None:
+        """Правила ресторана (или любые) изменились"""
+        if restaurant_id is None:
+            discount_indexes.clear()
+        else:
+            discount_indexes.invalidate(int(restaurant_id))
+
+
+discount_service = DiscountService()
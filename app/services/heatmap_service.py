@@ -0,0 +1,165 @@
+"""
+Heatmap Service
+Загрузка ресторана по дням и интервалам времени за окно (месяц) для
+партнёров: данные загружаются один раз, матрица считается NumPy
+"""
+from datetime import date, datetime, timedelta, tzinfo
+from typing import Any, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.booking_service import booking_service, OCCUPYING_STATUSES
+from app.services.slot_service import (
+    slot_service, SlotContext, DEFAULT_CAPACITY, micros
+)
+
+_MINUTE = 60_000_000  # micros
+
+
+def _spread(size: int, first: np.ndarray, last: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Сумма values по ячейкам [first, last) каждого интервала (разностный массив + cumsum)"""
+    first = np.clip(first, 0, size)
+    last = np.clip(np.maximum(last, first), 0, size)
+    diff = np.zeros(size + 1, dtype=np.float64)
+    np.add.at(diff, first, values)
+    np.add.at(diff, last, -values)
+    return np.cumsum(diff[:-1])
+
+
+class HeatmapService:
+    """Матрица день x интервал: гости, вместимость, загрузка %"""
+
+    @staticmethod
+    def build(
+        contexts: Dict[date, SlotContext],
+        first_day: date,
+        days: int,
+        bucket_minutes: int,
+        tz: tzinfo
+    ) -> Dict[str, Any]:
+        """
+        Посчитать матрицу без обращений к базе.
+
+        - guests: party_size броней, пересекающих интервал [t, t + bucket)
+          (та же семантика, что у слотов; бронь после полуночи попадает
+          в интервалы следующего дня)
+        - capacity: сумма capacity_seats сервисов, чьё окно (SlotService.service_windows,
+          как в build_slots) пересекает интервал
+        - load: guests / capacity в процентах, None без вместимости
+
+        Колонки обрезаются до интервалов, где есть вместимость или гости.
+        Сетка - bucket_minutes от локальной полуночи, день считается
+        равным 24 часам (в settings.TIMEZONE нет перехода на летнее время).
+        """
+        per_day = 1440 // bucket_minutes
+        size = days * per_day
+        origin = micros(booking_service.local_day_bounds(first_day, tz)[0])
+        bucket = bucket_minutes * _MINUTE
+
+        booking_starts: List[float] = []
+        booking_durations: List[float] = []
+        booking_guests: List[float] = []
+        capacity_starts: List[int] = []
+        capacity_ends: List[int] = []
+        capacity_seats: List[float] = []
+
+        for day, context in contexts.items():
+            offset = (day - first_day).days
+            if not 0 <= offset < days:
+                continue
+
+            for booking in context.bookings:
+                if booking.get("status") not in OCCUPYING_STATUSES:
+                    continue
+                # Те же правила пропуска, что в booking_interval, но арифметика
+                # времени - векторно ниже (timedelta на бронь здесь самое дорогое)
+                raw = booking.get("booking_datetime", "")
+                duration = booking.get("duration_minutes", 60)
+                guests = booking.get("party_size", 1)
+                if not raw or not isinstance(duration, (int, float)) or not isinstance(guests, (int, float)):
+                    continue
+                try:
+                    start = datetime.fromisoformat(raw.replace("+00", "+00:00"))
+                except (ValueError, TypeError, AttributeError):
+                    continue
+                if start.tzinfo is None:
+                    continue
+                booking_starts.append(start.timestamp())
+                booking_durations.append(duration)
+                booking_guests.append(guests)
+
+            day_second = offset * 86400
+            discounts = context.day_discounts(day)
+            for service in context.services:
+                service_id = service.get("id")
+                seats = context.capacities.get(service_id, DEFAULT_CAPACITY)
+                for window_start, window_end in slot_service.service_windows(service, discounts.service(service_id)):
+                    capacity_starts.append(day_second + window_start)
+                    capacity_ends.append(day_second + window_end)
+                    capacity_seats.append(seats)
+
+        # Секунды epoch -> micros от начала окна (rint убирает погрешность float)
+        starts = np.rint(np.asarray(booking_starts, dtype=np.float64) * 1e6).astype(np.int64) - origin
+        ends = starts + np.rint(np.asarray(booking_durations, dtype=np.float64) * _MINUTE).astype(np.int64)
+        positive = ends > starts
+        guests = _spread(
+            size,
+            starts[positive] // bucket,
+            -(-ends[positive] // bucket),  # ceil: последний задетый интервал включительно
+            np.asarray(booking_guests, dtype=np.float64)[positive]
+        ).reshape(days, per_day)
+
+        windows_start = np.asarray(capacity_starts, dtype=np.int64)
+        windows_end = np.asarray(capacity_ends, dtype=np.int64)
+        capacity = _spread(
+            size,
+            windows_start // (bucket_minutes * 60),
+            -(-windows_end // (bucket_minutes * 60)),
+            np.asarray(capacity_seats, dtype=np.float64)
+        ).reshape(days, per_day)
+
+        active = np.flatnonzero((guests > 0).any(axis=0) | (capacity > 0).any(axis=0))
+        columns = slice(active[0], active[-1] + 1) if active.size else slice(0, 0)
+        guests, capacity = guests[:, columns], capacity[:, columns]
+
+        load = np.divide(guests * 100, capacity, out=np.zeros_like(guests), where=capacity > 0)
+        load_cells = np.rint(load).astype(np.int64).tolist()
+        for row, capacity_row in zip(load_cells, capacity.tolist()):
+            for i, seats in enumerate(capacity_row):
+                if seats <= 0:
+                    row[i] = None
+
+        as_numbers = (lambda m: m.astype(np.int64).tolist()) if np.all(np.mod(guests, 1) == 0) else (lambda m: m.tolist())
+        minutes = range(columns.start * bucket_minutes, columns.stop * bucket_minutes, bucket_minutes)
+        return {
+            "days": [(first_day + timedelta(days=i)).isoformat() for i in range(days)],
+            "times": [f"{m // 60:02d}:{m % 60:02d}" for m in minutes],
+            "guests": as_numbers(guests),
+            "capacity": capacity.astype(np.int64).tolist(),
+            "load": load_cells
+        }
+
+    @staticmethod
+    async def get_heatmap(
+        restaurant_id: int,
+        first_day: date,
+        days: int,
+        bucket_minutes: int,
+        tz: Optional[tzinfo] = None
+    ) -> Dict[str, Any]:
+        """Загрузить окно одним набором запросов (load_contexts) и построить матрицу"""
+        tz = tz or ZoneInfo(settings.TIMEZONE)
+        last_day = first_day + timedelta(days=days - 1)
+        contexts = await slot_service.load_contexts(restaurant_id, first_day, last_day, tz)
+
+        # Без сервисов load_contexts брони не грузит, а гости нужны и тут
+        if not any(context.services for context in contexts.values()):
+            bookings = await booking_service.get_for_local_range(restaurant_id, first_day, last_day, tz=tz)
+            contexts = {first_day: SlotContext(None, [], {}, None, bookings)}
+
+        return HeatmapService.build(contexts, first_day, days, bucket_minutes, tz)
+
+
+heatmap_service = HeatmapService()
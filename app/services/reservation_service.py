@@ -0,0 +1,165 @@
+"""
+Reservation Service
+Создание брони с резервированием мест: бронь не должна поднять загрузку
+слота выше settings.SLOT_MAX_LOAD, даже при сотнях параллельных попыток
+"""
+from datetime import date, datetime, time, timedelta, tzinfo
+from typing import Any, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from app.core.config import settings
+from app.core.database import db
+from app.core.locks import KeyedLock
+from app.core.logger import get_logger
+from app.services.booking_service import booking_service
+from app.services.slot_service import slot_service, SlotContext, booking_interval, micros
+
+log = get_logger(__name__)
+
+# Один writer на (restaurant_id, локальный день) в процессе
+reservation_locks = KeyedLock()
+
+
+class SlotFullError(Exception):
+    """Бронь перегрузила бы слоты; slots - [{time, service_id, booked_guests, capacity}]"""
+
+    def __init__(self, slots: List[Dict[str, Any]]):
+        super().__init__("slot is full")
+        self.slots = slots
+
+
+class ReservationService:
+    """Проверка вместимости и атомарное создание брони"""
+
+    rollback_failures = 0  # переполненные брони, которые не удалось удалить
+
+    @staticmethod
+    def overloaded_slots(
+        context: SlotContext,
+        bookings: List[Dict[str, Any]],
+        booking: Dict[str, Any],
+        day: date,
+        tz: tzinfo
+    ) -> List[Dict[str, Any]]:
+        """
+        Слоты, которые пересекает booking и в которых загрузка (bookings,
+        включая саму booking) строго больше SLOT_MAX_LOAD. Считается тем же
+        движком и с тем же порогом, что и /available-slots: слот, который
+        там недоступен (load >= порога), переполнит любая бронь.
+        """
+        interval = booking_interval(booking)
+        if interval is None or not context.services:
+            return []
+        booking_start, booking_end, _ = interval
+        midnight = datetime.combine(day, time()).replace(tzinfo=tz)
+        steps = {service.get("id"): service.get("slot_step_minutes", 60) for service in context.services}
+
+        checked = SlotContext(context.hours, context.services, context.capacities, context.discounts, bookings)
+        overloaded = []
+        for slot in slot_service.build_slots(checked, day, tz):
+            if slot.get("capacity") is None:
+                continue
+            hours, minutes = map(int, slot["time"].split(":"))
+            slot_start = midnight + timedelta(hours=hours, minutes=minutes)
+            slot_end = slot_start + timedelta(minutes=steps.get(slot["service_id"], 60))
+            if not (micros(slot_start) < booking_end and micros(slot_end) > booking_start):
+                continue
+            load = slot["booked_guests"] / slot["capacity"] if slot["capacity"] > 0 else 0
+            if load > settings.SLOT_MAX_LOAD:
+                overloaded.append({
+                    "time": slot["time"],
+                    "service_id": slot["service_id"],
+                    "booked_guests": slot["booked_guests"],
+                    "capacity": slot["capacity"]
+                })
+        return overloaded
+
+    @staticmethod
+    async def reserve(data: Dict[str, Any], tz: Optional[tzinfo] = None) -> Optional[Dict[str, Any]]:
+        """
+        Создать бронь, если для неё есть места.
+
+        Returns:
+            созданная строка bookings или None при ошибке базы
+
+        Raises:
+            SlotFullError - мест нет, брони в базе не осталось
+
+        Внутри процесса попытки на один (ресторан, день) идут по очереди
+        (reservation_locks) - в одном процессе переполнения нет. Между
+        процессами:
+        - BOOKING_RESERVE_RPC задан - проверку и insert делает Postgres
+          функция в одной транзакции (вызов не схлопывается single-flight).
+          Контракт: rpc(booking jsonb, max_load float) -> [строка] если
+          создана, [] если мест нет (load после брони > max_load).
+          Единственный строгий вариант при нескольких воркерах;
+        - иначе - best-effort: insert и повторная проверка по свежим броням
+          с id <= новой, при переполнении своя бронь удаляется. id из
+          sequence выдаётся до commit, поэтому два процесса могут считать
+          бронь друг друга более поздней и оставить обе: редкое
+          переполнение возможно.
+        Если откат не удался (delete вернул ошибку), бронь остаётся в базе:
+        она возвращается как созданная (иначе клиент получил бы 409 при
+        существующей брони), в лог пишется error, счётчик rollback_failures.
+        Рестораны без сервисов (нет вместимости) не проверяются.
+        """
+        tz = tz or ZoneInfo(settings.TIMEZONE)
+        # Бронь без длительности движок слотов не учитывает - проставляем явно
+        if data.get("duration_minutes") is None:
+            data["duration_minutes"] = settings.DEFAULT_SLOT_DURATION
+        restaurant_id = int(data["restaurant_id"])
+        day = datetime.fromisoformat(data["booking_datetime"]).astimezone(tz).date()
+
+        async with reservation_locks.hold((restaurant_id, day)):
+            if settings.BOOKING_RESERVE_RPC:
+                rows = await db.rpc(
+                    settings.BOOKING_RESERVE_RPC,
+                    {"booking": data, "max_load": settings.SLOT_MAX_LOAD},
+                    coalesce=False
+                )
+                if rows is None:
+                    return None
+                if not rows:
+                    raise SlotFullError([])
+                return rows[0]
+
+            contexts = await slot_service.load_contexts(restaurant_id, day, day, tz)
+            context = contexts[day]
+            if not context.services:
+                return await booking_service.create(data)
+
+            overloaded = ReservationService.overloaded_slots(context, [*context.bookings, data], data, day, tz)
+            if overloaded:
+                raise SlotFullError(overloaded)
+
+            booking = await booking_service.create(data)
+            if not booking:
+                return None
+
+            # Другой процесс мог вставить бронь на этот день между проверкой и insert
+            fresh = await booking_service.get_for_local_date(restaurant_id, day, tz=tz)
+            booking_id = booking.get("id")
+            earlier = [
+                b for b in fresh
+                if not (isinstance(b.get("id"), int) and isinstance(booking_id, int) and b["id"] > booking_id)
+            ]
+            overloaded = ReservationService.overloaded_slots(context, earlier, booking, day, tz)
+            if overloaded:
+                log.warning("Booking lost capacity race, rolling back", extra={
+                    "restaurant_id": restaurant_id,
+                    "booking_id": booking_id,
+                    "date": day.isoformat()
+                })
+                if not await booking_service.delete(booking_id):
+                    ReservationService.rollback_failures += 1
+                    log.error("Booking rollback failed, slot stays overbooked", extra={
+                        "restaurant_id": restaurant_id,
+                        "booking_id": booking_id,
+                        "date": day.isoformat()
+                    })
+                    return booking
+                raise SlotFullError(overloaded)
+            return booking
+
+
+reservation_service = ReservationService()
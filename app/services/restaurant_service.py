@@ -2,9 +2,139 @@
 Restaurant Service - Production Ready
 Работает с вашей БД структурой и кастомным SupabaseClient
 """
+import base64
+import hashlib
 from datetime import date, datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable, Mapping, Sequence, Tuple
+import orjson
+from app.core.config import settings
 from app.core.database import db
+from app.core.logger import get_logger
+
+log = get_logger(__name__)
+
+# Колонки карточки ресторана в листинге
+LISTING_COLUMNS = tuple(c.strip() for c in settings.RESTAURANT_LIST_COLUMNS.split(",") if c.strip())
+
+# Колонки скидок (timeslots), которые отдаём фронтенду
+TIMESLOT_COLUMNS = (
+    "id", "restaurant_id", "day_of_week", "time_start", "time_end", "discount",
+    "description", "is_active", "valid_from", "valid_to", "max_tables"
+)
+
+# avg_check_filter листинга -> (нижняя граница не включительно, верхняя включительно)
+AVG_CHECK_RANGES = {
+    "0-5000": (None, 5000),
+    "5000-10000": (5000, 10000),
+    "10000-15000": (10000, 15000),
+    "15000+": (15000, None),
+}
+
+# sort_by листинга -> (колонка, по убыванию)
+SORTS = {
+    "popularity": ("popularity", True),
+    "rating_desc": ("rating", True),
+    "avg_check_asc": ("avg_check", False),
+    "avg_check_desc": ("avg_check", True),
+}
+
+
+def in_avg_check_range(avg_check: Any, bounds: tuple) -> bool:
+    """avg_check попадает в корзину AVG_CHECK_RANGES (0-5000 включает 0)"""
+    if not isinstance(avg_check, (int, float)):
+        return False
+    low, high = bounds
+    if low is None:
+        return 0 <= avg_check <= high
+    return avg_check > low and (high is None or avg_check <= high)
+
+
+def listing_sort_key(sort_by: Optional[str], relevance: Optional[Mapping[Any, float]] = None) -> Callable[[Dict[str, Any]], tuple]:
+    """
+    Ключ порядка листинга, одинаковый для снимка, базы и курсоров:
+    - sort_by из SORTS: (значение null?, значение со знаком направления, id) -
+      как order=<column>.<dir>.nullslast,id.asc в базе
+    - поиск без sort_by (снимок): (-релевантность, -popularity, id)
+    - иначе (id,)
+    """
+    if sort_by in SORTS:
+        column, descending = SORTS[sort_by]
+
+        def key(row: Dict[str, Any]) -> tuple:
+            value = row.get(column)
+            if not isinstance(value, (int, float)):
+                return (1, 0, row.get("id"))
+            return (0, -value if descending else value, row.get("id"))
+        return key
+    if relevance is not None:
+        return lambda row: (-relevance[row.get("id")], -(row.get("popularity") or 0), row.get("id"))
+    return lambda row: (row.get("id"),)
+
+
+def encode_cursor(filters: Sequence[Any], key: tuple) -> str:
+    """Непрозрачный курсор: ключ последней строки страницы + отпечаток фильтров"""
+    payload = {"f": listing_fingerprint(filters), "k": list(key)}
+    return base64.urlsafe_b64encode(orjson.dumps(payload)).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, filters: Sequence[Any], sort_by: Optional[str]) -> Optional[tuple]:
+    """
+    Ключ из курсора; None если курсор испорчен, выдан для других фильтров
+    или ключ не той формы. Курсор собирает клиент, а ключ попадает в
+    фильтр PostgREST (get_listing), поэтому проверяются типы:
+    - sort_by из SORTS: [0|1, число|null, int id] (при 0 - число)
+    - иначе: [int id] или ключ релевантности снимка [число, число, int id]
+    """
+    try:
+        payload = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        key = payload["k"]
+        if payload["f"] != listing_fingerprint(filters) or not isinstance(key, list):
+            return None
+    except (ValueError, TypeError, KeyError):
+        return None
+    if not _valid_key(key, sort_by):
+        return None
+    return tuple(key)
+
+
+def _number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _valid_key(key: List[Any], sort_by: Optional[str]) -> bool:
+    if not key or not isinstance(key[-1], int) or isinstance(key[-1], bool):
+        return False
+    if sort_by in SORTS:
+        return (
+            len(key) == 3
+            and key[0] in (0, 1) and not isinstance(key[0], bool)
+            and (_number(key[1]) or (key[0] == 1 and key[1] is None))
+        )
+    return len(key) == 1 or (len(key) == 3 and _number(key[0]) and _number(key[1]))
+
+
+def listing_fingerprint(filters: Sequence[Any]) -> str:
+    return hashlib.blake2s(orjson.dumps(list(filters)), digest_size=6).hexdigest()
+
+
+def paginate(
+    rows: List[Dict[str, Any]],
+    key: Callable[[Dict[str, Any]], tuple],
+    after: Optional[tuple],
+    page_size: int
+) -> Tuple[List[Dict[str, Any]], Optional[tuple]]:
+    """Страница после ключа after (rows уже отсортированы по key); ключ следующей или None"""
+    if after is not None:
+        rows = [row for row in rows if key(row) > after]
+    page = rows[:page_size]
+    return page, (key(page[-1]) if len(rows) > page_size else None)
+
+
+def matches_search(restaurant: Dict[str, Any], search: str) -> bool:
+    """Старый поиск листинга: подстрока в названии или в списке кухонь"""
+    needle = search.strip().lower()
+    return needle in (restaurant.get("name") or "").lower() or \
+        needle in " ".join(restaurant.get("cuisine") or []).lower()
 
 
 class RestaurantService:
@@ -13,9 +143,7 @@ class RestaurantService:
     @staticmethod
     async def get_by_id(restaurant_id: int) -> Optional[Dict]:
         """Получить ресторан по ID"""
-        filters = {"id": f"eq.{restaurant_id}"}
-        result = await db.get("restaurants", filters=filters)
-        return result[0] if result else None
+        return await db.query("restaurants").eq("id", restaurant_id).first()
     
     @staticmethod
     async def update(restaurant_id: int, **kwargs) -> Optional[Dict]:
@@ -69,18 +197,14 @@ class RestaurantService:
             # Преобразуем date в строку если нужно
             date_str = target_date.isoformat() if isinstance(target_date, date) else target_date
             
-            # Фильтры для Supabase REST API
-            filters = {
-                "restaurant_id": f"eq.{restaurant_id}",
-                "is_active": "eq.true",
-                "valid_from": f"lte.{date_str}",
-                "valid_to": f"gte.{date_str}"
-            }
-            
-            result = await db.get(
-                table="discount_rules",
-                filters=filters,
-                select="id,restaurant_id,day_of_week,time_start,time_end,discount,description,is_active,valid_from,valid_to,max_tables"
+            result = await (
+                db.query("discount_rules")
+                .select(TIMESLOT_COLUMNS)
+                .eq("restaurant_id", restaurant_id)
+                .eq("is_active", True)
+                .lte("valid_from", date_str)
+                .gte("valid_to", date_str)
+                .execute()
             )
             
             return result if result else []
@@ -265,38 +389,136 @@ class RestaurantService:
     
     
     @staticmethod
-    async def get_all(limit: int = 100) -> List[dict]:
-        """Получить все рестораны"""
-        try:
-            print("=== DEBUG restaurant_service.get_all ===")
-            print(f"Limit: {limit}")
+    async def get_all(limit: int = 100, columns: Optional[Sequence[str]] = None) -> List[dict]:
+        """
+        Получить все рестораны.
         
-            restaurants = await db.get(
-                "restaurants", 
-                limit=limit
-                # Убрали order - может быть причина проблемы
+        columns - проекция (например LISTING_COLUMNS), по умолчанию все колонки
+        """
+        try:
+            restaurants = await (
+                db.query("restaurants")
+                .select(columns or "*")
+                .limit(limit)
+                .execute()
             )
             
-            print(f"db.get restaurants result: {restaurants}")
-            print(f"Restaurants length: {len(restaurants) if restaurants else 0}")
-            
             return restaurants or []
         except Exception as e:
-            print(f"❌ Ошибка получения ресторанов: {e}")
+            log.error("Ошибка получения ресторанов: %s", e)
             return []
 
 
+
+    @staticmethod
+    async def get_listing(
+        search: Optional[str] = None,
+        category: Optional[str] = None,
+        city: Optional[str] = None,
+        sort_by: Optional[str] = None,
+        avg_check_filter: Optional[str] = None,
+        limit: int = 100,
+        columns: Optional[Sequence[str]] = None,
+        after: Optional[tuple] = None
+    ) -> Optional[List[dict]]:
+        """
+        Листинг с фильтрами на стороне базы: category/city - eq, корзина
+        avg_check - gt/gte/lte, sort_by - order (null в конце, затем id),
+        limit - limit. Передаётся ровно результат, а не первые limit строк
+        таблицы.
+
+        after - ключ listing_sort_key последней строки предыдущей страницы
+        (keyset: строки строго после него в том же порядке). Значения ключа
+        подставляются в фильтр как есть: из курсора - только через
+        decode_cursor (проверка типов).
+
+        search (подстрока в названии или кухнях, кухни - массив) PostgREST
+        выразить не может: строки после фильтров базы читаются страницами
+        и проверяются в Python, пока не наберётся limit.
+
+        Returns:
+            строки или None, если запрос не удался (вызывающий фильтрует в Python)
+        """
+        query = db.query("restaurants").select(columns or "*")
+        if category and category != "all":
+            query.eq("category", category)
+        if city and city != "all":
+            query.eq("city", city)
+        if avg_check_filter and avg_check_filter != "all":
+            bounds = AVG_CHECK_RANGES.get(avg_check_filter)
+            if bounds is None:
+                return []
+            low, high = bounds
+            if low is None:
+                query.gte("avg_check", 0)
+            else:
+                query.gt("avg_check", low)
+            if high is not None:
+                query.lte("avg_check", high)
+        if sort_by in SORTS:
+            column, descending = SORTS[sort_by]
+            query.order(column, desc=descending, nulls="nullslast")
+            if after is not None and len(after) == 3:
+                if after[0]:
+                    # Последняя строка уже среди null: дальше только null с большим id
+                    query.is_(column, None).gt("id", after[2])
+                else:
+                    value = -after[1] if descending else after[1]
+                    query.or_(
+                        f"{column}.{'lt' if descending else 'gt'}.{value}",
+                        f"and({column}.eq.{value},id.gt.{after[2]})",
+                        f"{column}.is.null"
+                    )
+        elif after is not None:
+            # Курсор поиска по релевантности (снимок) в базе - по id
+            query.gt("id", after[-1])
+        query.order("id")
+
+        if not (search and search.strip()):
+            return await query.limit(limit).execute()
+
+        found = []
+        try:
+            async for row in query.iter_rows(page_size=max(limit, 100)):
+                if matches_search(row, search):
+                    found.append(row)
+                    if len(found) >= limit:
+                        break
+        except RuntimeError as e:
+            log.warning("Listing query failed: %s", e)
+            return None
+        return found
+
+    @staticmethod
+    def filter_listing(
+        restaurants: List[dict],
+        search: Optional[str] = None,
+        category: Optional[str] = None,
+        city: Optional[str] = None,
+        sort_by: Optional[str] = None,
+        avg_check_filter: Optional[str] = None
+    ) -> List[dict]:
+        """Те же фильтры и сортировка в Python (fallback, если база не ответила на get_listing)"""
+        if search and search.strip():
+            restaurants = [r for r in restaurants if matches_search(r, search)]
+        if category and category != "all":
+            restaurants = [r for r in restaurants if r.get("category") == category]
+        if city and city != "all":
+            restaurants = [r for r in restaurants if r.get("city") == city]
+        if avg_check_filter and avg_check_filter != "all":
+            bounds = AVG_CHECK_RANGES.get(avg_check_filter)
+            restaurants = [r for r in restaurants if bounds and in_avg_check_range(r.get("avg_check"), bounds)]
+        if sort_by in SORTS:
+            column, descending = SORTS[sort_by]
+            restaurants = sorted(restaurants, key=lambda r: r.get(column) or 0, reverse=descending)
+        return restaurants
     
     @staticmethod
     async def search(query: str) -> List[Dict]:
         """Поиск ресторанов по названию"""
         try:
-            filters = {"name": f"ilike.%{query}%"}
-            
-            result = await db.get(
-                table="restaurants",
-                filters=filters
-            )
+            # contains() экранирует %, _ и URL-кодирует & / + в запросе
+            result = await db.query("restaurants").contains("name", query).execute()
             
             return result if result else []
         except Exception as e:
@@ -0,0 +1,239 @@
+"""
+Search Index
+Инвертированный индекс по названиям и кухням ресторанов: нормализация
+регистра и Unicode, транслитерация кириллица <-> латиница (включая
+казахские буквы), префиксы для автодополнения и опечатки (триграммы +
+расстояние Левенштейна)
+"""
+import heapq
+import re
+import unicodedata
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Буквы, которые NFKD не сводит к базовым (казахская кириллица, турецкая латиница)
+_FOLD = str.maketrans({
+    "ә": "а", "ғ": "г", "қ": "к", "ң": "н", "ө": "о", "ұ": "у", "ү": "у", "һ": "х", "і": "и",
+    "ş": "sh", "ç": "ch", "ı": "i", "ß": "ss",
+})
+
+_CYRILLIC_TO_LATIN = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ж": "zh", "з": "z",
+    "и": "i", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o", "п": "p", "р": "r",
+    "с": "s", "т": "t", "у": "u", "ф": "f", "х": "h", "ц": "ts", "ч": "ch", "ш": "sh",
+    "щ": "sh", "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+})
+
+# Варианты латинского написания одного звука -> одна форма
+_LATIN_RULES = (
+    (re.compile(r"ph"), "f"),
+    (re.compile(r"ck"), "k"),
+    (re.compile(r"kh"), "h"),
+    (re.compile(r"c(?!h)"), "k"),
+    (re.compile(r"q"), "k"),
+    (re.compile(r"w"), "v"),
+    (re.compile(r"x"), "ks"),
+    (re.compile(r"y"), "i"),
+    (re.compile(r"(.)\1+"), r"\1"),  # coffee -> kofe, как "кофе"
+)
+
+_WORD = re.compile(r"\w+")
+_COMBINING = re.compile(r"[\u0300-\u036f]")  # диакритика после NFKD
+
+# Вес поля: совпадение в названии важнее совпадения в кухне
+_NAME_WEIGHT = 1.0
+_FIRST_WORD_BONUS = 0.2
+_CUISINE_WEIGHT = 0.5
+
+_MAX_PREFIX_TERMS = 200  # терминов на один короткий префикс
+
+
+def fold(text: str) -> str:
+    """Регистр, ё -> е, казахские буквы, диакритика (café -> cafe)"""
+    text = text.casefold().translate(_FOLD)
+    return _COMBINING.sub("", unicodedata.normalize("NFKD", text))
+
+
+@lru_cache(maxsize=65536)
+def skeleton(word: str) -> str:
+    """
+    Ключ слова в индексе: кириллица транслитерируется, латинские
+    варианты сводятся к одной форме, двойные буквы схлопываются.
+    "Кафе" и "Cafe", "Чайхана" и "Chaikhana", "Кофе" и "Coffee" дают один ключ.
+    """
+    word = word.translate(_CYRILLIC_TO_LATIN)
+    for pattern, replacement in _LATIN_RULES:
+        word = pattern.sub(replacement, word)
+    return word
+
+
+def terms(text: Any) -> List[str]:
+    """Текст -> ключи слов по порядку"""
+    if not text:
+        return []
+    return [key for key in (skeleton(word) for word in _WORD.findall(fold(str(text)))) if key]
+
+
+def _trigrams(term: str) -> set:
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _levenshtein(a: str, b: str, limit: int) -> int:
+    """
+    Расстояние Левенштейна с перестановкой соседних букв (nedleka -> nedelka
+    - одна правка); limit + 1, если больше limit (ранний выход)
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit and (i == len(a) or min(previous) > limit):
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+def _typo_limit(term: str) -> int:
+    """Допустимое число опечаток по длине слова (в числах опечаток не ищем)"""
+    if len(term) < 4 or term.isdigit():
+        return 0
+    return 1 if len(term) < 8 else 2
+
+
+class SearchIndex:
+    """
+    Индекс документов {id, name, cuisine, popularity}.
+
+    postings: ключ слова -> {документ: вес поля}. Слово запроса совпадает
+    со словом документа точно, как префикс или с опечатками; документ
+    должен совпасть со всеми словами запроса. Оценка - сумма лучших
+    совпадений по словам, при равенстве - popularity.
+    """
+
+    def __init__(self, documents: Iterable[Dict[str, Any]]):
+        self.ids: List[Any] = []
+        self.names: List[str] = []
+        self._popularity: List[float] = []
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._cuisines: Dict[str, Tuple[str, set]] = {}  # ключ -> (как написано, документы)
+
+        cuisine_cache: Dict[Any, List[str]] = {}
+        for doc, document in enumerate(documents):
+            self.ids.append(document.get("id"))
+            self.names.append(document.get("name") or "")
+            popularity = document.get("popularity")
+            self._popularity.append(popularity if isinstance(popularity, (int, float)) else 0)
+
+            for position, term in enumerate(terms(document.get("name"))):
+                self._post(term, doc, _NAME_WEIGHT + (_FIRST_WORD_BONUS if position == 0 else 0))
+            for cuisine in document.get("cuisine") or []:
+                # Кухонь мало, а ресторанов с одной кухней много
+                cuisine_terms = cuisine_cache.get(cuisine)
+                if cuisine_terms is None:
+                    cuisine_terms = cuisine_cache[cuisine] = terms(cuisine)
+                for term in cuisine_terms:
+                    self._post(term, doc, _CUISINE_WEIGHT)
+                if cuisine_terms:
+                    self._cuisines.setdefault(" ".join(cuisine_terms), (str(cuisine), set()))[1].add(doc)
+
+        self._vocabulary: List[str] = sorted(self._postings)
+        self._by_trigram: Dict[str, List[str]] = {}
+        for term in self._vocabulary:
+            if _typo_limit(term):
+                for trigram in _trigrams(term):
+                    self._by_trigram.setdefault(trigram, []).append(term)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _post(self, term: str, doc: int, weight: float) -> None:
+        docs = self._postings.setdefault(term, {})
+        if weight > docs.get(doc, 0):
+            docs[doc] = weight
+
+    def _matches(self, term: str, prefix: bool) -> Dict[str, float]:
+        """Слова индекса, подходящие к слову запроса: слово -> качество 0..1"""
+        found: Dict[str, float] = {}
+        if term in self._postings:
+            found[term] = 1.0
+        if prefix:
+            start = bisect_left(self._vocabulary, term)
+            for candidate in self._vocabulary[start:start + _MAX_PREFIX_TERMS]:
+                if not candidate.startswith(term):
+                    break
+                if candidate != term:
+                    found[candidate] = 0.7 + 0.3 * len(term) / len(candidate)
+
+        # Опечатки: кандидаты с общими триграммами, затем точная проверка.
+        # Ищутся и при точном совпадении: "kazak" - это и "Қазақ", и "Kazakh"
+        limit = _typo_limit(term)
+        if not limit:
+            return found
+        shared: Dict[str, int] = {}
+        for trigram in _trigrams(term):
+            for candidate in self._by_trigram.get(trigram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        needed = max(1, len(term) + 1 - 4 * limit)  # правка (и перестановка) задевает не больше 4 триграмм
+        for candidate, count in shared.items():
+            if count < needed:
+                continue
+            if candidate in found:
+                continue
+            distance = _levenshtein(term, candidate, limit)
+            if distance <= limit:
+                found[candidate] = 0.5 - 0.15 * (distance - 1)
+        return found
+
+    def search(self, query: str, limit: Optional[int] = None, prefix: bool = True) -> List[Tuple[Any, float]]:
+        """
+        [(id, оценка)] по убыванию оценки. prefix - последнее слово запроса
+        может быть недописанным (автодополнение, поиск по мере ввода);
+        остальные слова тоже совпадают префиксом, как раньше подстрокой.
+        """
+        query_terms = terms(query)
+        if not query_terms:
+            return []
+
+        scores: Optional[Dict[int, float]] = None
+        for term in query_terms:
+            best: Dict[int, float] = {}
+            for candidate, quality in self._matches(term, prefix).items():
+                for doc, weight in self._postings[candidate].items():
+                    score = quality * weight
+                    if score > best.get(doc, 0):
+                        best[doc] = score
+            if scores is None:
+                scores = best
+            else:
+                scores = {doc: scores[doc] + score for doc, score in best.items() if doc in scores}
+            if not scores:
+                return []
+
+        order = lambda item: (-item[1], -self._popularity[item[0]], self.names[item[0]])  # noqa: E731
+        if limit is not None:
+            ranked = heapq.nsmallest(limit, scores.items(), key=order)
+        else:
+            ranked = sorted(scores.items(), key=order)
+        return [(self.ids[doc], round(score, 3)) for doc, score in ranked]
+
+    def suggest_cuisines(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        """Кухни, чьё название начинается с запроса: [{name, count}] по числу ресторанов"""
+        key = " ".join(terms(query))
+        if not key:
+            return []
+        found = [
+            {"name": name, "count": len(docs)}
+            for cuisine_key, (name, docs) in self._cuisines.items()
+            if cuisine_key.startswith(key)
+        ]
+        found.sort(key=lambda item: (-item["count"], item["name"]))
+        return found[:limit]
@@ -0,0 +1,469 @@
+"""
+Slot Service
+Движок доступных слотов: данные ресторана загружаются за постоянное
+число параллельных запросов, слоты строятся чистой функцией
+"""
+import asyncio
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from itertools import accumulate
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+from app.core.cache import TaggedCache
+from app.core.config import settings
+from app.core.database import db
+from app.core.logger import get_logger
+from app.services.booking_service import booking_service, OCCUPANCY_COLUMNS, OCCUPYING_STATUSES
+from app.services.discount_index import discount_service, DayDiscounts, DiscountIndex, TimeIndex
+
+log = get_logger(__name__)
+
+DEFAULT_CAPACITY = 16
+
+# Готовые слоты: ключ (restaurant_id, date), тег restaurant_id
+slot_cache = TaggedCache(
+    max_entries=settings.SLOT_CACHE_MAX_ENTRIES,
+    ttl=settings.SLOT_CACHE_TTL_SECONDS
+)
+
+
+class SlotContext:
+    """
+    Всё, что нужно для генерации слотов ресторана на дату.
+
+    - capacities: service_id -> capacity_seats (строка service_capacity с date is null)
+    - discounts: скомпилированные discount_rules ресторана (DiscountIndex)
+    """
+
+    def __init__(
+        self,
+        hours: Optional[Dict[str, Any]],
+        services: List[Dict[str, Any]],
+        capacities: Dict[Any, int],
+        discounts: Optional[DiscountIndex],
+        bookings: List[Dict[str, Any]]
+    ):
+        self.hours = hours
+        self.services = services
+        self.capacities = capacities
+        self.discounts = discounts
+        self.bookings = bookings
+
+    def day_discounts(self, day: date) -> DayDiscounts:
+        """Правила, действующие в день (пустые, если индекса нет)"""
+        return (self.discounts or _EMPTY_DISCOUNTS).for_day(day)
+
+
+_EMPTY_DISCOUNTS = DiscountIndex([])
+
+
+def _parse_time_range(start: str, end: str):
+    """'10:00:00' / '10:00' -> (time, time); ValueError если формат другой"""
+    try:
+        return datetime.strptime(start, "%H:%M:%S").time(), datetime.strptime(end, "%H:%M:%S").time()
+    except ValueError:
+        return datetime.strptime(start, "%H:%M").time(), datetime.strptime(end, "%H:%M").time()
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+_SECOND = timedelta(seconds=1)
+
+
+def micros(moment: datetime) -> int:
+    """Aware datetime -> целые микросекунды от epoch (точные сравнения без float)"""
+    return (moment - _EPOCH) // _MICROSECOND
+
+
+def booking_interval(booking: Dict[str, Any]) -> Optional[Tuple[int, int, Any]]:
+    """
+    Бронь -> (start, end, party_size), время в micros; None для броней,
+    которые движок пропускает (пустая/невалидная дата, naive datetime,
+    нечисловые duration_minutes/party_size)
+    """
+    booking_datetime_str = booking.get("booking_datetime", "")
+    if not booking_datetime_str:
+        return None
+    try:
+        booking_start = datetime.fromisoformat(booking_datetime_str.replace("+00", "+00:00"))
+        booking_end = booking_start + timedelta(minutes=booking.get("duration_minutes", 60))
+    except (ValueError, TypeError):
+        return None
+    guests = booking.get("party_size", 1)
+    if booking_start.tzinfo is None or not isinstance(guests, (int, float)):
+        return None
+    return micros(booking_start), micros(booking_end), guests
+
+
+class OccupancyIndex:
+    """
+    Занятость мест по броням дня (sweep line).
+
+    Брони разбираются один раз в отсортированные массивы начал и концов
+    с префиксными суммами гостей. Для слота [S, E):
+
+        guests = sum(party_size: start < E) - sum(party_size: end <= S)
+
+    Это равно сумме по броням с start < E and end > S, если end >= start,
+    поэтому брони с отрицательной длительностью считаются перебором.
+    Запрос слота - O(log n) вместо O(n) с повторным fromisoformat.
+
+    Брони, которые старый цикл пропускал, пропускаются и здесь
+    (см. booking_interval).
+    """
+
+    def __init__(self, bookings: List[Dict[str, Any]]):
+        starts: List[Tuple[int, Any]] = []
+        ends: List[Tuple[int, Any]] = []
+        self._irregular: List[Tuple[int, int, Any]] = []
+
+        for booking in bookings:
+            interval = booking_interval(booking)
+            if interval is None:
+                continue
+            start, end, guests = interval
+            if end < start:
+                self._irregular.append((start, end, guests))
+            else:
+                starts.append((start, guests))
+                ends.append((end, guests))
+
+        starts.sort(key=lambda item: item[0])
+        ends.sort(key=lambda item: item[0])
+        self._starts = [moment for moment, _ in starts]
+        self._ends = [moment for moment, _ in ends]
+        self._start_prefix = list(accumulate((guests for _, guests in starts), initial=0))
+        self._end_prefix = list(accumulate((guests for _, guests in ends), initial=0))
+
+    def guests(self, slot_start: datetime, slot_end: datetime):
+        """Сумма party_size броней, пересекающих [slot_start, slot_end)"""
+        s, e = micros(slot_start), micros(slot_end)
+        total = self._start_prefix[bisect_left(self._starts, e)] - self._end_prefix[bisect_right(self._ends, s)]
+        for start, end, guests in self._irregular:
+            if start < e and end > s:
+                total += guests
+        return total
+
+
+class SlotService:
+    """Сервис расчёта доступных слотов (TheFork-style)"""
+
+    @staticmethod
+    async def _all_rows(query) -> List[Dict[str, Any]]:
+        """Все строки запроса (keyset по id): на пачке ресторанов их бывает больше max-rows"""
+        return [row async for row in query.iter_rows(keyset="id")]
+
+    @staticmethod
+    async def load_contexts_many(
+        restaurant_ids: Sequence[int],
+        first_day: date,
+        last_day: date,
+        tz: Optional[tzinfo] = None
+    ) -> Dict[int, Dict[date, SlotContext]]:
+        """
+        Загрузить данные движка слотов для пачки ресторанов на дни
+        first_day..last_day: {restaurant_id: {day: SlotContext}}.
+
+        Две волны параллельных запросов на все рестораны и всё окно
+        (а не на каждый ресторан, день или сервис):
+        1. часы работы, сервисы через in.(), индексы скидок (из кэша,
+           недостающие - одним запросом, см. discount_index.py)
+        2. (если есть сервисы) capacities всех сервисов через in.(),
+           брони за локальные дни окна (диапазон и статусы фильтрует база)
+        Дальше данные раскладываются по ресторанам и дням в памяти.
+        """
+        tz = tz or ZoneInfo(settings.TIMEZONE)
+        restaurant_ids = list(dict.fromkeys(restaurant_ids))
+
+        hours_rows, services, discounts = await asyncio.gather(
+            SlotService._all_rows(
+                db.query("restaurant_hours")
+                .in_("restaurant_id", restaurant_ids)
+                .eq("is_closed", False)
+            ),
+            SlotService._all_rows(
+                db.query("restaurant_services")
+                .in_("restaurant_id", restaurant_ids)
+                .eq("is_active", True)
+            ),
+            discount_service.get_indexes(restaurant_ids)
+        )
+
+        hours_by_weekday: Dict[Tuple[Any, Any], Dict[str, Any]] = {}
+        for row in hours_rows:
+            hours_by_weekday.setdefault((row.get("restaurant_id"), row.get("weekday")), row)
+
+        services_by_restaurant: Dict[Any, List[Dict[str, Any]]] = {}
+        for service in services:
+            services_by_restaurant.setdefault(service.get("restaurant_id"), []).append(service)
+
+        capacities: Dict[Any, int] = {}
+        bookings_by_day: Dict[Tuple[Any, date], List[Dict[str, Any]]] = {}
+
+        service_ids = [s.get("id") for s in services if s.get("id") is not None]
+        if service_ids:
+            # Брони нужны только ресторанам с сервисами
+            booked_ids = [rid for rid in restaurant_ids if services_by_restaurant.get(rid)]
+            capacity_rows, bookings = await asyncio.gather(
+                SlotService._all_rows(
+                    db.query("service_capacity")
+                    .in_("service_id", service_ids)
+                    .is_("date", None)
+                ),
+                booking_service.get_for_local_range(
+                    booked_ids, first_day, last_day,
+                    columns=OCCUPANCY_COLUMNS + ("restaurant_id",),
+                    tz=tz
+                )
+            )
+            for row in capacity_rows:
+                # Как раньше: берётся первая строка сервиса
+                capacities.setdefault(row.get("service_id"), row.get("capacity_seats", DEFAULT_CAPACITY))
+
+            for booking in bookings:
+                if first_day == last_day:
+                    day = first_day
+                else:
+                    try:
+                        start = datetime.fromisoformat(booking["booking_datetime"].replace("+00", "+00:00"))
+                        day = start.astimezone(tz).date()
+                    except (KeyError, AttributeError, ValueError, TypeError):
+                        continue
+                bookings_by_day.setdefault((booking.get("restaurant_id"), day), []).append(booking)
+
+        contexts: Dict[int, Dict[date, SlotContext]] = {rid: {} for rid in restaurant_ids}
+        day = first_day
+        while day <= last_day:
+            for rid in restaurant_ids:
+                contexts[rid][day] = SlotContext(
+                    hours=hours_by_weekday.get((rid, day.weekday())),
+                    services=services_by_restaurant.get(rid, []),
+                    capacities=capacities,
+                    discounts=discounts.get(rid),
+                    bookings=bookings_by_day.get((rid, day), [])
+                )
+            day += timedelta(days=1)
+        return contexts
+
+    @staticmethod
+    async def load_contexts(
+        restaurant_id: int,
+        first_day: date,
+        last_day: date,
+        tz: Optional[tzinfo] = None
+    ) -> Dict[date, SlotContext]:
+        """Данные движка слотов одного ресторана на дни окна (см. load_contexts_many)"""
+        contexts = await SlotService.load_contexts_many([restaurant_id], first_day, last_day, tz)
+        return contexts[restaurant_id]
+
+    @staticmethod
+    async def load_context(restaurant_id: int, target_date: date) -> SlotContext:
+        """Данные движка слотов на один день (см. load_contexts)"""
+        contexts = await SlotService.load_contexts(restaurant_id, target_date, target_date)
+        return contexts[target_date]
+
+    @staticmethod
+    def build_slots(
+        context: SlotContext,
+        target_date: date,
+        tz: tzinfo,
+        occupancy: Optional[Any] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Сгенерировать слоты без обращений к базе.
+
+        occupancy - готовый индекс занятости с методом guests(start, end)
+        (см. app/services/availability_store.py); по умолчанию строится
+        OccupancyIndex из context.bookings.
+
+        Returns:
+            [{time, available, discount, service_id, booked_guests, capacity, load}],
+            без сервисов - [{time, available, discount}] из discount_rules
+        """
+        discounts = context.day_discounts(target_date)
+        if not context.services:
+            return SlotService._slots_from_rules(discounts.any(), target_date)
+
+        # context.bookings - уже брони этого локального дня; статус проверяем
+        # ещё раз, чтобы функция оставалась корректной для любого контекста
+        date_str = target_date.isoformat()
+        if occupancy is None:
+            target_bookings = [b for b in context.bookings if b.get("status") in OCCUPYING_STATUSES]
+
+            # Брони разбираются один раз на все сервисы и слоты
+            occupancy = OccupancyIndex(target_bookings)
+
+        midnight = datetime.combine(target_date, time()).replace(tzinfo=tz)
+        all_slots = []
+        for service in context.services:
+            service_id = service.get("id")
+            slot_step = service.get("slot_step_minutes", 60)
+            capacity = context.capacities.get(service_id, DEFAULT_CAPACITY)
+
+            # Правила сервиса и общие правила ресторана на этот день
+            rules = discounts.service(service_id)
+            windows = SlotService.service_windows(service, rules)
+
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Slot engine discount windows", extra={
+                    "service_id": service_id,
+                    "date": date_str,
+                    "windows": windows,
+                    "sampled": True
+                })
+
+            step = timedelta(minutes=slot_step)
+            for window_start, window_end in windows:
+                current = midnight + timedelta(seconds=window_start)
+                slot_end = midnight + timedelta(seconds=window_end)
+
+                while current + step <= slot_end:
+                    slot_time_start = current
+                    slot_time_end = current + step
+
+                    # Гости, чьи брони пересекают [slot_time_start, slot_time_end)
+                    booked_guests = occupancy.guests(slot_time_start, slot_time_end)
+
+                    load = booked_guests / capacity if capacity > 0 else 0
+                    is_available = load < settings.SLOT_MAX_LOAD
+
+                    all_slots.append({
+                        "time": current.strftime("%H:%M"),
+                        "available": is_available,
+                        # Лучшая скидка правил, действующих в момент начала слота
+                        "discount": rules.best((current - midnight) // _SECOND),
+                        "service_id": service_id if service_id else None,
+                        "booked_guests": booked_guests,
+                        "capacity": capacity,
+                        "load": round(load * 100)
+                    })
+
+                    current += step
+
+        return SlotService._dedupe(all_slots)
+
+    @staticmethod
+    def service_windows(service: Dict[str, Any], rules: TimeIndex) -> List[Tuple[int, int]]:
+        """
+        Окна сетки слотов сервиса (секунды от полуночи): объединённые окна
+        действующих discount_rules, без правил - start_time/end_time сервиса
+        """
+        if rules:
+            return rules.windows
+        try:
+            start_time, end_time = _parse_time_range(
+                service.get("start_time", "10:00:00"),
+                service.get("end_time", "15:00:00")
+            )
+        except ValueError:
+            return []
+        return [(
+            start_time.hour * 3600 + start_time.minute * 60 + start_time.second,
+            end_time.hour * 3600 + end_time.minute * 60 + end_time.second
+        )]
+
+    @staticmethod
+    def _slots_from_rules(rules: TimeIndex, target_date: date) -> List[Dict[str, Any]]:
+        """Ресторан без сервисов: слоты каждый час по окнам discount_rules"""
+        midnight = datetime.combine(target_date, time())
+        step = timedelta(minutes=60)
+        all_slots = []
+        for window_start, window_end in rules.windows:
+            current = midnight + timedelta(seconds=window_start)
+            slot_end = midnight + timedelta(seconds=window_end)
+
+            while current + step <= slot_end:
+                all_slots.append({
+                    "time": current.strftime("%H:%M"),
+                    "available": True,
+                    "discount": rules.best((current - midnight) // _SECOND)
+                })
+                current += step
+        return all_slots
+
+    @staticmethod
+    def _dedupe(all_slots: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Один слот на время: первый, но с максимальной скидкой"""
+        positions: Dict[str, int] = {}
+        unique_slots = []
+
+        for slot in all_slots:
+            time_key = slot["time"]
+            idx = positions.get(time_key)
+            if idx is None:
+                positions[time_key] = len(unique_slots)
+                unique_slots.append(slot)
+            elif slot["discount"] > unique_slots[idx]["discount"]:
+                # Если уже есть слот на это время, берём с большей скидкой
+                unique_slots[idx] = slot
+
+        return unique_slots
+
+    @staticmethod
+    async def get_slots(restaurant_id: int, target_date: date, tz: Optional[tzinfo] = None) -> List[Dict[str, Any]]:
+        """Загрузить контекст и построить слоты"""
+        tz = tz or ZoneInfo(settings.TIMEZONE)
+        contexts = await SlotService.load_contexts(restaurant_id, target_date, target_date, tz)
+        return SlotService.build_slots(contexts[target_date], target_date, tz)
+
+    @staticmethod
+    async def get_slots_range(
+        restaurant_id: int,
+        first_day: date,
+        last_day: date,
+        tz: Optional[tzinfo] = None
+    ) -> Dict[date, List[Dict[str, Any]]]:
+        """Слоты на каждый день окна: одна загрузка данных на всё окно"""
+        tz = tz or ZoneInfo(settings.TIMEZONE)
+        contexts = await SlotService.load_contexts(restaurant_id, first_day, last_day, tz)
+        return {day: SlotService.build_slots(context, day, tz) for day, context in contexts.items()}
+
+    @staticmethod
+    async def get_slots_many(
+        restaurant_ids: Sequence[int],
+        target_date: date,
+        tz: Optional[tzinfo] = None
+    ) -> Dict[int, List[Dict[str, Any]]]:
+        """Слоты пачки ресторанов на дату: одна загрузка данных на всю пачку"""
+        tz = tz or ZoneInfo(settings.TIMEZONE)
+        contexts = await SlotService.load_contexts_many(restaurant_ids, target_date, target_date, tz)
+        return {
+            rid: SlotService.build_slots(days[target_date], target_date, tz)
+            for rid, days in contexts.items()
+        }
+
+    @staticmethod
+    def next_slot(slots: List[Dict[str, Any]], after: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Ближайший свободный слот и лучшая скидка среди свободных слотов.
+
+        Args:
+            after: "HH:MM" - слоты раньше этого времени пропускаются (сегодня)
+
+        Returns:
+            {"next_slot": slot | None, "best_discount": int, "available_slots": int}
+        """
+        upcoming = sorted(
+            (slot for slot in slots if slot.get("available") and (after is None or slot["time"] >= after)),
+            key=lambda slot: slot["time"]
+        )
+        return {
+            "next_slot": upcoming[0] if upcoming else None,
+            "best_discount": max((slot.get("discount") or 0 for slot in upcoming), default=0),
+            "available_slots": len(upcoming)
+        }
+
+    @staticmethod
+    def to_columns(slots: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+        """[{time, available, ...}, ...] -> {time: [...], available: [...], ...} (компактный JSON)"""
+        columns: List[str] = []
+        for slot in slots:
+            for key in slot:
+                if key not in columns:
+                    columns.append(key)
+        return {column: [slot.get(column) for slot in slots] for column in columns}
+
+
+slot_service = SlotService()
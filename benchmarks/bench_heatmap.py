@@ -0,0 +1,96 @@
+"""
+Heatmap benchmark
+Monthly day x bucket occupancy matrix: per-day slot engine calls
+(OccupancyIndex for every bucket) vs one vectorized HeatmapService.build
+
+Запуск из корня репозитория:
+    python benchmarks/bench_heatmap.py [--days 30] [--bucket 15] [--repeat 10]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.heatmap_service import HeatmapService  # noqa: E402
+from app.services.slot_service import OccupancyIndex, SlotContext  # noqa: E402
+
+
+TZ = ZoneInfo("Asia/Almaty")
+FIRST_DAY = date(2026, 10, 1)
+
+
+def build_contexts(days: int, per_day: int, seed: int = 42) -> dict:
+    """Окно с двумя сервисами и per_day бронями в день"""
+    rng = random.Random(seed)
+    services = [
+        {"id": "lunch", "start_time": "11:00:00", "end_time": "16:00:00"},
+        {"id": "dinner", "start_time": "17:00:00", "end_time": "23:30:00"},
+    ]
+    contexts = {}
+    booking_id = 0
+    for offset in range(days):
+        day = FIRST_DAY + timedelta(days=offset)
+        bookings = []
+        for _ in range(per_day):
+            booking_id += 1
+            start = datetime.combine(day, time(rng.randint(10, 23), rng.choice([0, 15, 30, 45])), tzinfo=TZ)
+            bookings.append({
+                "id": booking_id,
+                "booking_datetime": start.isoformat(),
+                "duration_minutes": rng.choice([60, 90, 120]),
+                "party_size": rng.randint(1, 8),
+                "status": "confirmed",
+            })
+        contexts[day] = SlotContext(None, services, {"lunch": 40, "dinner": 60}, None, bookings)
+    return contexts
+
+
+def per_day_guests(contexts: dict, days: int, bucket: int) -> list:
+    """Как 30 вызовов движка: индекс занятости на день и запрос на каждый интервал"""
+    everything = [b for context in contexts.values() for b in context.bookings]
+    index = OccupancyIndex(everything)
+    step = timedelta(minutes=bucket)
+    matrix = []
+    for offset in range(days):
+        start = datetime.combine(FIRST_DAY + timedelta(days=offset), time.min, tzinfo=TZ)
+        matrix.append([index.guests(start + step * i, start + step * (i + 1)) for i in range(1440 // bucket)])
+    return matrix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--bucket", type=int, default=15, help="bucket size, minutes")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{args.days} days x {1440 // args.bucket} buckets ({args.bucket}-minute)\n")
+    print(f"{'bookings/day':>13} {'per-day':>12} {'numpy':>12} {'speedup':>9}")
+
+    for per_day in (10, 100, 500):
+        contexts = build_contexts(args.days, per_day)
+        heatmap = HeatmapService.build(contexts, FIRST_DAY, args.days, args.bucket, TZ)
+        expected = per_day_guests(contexts, args.days, args.bucket)
+        first = (int(heatmap["times"][0][:2]) * 60 + int(heatmap["times"][0][3:])) // args.bucket
+        trimmed = [row[first:first + len(heatmap["times"])] for row in expected]
+        if trimmed != heatmap["guests"]:
+            raise SystemExit(f"Mismatch at {per_day} bookings/day")
+
+        baseline = min(timeit.repeat(lambda: per_day_guests(contexts, args.days, args.bucket), number=args.repeat, repeat=3)) / args.repeat
+        vectorized = min(timeit.repeat(
+            lambda: HeatmapService.build(contexts, FIRST_DAY, args.days, args.bucket, TZ),
+            number=args.repeat,
+            repeat=3
+        )) / args.repeat
+        print(f"{per_day:>13} {baseline * 1e3:>10.2f}ms {vectorized * 1e3:>10.2f}ms {baseline / vectorized:>8.1f}x")
+
+    print("\nguests identical for all sizes")
+
+
+if __name__ == "__main__":
+    main()
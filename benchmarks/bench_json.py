@@ -0,0 +1,94 @@
+"""
+JSON benchmark
+CPU per request for the restaurant listing payload (500 restaurants):
+stdlib json + jsonable_encoder (old path) vs orjson (current path)
+
+Запуск из корня репозитория:
+    python benchmarks/bench_json.py [--restaurants 500] [--repeat 200]
+"""
+import argparse
+import json
+import random
+import timeit
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+
+CATEGORIES = ["restaurant", "cafe", "street_food", "bar", "bakery"]
+CUISINES = ["Казахская", "Европейская", "Итальянская", "Японская", "Грузинская", "Узбекская"]
+
+
+def build_payload(count: int) -> list:
+    """Ответ /api/restaurants/: колонки листинга + timeslots"""
+    rng = random.Random(42)
+    restaurants = []
+    for i in range(1, count + 1):
+        restaurants.append({
+            "id": i,
+            "name": f"Ресторан «Достар» №{i}",
+            "category": rng.choice(CATEGORIES),
+            "city": "Алматы",
+            "address": f"пр. Абая, {rng.randint(1, 300)}",
+            "phone": f"+7 701 {rng.randint(1000000, 9999999)}",
+            "cuisine": rng.sample(CUISINES, 2),
+            "rating": round(rng.uniform(3.5, 5.0), 1),
+            "avg_check": rng.randint(2000, 25000),
+            "popularity": rng.randint(0, 1000),
+            "photos": [
+                f"https://example.supabase.co/storage/v1/object/public/restaurant-photos/{i}/{n}.jpg"
+                for n in range(3)
+            ],
+            "timeslots": [
+                {
+                    "id": i * 10 + n,
+                    "restaurant_id": i,
+                    "time_start": f"{12 + n:02d}:00:00",
+                    "time_end": f"{13 + n:02d}:00:00",
+                    "discount": rng.choice([10, 15, 20, 30]),
+                    "is_active": True,
+                    "valid_from": "2026-01-01",
+                    "valid_to": "2026-12-31",
+                }
+                for n in range(5)
+            ],
+        })
+    return restaurants
+
+
+def bench(label: str, fn, repeat: int) -> float:
+    seconds = min(timeit.repeat(fn, number=repeat, repeat=5)) / repeat
+    print(f"  {label:<40} {seconds * 1e6:10.1f} µs")
+    return seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--restaurants", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    payload = build_payload(args.restaurants)
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    print(f"Payload: {args.restaurants} restaurants, {len(body) / 1024:.0f} KiB\n")
+
+    print("Decode (db layer, response bytes -> objects):")
+    old_decode = bench("json.loads (httpx resp.json)", lambda: json.loads(body), args.repeat)
+    new_decode = bench("orjson.loads", lambda: orjson.loads(body), args.repeat)
+
+    print("\nEncode (endpoint, objects -> response body):")
+    old_encode = bench(
+        "jsonable_encoder + JSONResponse",
+        lambda: JSONResponse(jsonable_encoder(payload)).body,
+        args.repeat
+    )
+    new_encode = bench("ORJSONResponse", lambda: ORJSONResponse(payload).body, args.repeat)
+
+    old_total, new_total = old_decode + old_encode, new_decode + new_encode
+    print(f"\nPer request: {old_total * 1e3:.2f} ms -> {new_total * 1e3:.2f} ms "
+          f"(saved {(old_total - new_total) * 1e3:.2f} ms CPU, {old_total / new_total:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Occupancy benchmark
+Per-slot guest load for a day: old nested loop (re-parse every booking
+for every slot) vs OccupancyIndex (parse once, sweep line with bisect)
+
+Запуск из корня репозитория:
+    python benchmarks/bench_occupancy.py [--step 15] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.slot_service import OccupancyIndex  # noqa: E402
+
+
+TZ = ZoneInfo("Asia/Almaty")
+DAY = date(2026, 10, 17)
+
+
+def build_bookings(count: int, seed: int = 42) -> list:
+    """Брони дня, включая кривые строки, которые движок пропускает"""
+    rng = random.Random(seed)
+    bookings = []
+    for i in range(count):
+        start = datetime.combine(DAY, time(rng.randint(10, 22), rng.choice([0, 15, 30, 45])))
+        booking = {
+            "id": i,
+            "booking_datetime": start.strftime("%Y-%m-%dT%H:%M:%S") + rng.choice(["+05:00", "+05:00", "+00", "Z"]),
+            "duration_minutes": rng.choice([60, 90, 120, 0]),
+            "party_size": rng.randint(1, 8),
+            "status": "confirmed",
+        }
+        roll = rng.random()
+        if roll < 0.02:
+            booking["booking_datetime"] = start.isoformat()  # naive
+        elif roll < 0.04:
+            booking["party_size"] = None
+        elif roll < 0.05:
+            booking["duration_minutes"] = -30
+        elif roll < 0.06:
+            booking["booking_datetime"] = "not a date"
+        bookings.append(booking)
+    return bookings
+
+
+def build_grid(step_minutes: int) -> list:
+    step = timedelta(minutes=step_minutes)
+    current = datetime.combine(DAY, time(10, 0)).replace(tzinfo=TZ)
+    end = datetime.combine(DAY, time(23, 0)).replace(tzinfo=TZ)
+    grid = []
+    while current + step <= end:
+        grid.append((current, current + step))
+        current += step
+    return grid
+
+
+def naive_occupancy(bookings: list, grid: list) -> list:
+    """Старый алгоритм движка слотов (до OccupancyIndex)"""
+    result = []
+    for slot_time_start, slot_time_end in grid:
+        booked_guests = 0
+        for booking in bookings:
+            booking_datetime_str = booking.get("booking_datetime", "")
+            if not booking_datetime_str:
+                continue
+            try:
+                booking_start = datetime.fromisoformat(booking_datetime_str.replace("+00", "+00:00"))
+                booking_duration = booking.get("duration_minutes", 60)
+                booking_end = booking_start + timedelta(minutes=booking_duration)
+                if booking_start < slot_time_end and booking_end > slot_time_start:
+                    booked_guests += booking.get("party_size", 1)
+            except (ValueError, TypeError):
+                continue
+        result.append(booked_guests)
+    return result
+
+
+def sweep_occupancy(bookings: list, grid: list) -> list:
+    occupancy = OccupancyIndex(bookings)
+    return [occupancy.guests(start, end) for start, end in grid]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--step", type=int, default=15, help="slot step, minutes")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    grid = build_grid(args.step)
+    print(f"{len(grid)} slots ({args.step}-minute step)\n")
+    print(f"{'bookings':>9} {'naive':>12} {'sweep':>12} {'speedup':>9}")
+
+    for count in (10, 100, 1000):
+        bookings = build_bookings(count)
+        expected = naive_occupancy(bookings, grid)
+        actual = sweep_occupancy(bookings, grid)
+        if expected != actual:
+            raise SystemExit(f"Mismatch at {count} bookings: {expected} != {actual}")
+
+        repeat = max(1, args.repeat // (10 if count >= 1000 else 1))
+        naive = min(timeit.repeat(lambda: naive_occupancy(bookings, grid), number=repeat, repeat=3)) / repeat
+        sweep = min(timeit.repeat(lambda: sweep_occupancy(bookings, grid), number=repeat, repeat=3)) / repeat
+        print(f"{count:>9} {naive * 1e3:>10.2f}ms {sweep * 1e3:>10.2f}ms {naive / sweep:>8.1f}x")
+
+    print("\nbooked_guests identical for all sizes")
+
+
+if __name__ == "__main__":
+    main()
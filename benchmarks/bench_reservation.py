@@ -0,0 +1,135 @@
+"""
+Reservation concurrency benchmark
+Hundreds of simultaneous booking attempts on one slot against the in-memory
+PostgREST backend: plain insert (old create_booking) vs reservation_service,
+in one process and with several simulated worker processes (separate locks).
+The overbooking guarantee itself is checked by tests/test_reservation.py
+
+Запуск из корня репозитория:
+    python benchmarks/bench_reservation.py [--attempts 500] [--capacity 40] [--workers 4]
+"""
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import io
+import os
+import sys
+import time
+from datetime import date
+from zoneinfo import ZoneInfo
+
+os.environ["DB_BACKEND"] = "memory"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings  # noqa: E402
+from app.core.locks import KeyedLock  # noqa: E402
+from app.core.memory_db import memory_backend  # noqa: E402
+from app.services import reservation_service as reservation_module  # noqa: E402
+from app.services.booking_service import booking_service  # noqa: E402
+from app.services.reservation_service import reservation_service, SlotFullError  # noqa: E402
+
+
+TZ = ZoneInfo("Asia/Almaty")
+DAY = date(2026, 10, 17)
+RESTAURANT_ID = 1
+
+# Воркер, от имени которого идёт попытка (у каждого "процесса" свои локи)
+worker = contextvars.ContextVar("worker", default=0)
+
+
+class WorkerLocks:
+    """KeyedLock на воркер: блокировка не спасает от гонок между процессами"""
+
+    def __init__(self, workers: int):
+        self._locks = [KeyedLock() for _ in range(workers)]
+
+    def hold(self, key):
+        return self._locks[worker.get()].hold(key)
+
+
+def seed(capacity: int) -> None:
+    memory_backend.clear()
+    memory_backend.load("restaurant_services", [{
+        "id": "dinner", "restaurant_id": RESTAURANT_ID, "is_active": True,
+        "slot_step_minutes": 60, "start_time": "18:00:00", "end_time": "23:00:00"
+    }])
+    memory_backend.load("service_capacity", [
+        {"id": 1, "service_id": "dinner", "date": None, "capacity_seats": capacity}
+    ])
+    memory_backend.load("bookings", [])
+
+
+def booking(i: int, party_size: int) -> dict:
+    return {
+        "restaurant_id": RESTAURANT_ID,
+        "guest_name": f"Guest {i}",
+        "guest_phone": f"+7701{i:07d}",
+        "booking_datetime": f"{DAY.isoformat()}T19:00:00+05:00",
+        "party_size": party_size,
+        "status": "confirmed",
+    }
+
+
+async def attempt(i: int, party_size: int, workers: int, checked: bool) -> str:
+    worker.set(i % workers)
+    if not checked:
+        return "accepted" if await booking_service.create(booking(i, party_size)) else "error"
+    try:
+        created = await reservation_service.reserve(booking(i, party_size), TZ)
+    except SlotFullError:
+        return "rejected"
+    return "accepted" if created else "error"
+
+
+async def run(attempts: int, party_size: int, workers: int, checked: bool) -> dict:
+    started = time.perf_counter()
+    # booking_service.create печатает отладку на каждый insert
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = await asyncio.gather(*[attempt(i, party_size, workers, checked) for i in range(attempts)])
+    elapsed = time.perf_counter() - started
+    stored = await booking_service.get_for_local_date(RESTAURANT_ID, DAY, tz=TZ)
+    return {
+        "accepted": results.count("accepted"),
+        "rejected": results.count("rejected"),
+        "errors": results.count("error"),
+        "guests": sum(row["party_size"] for row in stored),
+        "elapsed": elapsed,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--attempts", type=int, default=500)
+    parser.add_argument("--capacity", type=int, default=40)
+    parser.add_argument("--party-size", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=4, help="simulated processes with their own locks")
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    parser.add_argument("--jitter-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    memory_backend.latency = args.latency_ms / 1000
+    memory_backend.jitter = args.jitter_ms / 1000
+    process_locks = reservation_module.reservation_locks
+    # Бронь проходит, пока загрузка слота после неё <= SLOT_MAX_LOAD
+    allowed = int(args.capacity * settings.SLOT_MAX_LOAD)
+
+    print(f"{args.attempts} concurrent attempts x {args.party_size} guests, capacity {args.capacity} "
+          f"(max load {settings.SLOT_MAX_LOAD}: {allowed} guests), db latency {args.latency_ms}+{args.jitter_ms}ms\n")
+    print(f"{'mode':<24} {'accepted':>9} {'rejected':>9} {'errors':>7} {'guests':>7} {'time':>9}")
+
+    for name, workers, checked in (
+        ("plain insert", 1, False),
+        ("reserve, 1 process", 1, True),
+        (f"reserve, {args.workers} processes", args.workers, True),
+    ):
+        seed(args.capacity)
+        reservation_module.reservation_locks = WorkerLocks(workers) if workers > 1 else process_locks
+        result = await run(args.attempts, args.party_size, workers, checked)
+        print(f"{name:<24} {result['accepted']:>9} {result['rejected']:>9} {result['errors']:>7} "
+              f"{result['guests']:>7} {result['elapsed'] * 1e3:>7.0f}ms")
+    reservation_module.reservation_locks = process_locks
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
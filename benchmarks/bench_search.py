@@ -0,0 +1,98 @@
+"""
+Search benchmark
+Restaurant search over a synthetic catalog: old linear substring scan
+(name + joined cuisines for every row) vs SearchIndex (inverted index with
+prefix, transliteration and typo matching)
+
+Запуск из корня репозитория:
+    python benchmarks/bench_search.py [--sizes 1000,20000,50000] [--repeat 200]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.search_index import SearchIndex  # noqa: E402
+
+
+WORDS = [
+    "Del", "Papa", "Navat", "Нэдэлька", "Кафе", "Coffee", "Boom", "Чайхана", "Қазақ", "Үйі",
+    "Sushi", "Мастер", "Grill", "Bar", "Пекарня", "Street", "Food", "Almaty", "Бахор", "Zhety",
+    "Dastarkhan", "Италия", "Pizza", "Burger", "Тандыр", "Lounge", "Kitchen", "Дом", "Plov", "Ёлка",
+]
+CUISINES = ["Italian", "Итальянская", "Kazakh", "Казахская", "Узбекская", "Asian", "Кофе", "European", "Georgian"]
+
+# (запрос, что проверяет)
+QUERIES = [
+    ("papa", "word"),
+    ("del pa", "prefix"),
+    ("чайх", "cyrillic prefix"),
+    ("chaikhana", "transliteration"),
+    ("kazak", "kazakh letters"),
+    ("sushy", "typo"),
+    ("dastrakhan", "transposition"),
+    ("итальянская", "cuisine"),
+]
+
+
+def build_documents(count: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    return [
+        {
+            "id": i,
+            "name": " ".join(rng.sample(WORDS, rng.randint(1, 3))) + f" {i}",
+            "cuisine": rng.sample(CUISINES, rng.randint(1, 2)),
+            "popularity": rng.randint(0, 1000),
+        }
+        for i in range(count)
+    ]
+
+
+def linear_search(documents: list, query: str) -> list:
+    """Старый путь get_restaurants: подстрока в названии или в склеенных кухнях"""
+    needle = query.lower()
+    return [
+        d["id"] for d in documents
+        if needle in d.get("name", "").lower() or needle in " ".join(d.get("cuisine", [])).lower()
+    ]
+
+
+def per_query(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,20000,50000")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    for size in (int(part) for part in args.sizes.split(",")):
+        documents = build_documents(size)
+        started = time.perf_counter()
+        index = SearchIndex(documents)
+        build = time.perf_counter() - started
+        print(f"\n{size} restaurants, index build {build * 1e3:.0f}ms")
+        print(f"{'query':<14} {'kind':<16} {'linear':>10} {'index':>10} {'linear hits':>12} {'index hits':>11}")
+
+        for query, kind in QUERIES:
+            linear = per_query(lambda: linear_search(documents, query), max(args.repeat // 10, 1))
+            indexed = per_query(lambda: index.search(query), args.repeat)
+            linear_hits = len(linear_search(documents, query))
+            index_hits = len(index.search(query))
+            if query == "papa" and linear_hits != index_hits:
+                raise SystemExit(f"Word query mismatch: {linear_hits} vs {index_hits}")
+            print(f"{query:<14} {kind:<16} {linear * 1e3:>8.2f}ms {indexed * 1e3:>8.2f}ms {linear_hits:>12} {index_hits:>11}")
+
+        autocomplete = per_query(lambda: index.search("pa", limit=8), args.repeat)
+        print(f"autocomplete 'pa' limit 8: {autocomplete * 1e3:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
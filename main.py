@@ -2,7 +2,9 @@
 Main application entry point
 RestoBoost - Restaurant booking platform with dynamic discounts
 """
-from fastapi import FastAPI, Header
+import uuid
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -11,9 +13,53 @@ from pydantic import BaseModel, EmailStr
 from typing import Optional
 from app.api import auth
 from app.core.config import settings
+from app.core.http import open_http_client, close_http_client
+from app.core.logger import setup_logging, shutdown_logging, request_id_var, get_logger
+from app.core.tracing import RequestTrace, trace_var, route_stats
+from app.services.availability_store import availability_store
+from app.services.catalog import catalog
+from app.services.active_rules import active_rules
 from app.api import restaurants, bookings, photos
 from app.api.bookings import router as bookings_router
 
+# Structured logging (JSON lines, уровни из LOG_LEVEL / LOG_LEVELS)
+setup_logging()
+log = get_logger("app.main")
+
+
+# ============================================
+# LIFESPAN
+# ============================================
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup / shutdown: общий HTTP пул к Supabase, фоновая сверка availability_store, снимок каталога, индекс скидок"""
+    await open_http_client()
+    if settings.AVAILABILITY_STORE_ENABLED:
+        availability_store.start()
+    if settings.CATALOG_ENABLED:
+        catalog.start()
+    if settings.ACTIVE_RULES_ENABLED:
+        active_rules.start()
+
+    print("\n" + "="*50)
+    print(f"🚀 {app.title} v{app.version}")
+    print(f"📍 Starting server...")
+    print(f"🗄️  Supabase: {'✅ Connected' if settings.SUPABASE_URL else '❌ Not configured'}")
+    print(f"🔌 HTTP pool: max {settings.SUPABASE_MAX_CONNECTIONS} connections, HTTP/2 {'✅' if settings.SUPABASE_HTTP2 else '❌'}")
+    print(f"🔧 Debug mode: {'✅ Enabled' if settings.DEBUG else '❌ Disabled'}")
+    print("="*50 + "\n")
+
+    yield
+
+    print("\n👋 RestoBoost shutting down...")
+    await availability_store.stop()
+    await catalog.stop()
+    await active_rules.stop()
+    await close_http_client()
+    shutdown_logging()
+
+
 # ============================================
 # ИНИЦИАЛИЗАЦИЯ ПРИЛОЖЕНИЯ
 # ============================================
@@ -22,7 +68,8 @@ app = FastAPI(
     title="Orynbar API",
     description="Restaurant booking platform with dynamic discounts",
     version="2.0.0",
-    debug=settings.DEBUG
+    debug=settings.DEBUG,
+    lifespan=lifespan
 )
 
 
@@ -41,9 +88,51 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "Server-Timing", "X-Next-Cursor"],
 )
 
 
+def _finish_trace(request: Request, response, trace: RequestTrace) -> None:
+    """Server-Timing заголовок, гистограмма маршрута и warning для медленных / N+1 запросов"""
+    wall, loop_cpu = trace.finish()
+    response.headers["Server-Timing"] = trace.server_timing(wall, loop_cpu)
+
+    # Шаблон маршрута (/api/restaurants/{restaurant_id}), а не сырой путь
+    route = request.scope.get("route")
+    route_key = f"{request.method} {getattr(route, 'path', 'unmatched')}"
+    route_stats.record(route_key, wall, trace.db_time, len(trace.calls), loop_cpu)
+
+    if wall * 1000 > settings.TRACE_SLOW_REQUEST_MS or len(trace.calls) > settings.TRACE_MAX_DB_CALLS:
+        log.warning("Slow or chatty request", extra={
+            "route": route_key,
+            "ms": round(wall * 1000, 1),
+            "db_calls": len(trace.calls),
+            "db_targets": {target: count for target, (count, _) in trace.by_target().items()},
+            "calls": trace.summary()[:50]
+        })
+
+
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    """
+    Request ID для корреляции логов (берём X-Request-ID от прокси или генерируем)
+    и trace upstream вызовов: Server-Timing заголовок + гистограммы в /metrics
+    """
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    trace = RequestTrace() if settings.TRACING_ENABLED else None
+    trace_token = trace_var.set(trace)
+    try:
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id
+        if trace is not None:
+            _finish_trace(request, response, trace)
+        return response
+    finally:
+        trace_var.reset(trace_token)
+        request_id_var.reset(token)
+
+
 # Статические файлы
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -184,16 +273,48 @@ async def health_check():
     }
 
 
+@app.get("/metrics")
+async def metrics():
+    """Внутренние счётчики (coalescing и т.д.) для мониторинга"""
+    from app.core.database import db
+    from app.services.slot_service import slot_cache
+    from app.services.discount_index import discount_indexes
+    from app.services.reservation_service import reservation_locks, ReservationService
+
+    return {
+        "db": {
+            "coalescing": db.singleflight.stats(),
+            "latency": db.latency_stats()
+        },
+        "slot_cache": slot_cache.stats(),
+        "availability": availability_store.stats(),
+        "catalog": catalog.stats(),
+        "active_rules": active_rules.stats(),
+        "discount_index": discount_indexes.stats(),
+        "reservations": {
+            "active_locks": len(reservation_locks),
+            "lock_waits": reservation_locks.waits,
+            "rollback_failures": ReservationService.rollback_failures
+        },
+        "routes": route_stats.stats()
+    }
+
+
 @app.get("/api/categories")
 async def get_categories():
     """Возвращает категории"""
     try:
+        if settings.CATALOG_ENABLED:
+            snapshot = await catalog.snapshot()
+            if snapshot is not None:
+                return snapshot.categories()
+        
         from app.services.restaurant_service import restaurant_service
         
         # Добавляем таймаут 5 секунд
         import asyncio
         restaurants = await asyncio.wait_for(
-            restaurant_service.get_all(),
+            restaurant_service.get_all(columns=("id", "category")),
             timeout=5.0
         )
         
@@ -243,27 +364,6 @@ async def get_categories():
         ]
 
 
-# ============================================
-# EVENTS
-# ============================================
-
-@app.on_event("startup")
-async def startup_event():
-    """Application startup event"""
-    print("\n" + "="*50)
-    print(f"🚀 {app.title} v{app.version}")
-    print(f"📍 Starting server...")
-    print(f"🗄️  Supabase: {'✅ Connected' if settings.SUPABASE_URL else '❌ Not configured'}")
-    print(f"🔧 Debug mode: {'✅ Enabled' if settings.DEBUG else '❌ Disabled'}")
-    print("="*50 + "\n")
-
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Application shutdown event"""
-    print("\n👋 RestoBoost shutting down...")
-
-
 # ============================================
 # ЗАПУСК ПРИЛОЖЕНИЯ
 # ============================================
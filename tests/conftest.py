@@ -0,0 +1,9 @@
+"""
+Тесты идут на in-memory бэкенде (app/core/memory_db.py): без Supabase и сети.
+Запуск из корня репозитория: python -m pytest -q
+"""
+import os
+import sys
+
+os.environ["DB_BACKEND"] = "memory"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,134 @@
+"""
+Курсорная пагинация /api/restaurants/: курсор проходит туда-обратно,
+поддельный или чужой курсор отклоняется, страницы не теряют и не
+повторяют строки, даже если между запросами добавляются рестораны
+(снимок каталога и путь через базу)
+"""
+import base64
+import random
+
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from app.core.config import settings
+from app.core.memory_db import memory_backend
+from app.services.catalog import catalog
+from app.services.restaurant_service import SORTS, decode_cursor, encode_cursor, listing_fingerprint
+
+FILTERS = ("papa", None, "Almaty", "rating_desc", None)
+
+
+def forged(key, filters=FILTERS) -> str:
+    """Курсор, собранный клиентом (отпечаток фильтров публичный)"""
+    payload = {"f": listing_fingerprint(filters), "k": key}
+    return base64.urlsafe_b64encode(orjson.dumps(payload)).rstrip(b"=").decode()
+
+
+def restaurant(i: int, rng: random.Random) -> dict:
+    return {
+        "id": i,
+        "name": f"Papa {i}" if i % 3 else f"Kafe {i}",
+        "category": rng.choice(["restaurant", "cafe", "bar"]),
+        "city": "Almaty",
+        "rating": rng.choice([None, 4.1, 4.5, 5.0]),
+        "avg_check": rng.choice([None, 3000, 6000, 12000]),
+        "popularity": rng.choice([None, 1, 5, 5, 10]),
+        "cuisine": ["Kazakh"],
+        "photos": [],
+    }
+
+
+@pytest.fixture
+def client(monkeypatch):
+    rng = random.Random(1)
+    memory_backend.clear()
+    memory_backend.load("restaurants", [restaurant(i, rng) for i in range(1, 60)])
+    memory_backend.load("discount_rules", [])
+    monkeypatch.setattr(settings, "ACTIVE_RULES_ENABLED", False)
+    catalog.invalidate()
+    yield TestClient(main.app)
+    catalog.invalidate()
+    memory_backend.clear()
+
+
+@pytest.mark.parametrize("key", [(0, -4.5, 7), (1, 0, 12), (0, 3000, 1)])
+def test_cursor_round_trip(key):
+    assert decode_cursor(encode_cursor(FILTERS, key), FILTERS, "rating_desc") == key
+
+
+def test_relevance_and_id_cursors_without_sort():
+    filters = ("papa", None, None, None, None)
+    assert decode_cursor(encode_cursor(filters, (-1.2, -5, 3)), filters, None) == (-1.2, -5, 3)
+    assert decode_cursor(encode_cursor(filters, (42,)), filters, None) == (42,)
+
+
+@pytest.mark.parametrize("cursor", [
+    "garbage",
+    "",
+    encode_cursor(("other", None, None, "rating_desc", None), (0, -4.5, 7)),  # другие фильтры
+    forged([0, "4.5,name.neq.x", 7]),  # попытка дописать фильтр PostgREST
+    forged([0, -4.5, "7),or(id.gt.0"]),
+    forged([0, None, 7]),
+    forged([2, -4.5, 7]),
+    forged([True, -4.5, 7]),
+    forged([0, -4.5, 7.5]),
+    forged([0, -4.5]),
+    forged([7]),
+    forged({"k": 1}),
+])
+def test_invalid_cursor_rejected(cursor):
+    assert decode_cursor(cursor, FILTERS, "rating_desc") is None
+
+
+def test_forged_cursor_is_400(client):
+    params = {"search": "papa", "city": "Almaty", "sort_by": "rating_desc", "cursor": forged([0, "4.5,name.neq.x", 7])}
+    assert client.get("/api/restaurants/", params=params).status_code == 400
+
+
+def pages(client, params: dict, page_size: int, between=None) -> list:
+    """Все страницы по курсору; between(n) вызывается перед каждой следующей"""
+    rows, cursor, n = [], None, 0
+    while True:
+        query = {**params, "page_size": page_size, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/restaurants/", params=query)
+        assert response.status_code == 200, response.text
+        rows += response.json()
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            return rows
+        n += 1
+        if between:
+            between(n)
+
+
+@pytest.mark.parametrize("catalog_enabled", [True, False])
+@pytest.mark.parametrize("sort_by", [None, *SORTS])
+def test_pages_match_full_listing(client, monkeypatch, catalog_enabled, sort_by):
+    monkeypatch.setattr(settings, "CATALOG_ENABLED", catalog_enabled)
+    params = {"sort_by": sort_by} if sort_by else {}
+    full = [row["id"] for row in client.get("/api/restaurants/", params=params).json()]
+
+    paged = [row["id"] for row in pages(client, params, 7)]
+
+    assert paged == full
+
+
+@pytest.mark.parametrize("catalog_enabled", [True, False])
+@pytest.mark.parametrize("sort_by", [None, *SORTS])
+def test_inserts_between_pages_do_not_shift_pages(client, monkeypatch, catalog_enabled, sort_by):
+    monkeypatch.setattr(settings, "CATALOG_ENABLED", catalog_enabled)
+    params = {"sort_by": sort_by} if sort_by else {}
+    before = [row["id"] for row in client.get("/api/restaurants/", params=params).json()]
+    rng = random.Random(2)
+
+    def insert(n):
+        memory_backend.insert("restaurants", [restaurant(1000 + n * 10 + i, rng) for i in range(3)])
+        catalog.invalidate()
+
+    paged = [row["id"] for row in pages(client, params, 7, between=insert)]
+
+    assert len(paged) == len(set(paged))
+    # Строки, которые были до начала обхода, приходят все и в прежнем порядке
+    assert [i for i in paged if i < 1000] == before
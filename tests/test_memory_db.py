@@ -0,0 +1,39 @@
+"""
+In-memory PostgREST (app/core/memory_db.py): запрос с ошибкой не меняет
+таблицу, как statement в Postgres - на этом строится деление чанков в
+db.bulk_insert
+"""
+import asyncio
+
+import pytest
+
+from app.core.database import db
+from app.core.memory_db import memory_backend
+
+
+@pytest.fixture(autouse=True)
+def memory_db():
+    memory_backend.clear()
+    yield
+    memory_backend.clear()
+
+
+def stored_ids(table: str) -> list:
+    return sorted(row["id"] for row in memory_backend.tables[table])
+
+
+def test_failed_insert_leaves_table_unchanged():
+    memory_backend.load("restaurants", [{"id": 10, "name": "Old"}])
+    with pytest.raises(KeyError):
+        memory_backend.insert("restaurants", [{"id": 1}, {"id": 2}, {"id": 10}])
+    assert stored_ids("restaurants") == [10]
+
+
+def test_bulk_insert_reports_only_rows_that_were_not_stored():
+    rows = [{"id": 1}, {"id": 2}, {"id": 1}, {"id": 3}]
+    result = asyncio.run(db.bulk_insert("restaurants", rows, chunk_size=4))
+
+    failed = [f["index"] for f in result["failed"]]
+    assert failed == [2]
+    assert stored_ids("restaurants") == [1, 2, 3]
+    assert sorted(row["id"] for row in result["inserted"]) == [1, 2, 3]
@@ -0,0 +1,151 @@
+"""
+reservation_service под конкуренцией: сотни одновременных попыток на один
+слот не поднимают загрузку выше settings.SLOT_MAX_LOAD - ни в одном
+процессе, ни в нескольких (у каждого свои локи, см. bench_reservation.py).
+Несколько процессов здесь - на memory backend, где id выдаётся при записи;
+в Postgres строго между процессами только с BOOKING_RESERVE_RPC.
+"""
+import asyncio
+import contextvars
+from datetime import date
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.core.config import settings
+from app.core.locks import KeyedLock
+from app.core.memory_db import memory_backend
+from app.services import reservation_service as reservation_module
+from app.services.booking_service import booking_service
+from app.services.reservation_service import reservation_service, ReservationService, SlotFullError
+from app.services.slot_service import slot_service
+
+TZ = ZoneInfo("Asia/Almaty")
+DAY = date(2026, 10, 17)
+RESTAURANT_ID = 1
+CAPACITY = 40
+
+worker = contextvars.ContextVar("worker", default=0)
+
+
+class WorkerLocks:
+    """KeyedLock на воркер: имитация нескольких процессов"""
+
+    def __init__(self, workers: int):
+        self._locks = [KeyedLock() for _ in range(workers)]
+
+    def hold(self, key):
+        return self._locks[worker.get()].hold(key)
+
+
+@pytest.fixture(autouse=True)
+def memory_db(monkeypatch):
+    memory_backend.clear()
+    memory_backend.load("restaurant_services", [{
+        "id": "dinner", "restaurant_id": RESTAURANT_ID, "is_active": True,
+        "slot_step_minutes": 60, "start_time": "18:00:00", "end_time": "23:00:00"
+    }])
+    memory_backend.load("service_capacity", [
+        {"id": 1, "service_id": "dinner", "date": None, "capacity_seats": CAPACITY}
+    ])
+    memory_backend.load("bookings", [])
+    # Задержка базы: попытки перемежаются между await
+    monkeypatch.setattr(memory_backend, "latency", 0.001)
+    monkeypatch.setattr(memory_backend, "jitter", 0.002)
+    yield
+    memory_backend.clear()
+
+
+def booking(i: int, party_size: int = 2) -> dict:
+    return {
+        "restaurant_id": RESTAURANT_ID,
+        "guest_name": f"Guest {i}",
+        "guest_phone": f"+7701{i:07d}",
+        "booking_datetime": f"{DAY.isoformat()}T19:00:00+05:00",
+        "party_size": party_size,
+        "status": "confirmed",
+    }
+
+
+async def attempt(i: int, workers: int) -> str:
+    worker.set(i % workers)
+    try:
+        created = await reservation_service.reserve(booking(i), TZ)
+    except SlotFullError:
+        return "rejected"
+    return "accepted" if created else "error"
+
+
+async def stored_guests() -> int:
+    stored = await booking_service.get_for_local_date(RESTAURANT_ID, DAY, tz=TZ)
+    return sum(row["party_size"] for row in stored)
+
+
+async def slot_at(time: str) -> dict:
+    contexts = await slot_service.load_contexts(RESTAURANT_ID, DAY, DAY, TZ)
+    return next(slot for slot in slot_service.build_slots(contexts[DAY], DAY, TZ) if slot["time"] == time)
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_concurrent_attempts_never_overbook(monkeypatch, workers):
+    if workers > 1:
+        monkeypatch.setattr(reservation_module, "reservation_locks", WorkerLocks(workers))
+
+    async def scenario():
+        results = await asyncio.gather(*[attempt(i, workers) for i in range(300)])
+        return results, await stored_guests()
+
+    results, guests = asyncio.run(scenario())
+    allowed = CAPACITY * settings.SLOT_MAX_LOAD
+
+    assert results.count("error") == 0
+    assert guests <= allowed
+    # Места не теряются: заполнено до порога (по 2 гостя)
+    assert guests > allowed - 2
+    assert results.count("accepted") * 2 == guests
+
+
+def test_unavailable_slot_rejects_booking():
+    """Слот, который /available-slots показывает занятым, бронь не принимает"""
+    async def scenario():
+        # 34 из 40 (85%) - слот доступен, бронь на 2 доводит ровно до 90%
+        for i in range(17):
+            assert await reservation_service.reserve(booking(i), TZ)
+        assert (await slot_at("19:00"))["available"]
+        assert await reservation_service.reserve(booking(17), TZ)
+
+        slot = await slot_at("19:00")
+        assert slot["booked_guests"] == 36
+        assert not slot["available"]
+        with pytest.raises(SlotFullError):
+            await reservation_service.reserve(booking(18, party_size=1), TZ)
+        return await stored_guests()
+
+    assert asyncio.run(scenario()) == 36
+
+
+def test_failed_rollback_keeps_booking(monkeypatch):
+    """Проиграли гонку, но delete не прошёл: бронь в базе - её и возвращаем, не 409"""
+    checks = iter([[], [{"time": "19:00"}]])  # до insert мест хватает, после - переполнение
+    monkeypatch.setattr(ReservationService, "overloaded_slots", staticmethod(lambda *args: next(checks)))
+    monkeypatch.setattr(ReservationService, "rollback_failures", 0)
+
+    async def failing_delete(booking_id):
+        return False
+
+    monkeypatch.setattr(booking_service, "delete", failing_delete)
+
+    created = asyncio.run(reservation_service.reserve(booking(0), TZ))
+
+    assert created is not None
+    assert ReservationService.rollback_failures == 1
+    assert asyncio.run(stored_guests()) == 2
+
+
+def test_lost_race_rolls_back(monkeypatch):
+    checks = iter([[], [{"time": "19:00"}]])
+    monkeypatch.setattr(ReservationService, "overloaded_slots", staticmethod(lambda *args: next(checks)))
+
+    with pytest.raises(SlotFullError):
+        asyncio.run(reservation_service.reserve(booking(0), TZ))
+    assert asyncio.run(stored_guests()) == 0